@@ -0,0 +1,57 @@
+import django_filters
+from rest_framework import filters
+
+from rapihogar.escalas import ESCALAS_PAGO, etiqueta_escala, rango_escala
+from rapihogar.models import Tecnico
+
+
+class TecnicoFilter(django_filters.FilterSet):
+    """
+    Filtros del listado de técnicos sobre los totales precalculados
+
+    - min_hours / max_hours: rango de horas trabajadas
+    - tier: escala de pago (1 = 0-14 horas, 2 = 15-28, ...)
+    """
+    min_hours = django_filters.NumberFilter(field_name='horas_totales', lookup_expr='gte')
+    max_hours = django_filters.NumberFilter(field_name='horas_totales', lookup_expr='lte')
+    tier = django_filters.TypedChoiceFilter(
+        choices=[
+            (indice + 1, etiqueta_escala(indice)) for indice in range(len(ESCALAS_PAGO))
+        ],
+        coerce=int,
+        method='filtrar_escala'
+    )
+
+    class Meta:
+        model = Tecnico
+        fields = []
+
+    def filtrar_escala(self, queryset, name, value):
+        desde, hasta = rango_escala(value - 1)
+        queryset = queryset.filter(horas_totales__gte=desde)
+        if hasta is not None:
+            queryset = queryset.filter(horas_totales__lte=hasta)
+        return queryset
+
+
+class TecnicoOrderingFilter(filters.OrderingFilter):
+    """
+    Ordenamiento que traduce los campos calculados del listado a las
+    columnas precalculadas (indexadas) del técnico
+    """
+    campos_calculados = {
+        'total_hours_worked': 'horas_totales',
+        'total_pedidos': 'pedidos_totales',
+        'total_payment': 'pago_total',
+    }
+
+    def get_ordering(self, request, queryset, view):
+        ordering = super().get_ordering(request, queryset, view)
+        if not ordering:
+            return ordering
+        return [self._columna(campo) for campo in ordering]
+
+    def _columna(self, campo):
+        prefijo = '-' if campo.startswith('-') else ''
+        nombre = campo.lstrip('-')
+        return prefijo + self.campos_calculados.get(nombre, nombre)
@@ -0,0 +1,331 @@
+import fcntl
+import glob
+import hashlib
+import mmap
+import os
+import threading
+import time
+import weakref
+from array import array
+from bisect import bisect_left
+
+from django.conf import settings
+from django.core.signals import setting_changed
+from django.db import connection
+from django.dispatch import receiver
+
+TAMANO_SLOT = 8  # int64 por valor
+
+
+def _config():
+    return settings.METRICAS
+
+
+class Contador:
+    """Contador con un valor por combinación de etiquetas"""
+    tipo = 'counter'
+
+    def __init__(self, nombre, ayuda, etiquetas):
+        self.nombre = nombre
+        self.ayuda = ayuda
+        self.etiquetas = etiquetas  # nombre -> valores posibles
+        self.combinaciones = _combinaciones(list(etiquetas.values()))
+        self.slots_por_combinacion = 1
+
+    def muestras(self, valores, base):
+        for numero, combinacion in enumerate(self.combinaciones):
+            yield '', self._etiquetas(combinacion), valores[base + numero]
+
+    def _etiquetas(self, combinacion, extra=()):
+        pares = list(zip(self.etiquetas, combinacion)) + list(extra)
+        if not pares:
+            return ''
+        return '{' + ','.join(f'{nombre}="{valor}"' for nombre, valor in pares) + '}'
+
+
+class Histograma(Contador):
+    """
+    Histograma de tramos fijos. Por combinación guarda la cantidad de cada
+    tramo (el último es +Inf) y la suma en microsegundos
+    """
+    tipo = 'histogram'
+
+    def __init__(self, nombre, ayuda, etiquetas, tramos):
+        super().__init__(nombre, ayuda, etiquetas)
+        self.tramos = tuple(tramos)
+        self.slots_por_combinacion = len(self.tramos) + 2
+
+    def muestras(self, valores, base):
+        for numero, combinacion in enumerate(self.combinaciones):
+            inicio = base + numero * self.slots_por_combinacion
+            acumulado = 0
+            for posicion, limite in enumerate(self.tramos + ('+Inf',)):
+                acumulado += valores[inicio + posicion]
+                yield '_bucket', self._etiquetas(combinacion, [('le', limite)]), acumulado
+            suma = valores[inicio + len(self.tramos) + 1] / 1_000_000
+            yield '_sum', self._etiquetas(combinacion), suma
+            yield '_count', self._etiquetas(combinacion), acumulado
+
+
+def _combinaciones(listas):
+    combinaciones = [()]
+    for valores in listas:
+        combinaciones = [combinacion + (valor,) for combinacion in combinaciones for valor in valores]
+    return combinaciones
+
+
+class AlmacenMmap:
+    """
+    Valores de las métricas en un archivo mapeado en memoria por proceso
+
+    Cada proceso escribe solo en su archivo ({firma}-{pid}.db), así no hay
+    contención entre procesos; la exportación suma los archivos de todos.
+    La firma identifica la disposición de los valores: los archivos de otra
+    versión del código se ignoran. Al exportar, los archivos de procesos
+    terminados se suman a {firma}-terminados.acum y se borran, así los
+    contadores no disminuyen y la exportación no relee un archivo por cada
+    proceso que existió.
+    """
+
+    def __init__(self, directorio, cantidad, firma):
+        self.directorio = directorio
+        self.cantidad = cantidad
+        self.firma = firma
+        self.valores = None
+        self._abrir()
+        # Un proceso hijo (ej: workers de gunicorn con --preload) usa su propio archivo.
+        # La referencia es débil: un almacén descartado no se reabre en los hijos
+        referencia = weakref.ref(self)
+        os.register_at_fork(after_in_child=lambda: _reabrir(referencia))
+
+    def _abrir(self):
+        os.makedirs(self.directorio, exist_ok=True)
+        ruta = os.path.join(self.directorio, f'{self.firma}-{os.getpid()}.db')
+        with open(ruta, 'a+b') as archivo:
+            archivo.truncate(self.cantidad * TAMANO_SLOT)
+            self._mapa = mmap.mmap(archivo.fileno(), self.cantidad * TAMANO_SLOT)
+        self.valores = memoryview(self._mapa).cast('q')
+        # Sumar no es atómico entre hilos del proceso
+        self.lock = threading.Lock()
+
+    def sumar_procesos(self):
+        """Suma de los valores de todos los procesos"""
+        tamano = self.cantidad * TAMANO_SLOT
+        totales = [0] * self.cantidad
+        ruta_terminados = os.path.join(self.directorio, f'{self.firma}-terminados.acum')
+        with open(ruta_terminados, 'a+b') as terminados:
+            # Un solo exportador a la vez incorpora los archivos de procesos terminados
+            fcntl.flock(terminados, fcntl.LOCK_EX)
+            terminados.seek(0)
+            contenido = terminados.read(tamano)
+            acumulados = [0] * self.cantidad
+            if len(contenido) == tamano:
+                acumulados = list(memoryview(contenido).cast('q'))
+            muertos = []
+            for ruta in glob.glob(os.path.join(self.directorio, f'{self.firma}-*.db')):
+                with open(ruta, 'rb') as archivo:
+                    contenido = archivo.read(tamano)
+                if len(contenido) != tamano:
+                    continue
+                destino = totales
+                if not _proceso_vivo(_pid_del_archivo(ruta)):
+                    destino = acumulados
+                    muertos.append(ruta)
+                for posicion, valor in enumerate(memoryview(contenido).cast('q')):
+                    destino[posicion] += valor
+            if muertos:
+                # Primero se guarda el acumulado, después se borran los archivos
+                terminados.seek(0)
+                terminados.truncate()
+                terminados.write(array('q', acumulados).tobytes())
+                terminados.flush()
+                os.fsync(terminados.fileno())
+                for ruta in muertos:
+                    os.remove(ruta)
+        for posicion, valor in enumerate(acumulados):
+            totales[posicion] += valor
+        return totales
+
+
+def _reabrir(referencia):
+    almacen = referencia()
+    if almacen is not None:
+        almacen._abrir()
+
+
+def _pid_del_archivo(ruta):
+    return int(os.path.basename(ruta).rsplit('-', 1)[1].split('.', 1)[0])
+
+
+def _proceso_vivo(pid):
+    if pid == os.getpid():
+        return True
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        # Existe pero es de otro usuario
+        return True
+    return True
+
+
+class RegistroMetricas:
+    """
+    Métricas de la API: requests y latencia por endpoint, consultas a la
+    base por endpoint y aciertos del cache de reportes
+
+    La disposición es fija (se conoce cada combinación de etiquetas al
+    iniciar), así registrar un valor es buscar su posición y sumar.
+    """
+
+    def __init__(self, config):
+        endpoints = tuple(dict.fromkeys(config['ENDPOINTS'].values())) + ('otros',)
+        self.endpoint_por_url = config['ENDPOINTS']
+        self.metricas = [
+            Contador(
+                'rapihogar_http_requests_total',
+                'Requests HTTP atendidos por endpoint y clase de código',
+                {'endpoint': endpoints, 'codigo': ('2xx', '3xx', '4xx', '5xx')},
+            ),
+            Histograma(
+                'rapihogar_http_request_duration_seconds',
+                'Latencia de los requests HTTP por endpoint',
+                {'endpoint': endpoints},
+                config['TRAMOS_LATENCIA'],
+            ),
+            Contador(
+                'rapihogar_db_queries_total',
+                'Consultas a la base de datos por endpoint',
+                {'endpoint': endpoints},
+            ),
+            Contador(
+                'rapihogar_cache_requests_total',
+                'Lecturas del cache de reportes por resultado',
+                {'cache': ('reportes', ), 'resultado': ('acierto', 'fallo')},
+            ),
+        ]
+
+        # Posición del primer valor de cada combinación de etiquetas
+        self._bases = {}
+        self._posiciones = {}
+        cantidad = 0
+        for metrica in self.metricas:
+            self._bases[metrica.nombre] = cantidad
+            for combinacion in metrica.combinaciones:
+                self._posiciones[metrica.nombre, combinacion] = cantidad
+                cantidad += metrica.slots_por_combinacion
+        requests, latencia, consultas, self._cache = self.metricas
+
+        # Posiciones de cada endpoint precalculadas para registrar un request
+        self._tramos = latencia.tramos
+        self._por_endpoint = {
+            endpoint: (
+                {
+                    clase: self._posiciones[requests.nombre, (endpoint, f'{clase}xx')]
+                    for clase in (2, 3, 4, 5)
+                },
+                self._posiciones[latencia.nombre, (endpoint,)],
+                self._posiciones[latencia.nombre, (endpoint,)] + len(latencia.tramos) + 1,
+                self._posiciones[consultas.nombre, (endpoint,)],
+            )
+            for endpoint in endpoints
+        }
+
+        disposicion = repr([
+            (metrica.nombre, metrica.combinaciones, getattr(metrica, 'tramos', None))
+            for metrica in self.metricas
+        ])
+        firma = hashlib.sha1(disposicion.encode()).hexdigest()[:12]
+        self.almacen = AlmacenMmap(config['DIRECTORIO'], cantidad, firma)
+
+    def endpoint(self, url_name):
+        return self.endpoint_por_url.get(url_name, 'otros')
+
+    def registrar_request(self, endpoint, codigo, segundos, consultas):
+        por_codigo, latencia, suma, posicion_consultas = self._por_endpoint[endpoint]
+        requests = por_codigo[min(max(codigo // 100, 2), 5)]
+        tramo = latencia + bisect_left(self._tramos, segundos)
+        valores = self.almacen.valores
+        with self.almacen.lock:
+            valores[requests] += 1
+            valores[tramo] += 1
+            valores[suma] += int(segundos * 1_000_000)
+            valores[posicion_consultas] += consultas
+
+    def registrar_cache(self, cache, acierto):
+        posicion = self._posiciones[self._cache.nombre, (cache, 'acierto' if acierto else 'fallo')]
+        with self.almacen.lock:
+            self.almacen.valores[posicion] += 1
+
+    def exportar(self):
+        """Todas las métricas, sumadas entre procesos, en formato de texto de Prometheus"""
+        valores = self.almacen.sumar_procesos()
+        lineas = []
+        for metrica in self.metricas:
+            lineas.append(f'# HELP {metrica.nombre} {metrica.ayuda}')
+            lineas.append(f'# TYPE {metrica.nombre} {metrica.tipo}')
+            for sufijo, etiquetas, valor in metrica.muestras(valores, self._bases[metrica.nombre]):
+                lineas.append(f'{metrica.nombre}{sufijo}{etiquetas} {valor}')
+        return '\n'.join(lineas) + '\n'
+
+
+_registro = None
+_lock_registro = threading.Lock()
+
+
+def registro():
+    """Registro de métricas del proceso, se crea con el primer uso"""
+    global _registro
+    if _registro is None:
+        with _lock_registro:
+            if _registro is None:
+                _registro = RegistroMetricas(_config())
+    return _registro
+
+
+@receiver(setting_changed)
+def _reiniciar_registro(setting, **kwargs):
+    global _registro
+    if setting == 'METRICAS':
+        _registro = None
+
+
+def registrar_cache(cache, acierto):
+    if _config()['HABILITADO']:
+        registro().registrar_cache(cache, acierto)
+
+
+class _ContadorConsultas:
+    def __init__(self):
+        self.cantidad = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        self.cantidad += 1
+        return execute(sql, params, many, context)
+
+
+class MetricasMiddleware:
+    """
+    Registra cantidad, código, latencia y consultas a la base de cada
+    request, por endpoint (ver settings.METRICAS['ENDPOINTS'])
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if not _config()['HABILITADO']:
+            return self.get_response(request)
+
+        contador = _ContadorConsultas()
+        inicio = time.perf_counter()
+        with connection.execute_wrapper(contador):
+            response = self.get_response(request)
+        duracion = time.perf_counter() - inicio
+
+        metricas = registro()
+        resolver_match = getattr(request, 'resolver_match', None)
+        endpoint = metricas.endpoint(resolver_match.url_name if resolver_match else None)
+        metricas.registrar_request(endpoint, response.status_code, duracion, contador.cantidad)
+        return response
@@ -0,0 +1,245 @@
+import cProfile
+import io
+import os
+import pstats
+import random
+import sys
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+from datetime import datetime
+
+from django.conf import settings
+from django.http import HttpResponse
+from rest_framework import exceptions
+from rest_framework.request import Request
+from rest_framework.settings import api_settings
+
+
+def _config():
+    return settings.PERFILADO
+
+
+class PerfiladoMiddleware:
+    """
+    Perfilado de requests sin redeploy
+
+    - A pedido (solo staff, con cualquier autenticación de la API): con el
+      parámetro ?perfilar= o el header
+      X-Perfilar el request corre bajo cProfile. Con el valor 'guardar' el
+      perfil se escribe en el directorio de perfiles (header X-Perfil con el
+      archivo); con cualquier otro valor se responden las estadísticas en texto
+    - Muestreo: una fracción configurable de los requests corre bajo cProfile
+      y se guarda
+    - Requests lentos: un hilo muestrea las pilas de los requests desde que
+      superan el umbral de latencia y las guarda al terminar (formato de
+      pilas plegadas, compatible con flamegraph)
+    - El directorio de perfiles tiene un tamaño máximo: se eliminan los más viejos
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        config = _config()
+        if not config['HABILITADO']:
+            return self.get_response(request)
+
+        modo = self._modo_a_pedido(request, config)
+        if modo:
+            return self._perfilar_a_pedido(request, modo, config)
+
+        if config['FRACCION'] and random.random() < config['FRACCION']:
+            response, perfil = self._perfilar(request)
+            guardar_perfil(perfil, _descripcion(request), config)
+            return response
+
+        with muestreador_lentos.vigilar(_descripcion(request)):
+            return self.get_response(request)
+
+    def _modo_a_pedido(self, request, config):
+        modo = request.GET.get(config['PARAMETRO']) or request.headers.get(config['HEADER'])
+        if not modo:
+            return None
+        # Para el resto de los usuarios el pedido de perfilado se ignora
+        user = _usuario_api(request)
+        if user is None or not user.is_staff:
+            return None
+        return modo
+
+    def _perfilar(self, request):
+        perfil = cProfile.Profile()
+        perfil.enable()
+        try:
+            response = self.get_response(request)
+        finally:
+            perfil.disable()
+        return response, perfil
+
+    def _perfilar_a_pedido(self, request, modo, config):
+        response, perfil = self._perfilar(request)
+
+        if modo == 'guardar':
+            archivo = guardar_perfil(perfil, _descripcion(request), config)
+            response['X-Perfil'] = os.path.basename(archivo)
+            return response
+
+        salida = io.StringIO()
+        estadisticas = pstats.Stats(perfil, stream=salida)
+        estadisticas.sort_stats(pstats.SortKey.CUMULATIVE).print_stats(config['LINEAS'])
+        perfilado = HttpResponse(salida.getvalue(), content_type='text/plain; charset=utf-8')
+        perfilado['X-Perfil-Status'] = response.status_code
+        return perfilado
+
+
+class _Vigilado:
+    def __init__(self, descripcion):
+        self.descripcion = descripcion
+        self.hilo_id = threading.get_ident()
+        self.inicio = time.monotonic()
+        self.muestras = Counter()
+
+
+class MuestreadorLentos:
+    """
+    Muestrea las pilas de los requests en curso que superan el umbral de
+    latencia. Los requests rápidos solo se registran y desregistran, sin
+    costo de perfilado: el hilo de muestreo duerme hasta que el request más
+    viejo llega al umbral y solo entonces muestrea cada INTERVALO_MUESTREO.
+
+    Los requests se registran por objeto y no por hilo: bajo ASGI varios
+    requests pueden compartir un hilo. En ese caso la pila del hilo se
+    atribuye al último request que empezó en él, que es el que está corriendo.
+    """
+
+    def __init__(self):
+        self._condicion = threading.Condition()
+        self._vigilados = set()
+        self._hilo = None
+
+    @contextmanager
+    def vigilar(self, descripcion):
+        vigilado = _Vigilado(descripcion)
+        with self._condicion:
+            if not self._vigilados:
+                # El hilo de muestreo espera sin límite mientras no hay requests
+                self._condicion.notify()
+            self._vigilados.add(vigilado)
+            if self._hilo is None:
+                self._hilo = threading.Thread(target=self._muestrear, daemon=True)
+                self._hilo.start()
+        try:
+            yield vigilado
+        finally:
+            with self._condicion:
+                self._vigilados.discard(vigilado)
+            if vigilado.muestras:
+                guardar_pilas(vigilado, time.monotonic() - vigilado.inicio, _config())
+
+    def _muestrear(self):
+        while True:
+            config = _config()
+            with self._condicion:
+                if not self._vigilados:
+                    self._condicion.wait()
+                    continue
+                espera = (
+                    min(vigilado.inicio for vigilado in self._vigilados)
+                    + config['UMBRAL_SEGUNDOS'] - time.monotonic()
+                )
+                if espera > 0:
+                    self._condicion.wait(espera)
+                    continue
+                self._tomar_muestras(time.monotonic() - config['UMBRAL_SEGUNDOS'])
+            time.sleep(config['INTERVALO_MUESTREO'])
+
+    def _tomar_muestras(self, limite):
+        # Por hilo, el request que empezó último es el que está corriendo
+        corriendo = {}
+        for vigilado in sorted(self._vigilados, key=lambda vigilado: vigilado.inicio):
+            corriendo[vigilado.hilo_id] = vigilado
+        frames = sys._current_frames()
+        for hilo_id, vigilado in corriendo.items():
+            frame = frames.get(hilo_id)
+            if vigilado.inicio <= limite and frame is not None:
+                vigilado.muestras[_pila(frame)] += 1
+
+
+muestreador_lentos = MuestreadorLentos()
+
+
+def _pila(frame):
+    funciones = []
+    while frame is not None:
+        codigo = frame.f_code
+        funciones.append(f'{codigo.co_name} ({os.path.basename(codigo.co_filename)})')
+        frame = frame.f_back
+    return ';'.join(reversed(funciones))
+
+
+def _usuario_api(request):
+    """
+    Usuario del request según las autenticaciones de la API (sesión, basic,
+    token...), no solo la sesión: el middleware corre antes que la vista de DRF
+    """
+    autenticado = Request(
+        request,
+        authenticators=[clase() for clase in api_settings.DEFAULT_AUTHENTICATION_CLASSES]
+    )
+    try:
+        return autenticado.user
+    except exceptions.APIException:
+        return None
+
+
+def _descripcion(request):
+    return f'{request.method} {request.path}'
+
+
+def _ruta_nueva(descripcion, extension, config):
+    directorio = config['DIRECTORIO']
+    os.makedirs(directorio, exist_ok=True)
+    nombre = ''.join(c if c.isalnum() else '_' for c in descripcion).strip('_')
+    marca = datetime.now().strftime('%Y%m%d-%H%M%S-%f')
+    return os.path.join(directorio, f'{marca}-{nombre}.{extension}')
+
+
+def guardar_perfil(perfil, descripcion, config):
+    """Guarda un perfil de cProfile (legible con pstats), retorna la ruta"""
+    ruta = _ruta_nueva(descripcion, 'prof', config)
+    perfil.dump_stats(ruta)
+    podar_directorio(config)
+    return ruta
+
+
+def guardar_pilas(vigilado, duracion, config):
+    """Guarda las pilas muestreadas de un request lento, retorna la ruta"""
+    ruta = _ruta_nueva(vigilado.descripcion, 'pilas', config)
+    with open(ruta, 'w', encoding='utf-8') as archivo:
+        archivo.write(f'# {vigilado.descripcion} {duracion:.3f}s\n')
+        for pila, cantidad in vigilado.muestras.most_common():
+            archivo.write(f'{pila} {cantidad}\n')
+    podar_directorio(config)
+    return ruta
+
+
+def podar_directorio(config):
+    """Elimina los perfiles más viejos hasta respetar el tamaño máximo del directorio"""
+    directorio = config['DIRECTORIO']
+    archivos = []
+    for entrada in os.scandir(directorio):
+        if entrada.is_file():
+            info = entrada.stat()
+            archivos.append((info.st_mtime, entrada.path, info.st_size))
+    archivos.sort()
+
+    total = sum(tamano for _, _, tamano in archivos)
+    for _, ruta, tamano in archivos:
+        if total <= config['MAX_BYTES']:
+            break
+        try:
+            os.remove(ruta)
+        except FileNotFoundError:
+            pass
+        total -= tamano
@@ -0,0 +1,44 @@
+from rest_framework.renderers import JSONRenderer
+from rest_framework.utils import encoders
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - depende del entorno
+    orjson = None
+
+
+class JSONRapidoRenderer(JSONRenderer):
+    """
+    Renderer JSON con orjson cuando está instalado
+
+    - orjson escribe directamente los bytes de la respuesta (sin pasar por
+      un str intermedio) y codifica datetime y UUID de forma nativa
+    - Decimal y el resto de los tipos que orjson no conoce se codifican
+      igual que en DRF (rest_framework.utils.encoders.JSONEncoder)
+    - Sin orjson, o si el cliente pide indentación distinta de 2, se usa
+      el JSONRenderer de DRF (json de la biblioteca estándar)
+    """
+    opciones = (
+        orjson.OPT_UTC_Z | orjson.OPT_NON_STR_KEYS
+        if orjson is not None else 0
+    )
+
+    def __init__(self):
+        self._codificador = encoders.JSONEncoder()
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if orjson is None:
+            return super().render(data, accepted_media_type, renderer_context)
+
+        if data is None:
+            return b''
+
+        renderer_context = renderer_context or {}
+        indent = self.get_indent(accepted_media_type, renderer_context)
+        opciones = self.opciones
+        if indent:
+            if indent != 2:
+                return super().render(data, accepted_media_type, renderer_context)
+            opciones |= orjson.OPT_INDENT_2
+
+        return orjson.dumps(data, default=self._codificador.default, option=opciones)
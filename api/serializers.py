@@ -1,9 +1,29 @@
+from collections import Counter
 from rest_framework import serializers
-from rapihogar.models import Tecnico, Pedido
+from rapihogar.models import Tecnico, Pedido, CambioPedido, Scheme, User
+from rapihogar.escalas import construir_escalas
 
 
+# Totales de liquidación compartidos por el detalle y el listado de técnicos.
+# Usan los valores anotados con con_liquidacion() cuando estén disponibles
+class TotalesLiquidacionMixin:
+    def get_total_hours_worked(self, obj):
+        if hasattr(obj, 'horas_trabajadas'):
+            return obj.horas_trabajadas
+        return obj.total_hours_worked()
+    
+    def get_total_pedidos(self, obj):
+        if hasattr(obj, 'cantidad_pedidos'):
+            return obj.cantidad_pedidos
+        return obj.total_pedidos()
+    
+    def get_total_payment(self, obj):
+        if hasattr(obj, 'pago'):
+            return round(obj.pago, 2)
+        return round(obj.calculate_payment(), 2)
+
 # Serializer para el modelo Técnico
-class TecnicoSerializer(serializers.ModelSerializer):
+class TecnicoSerializer(TotalesLiquidacionMixin, serializers.ModelSerializer):
     full_name = serializers.CharField(read_only=True)
     total_hours_worked = serializers.SerializerMethodField()
     total_pedidos = serializers.SerializerMethodField()
@@ -17,18 +37,54 @@ class TecnicoSerializer(serializers.ModelSerializer):
             'total_hours_worked', 'total_pedidos', 'total_payment'
         ]
         read_only_fields = ['date_joined']
-    
-    def get_total_hours_worked(self, obj):
-        return obj.total_hours_worked()
-    
-    def get_total_pedidos(self, obj):
-        return obj.total_pedidos()
-    
-    def get_total_payment(self, obj):
-        return round(obj.calculate_payment(), 2)
+
+# Serializers para el detalle de un técnico con el desglose de sus pedidos
+class DesgloseEsquemaSerializer(serializers.Serializer):
+    scheme_id = serializers.IntegerField(allow_null=True)
+    esquema = serializers.CharField(allow_null=True)
+    horas = serializers.IntegerField()
+    pedidos = serializers.IntegerField()
+
+
+class DesgloseMesSerializer(serializers.Serializer):
+    mes = serializers.CharField(allow_null=True)
+    horas = serializers.IntegerField()
+    pedidos = serializers.IntegerField()
+
+
+class HistoricoTecnicoSerializer(serializers.Serializer):
+    horas = serializers.IntegerField()
+    pedidos = serializers.IntegerField()
+    hasta = serializers.DateTimeField(allow_null=True)
+
+
+class TecnicoDetalleSerializer(TecnicoSerializer):
+    por_esquema = DesgloseEsquemaSerializer(many=True, read_only=True)
+    por_mes = DesgloseMesSerializer(many=True, read_only=True)
+    historico = serializers.SerializerMethodField()
+
+    class Meta(TecnicoSerializer.Meta):
+        fields = TecnicoSerializer.Meta.fields + ['por_esquema', 'por_mes', 'historico']
+
+    # Horas y pedidos archivados, None si el técnico no tiene
+    def get_historico(self, obj):
+        historico = getattr(obj, 'historico', None)
+        if historico is None:
+            return None
+        return HistoricoTecnicoSerializer(historico).data
+
+# Limitar los campos serializados a los pedidos por el cliente (?fields=)
+class CamposSolicitadosMixin:
+    def __init__(self, *args, **kwargs):
+        campos = kwargs.pop('fields', None)
+        super().__init__(*args, **kwargs)
+        if campos is not None:
+            for nombre in set(self.fields) - set(campos):
+                self.fields.pop(nombre)
 
 # Serializer para listado de técnicos
-class TecnicoListSerializer(serializers.ModelSerializer):
+class TecnicoListSerializer(CamposSolicitadosMixin, TotalesLiquidacionMixin,
+                            serializers.ModelSerializer):
     full_name = serializers.CharField(read_only=True)
     total_hours_worked = serializers.SerializerMethodField()
     total_pedidos = serializers.SerializerMethodField()
@@ -40,15 +96,29 @@ class TecnicoListSerializer(serializers.ModelSerializer):
             'id', 'full_name', 'total_hours_worked', 
             'total_pedidos', 'total_payment'
         ]
-    
-    def get_total_hours_worked(self, obj):
-        return obj.total_hours_worked()
-    
-    def get_total_pedidos(self, obj):
-        return obj.total_pedidos()
-    
-    def get_total_payment(self, obj):
-        return round(obj.calculate_payment(), 2)
+
+# Serializers para las estadísticas de distribución de pagos del informe
+class TramoHistogramaSerializer(serializers.Serializer):
+    desde = serializers.FloatField()
+    hasta = serializers.FloatField()
+    tecnicos = serializers.IntegerField()
+
+
+class EscalaTecnicosSerializer(serializers.Serializer):
+    etiqueta = serializers.CharField()
+    tecnicos = serializers.IntegerField()
+
+
+class EstadisticasPagoSerializer(serializers.Serializer):
+    cantidad = serializers.IntegerField()
+    minimo = serializers.FloatField(allow_null=True)
+    maximo = serializers.FloatField(allow_null=True)
+    p10 = serializers.FloatField(allow_null=True)
+    mediana = serializers.FloatField(allow_null=True)
+    p90 = serializers.FloatField(allow_null=True)
+    histograma = TramoHistogramaSerializer(many=True)
+    escalas = EscalaTecnicosSerializer(many=True)
+
 
 #  Serializer para el informe de técnicos
 class InformeSerializer(serializers.Serializer):
@@ -62,6 +132,9 @@ class InformeSerializer(serializers.Serializer):
     total_horas_sistema = serializers.IntegerField()
     total_pedidos_sistema = serializers.IntegerField()
 
+    # Distribución de pagos (opcional, ?estadisticas=true)
+    estadisticas = EstadisticasPagoSerializer(required=False)
+
 
 #  Serializer para el modelo Pedido (para updates opcionales)
 class PedidoSerializer(serializers.ModelSerializer):
@@ -84,4 +157,135 @@ class PedidoSerializer(serializers.ModelSerializer):
             raise serializers.ValidationError(
                 "horas trabajadas negativas no son permitidas."
             )
-        return value
\ No newline at end of file
+        return value
+
+
+# Serializers para la carga de pedidos en lote
+class PedidoLoteSerializer(serializers.Serializer):
+    clave = serializers.CharField(max_length=100)
+    type_request = serializers.ChoiceField(choices=Pedido.TIPO_PEDIDO, default=Pedido.PEDIDO)
+    client = serializers.IntegerField(min_value=1)
+    tecnico = serializers.IntegerField(min_value=1, required=False, allow_null=True, default=None)
+    scheme = serializers.IntegerField(min_value=1, required=False, allow_null=True, default=None)
+    hours_worked = serializers.IntegerField(min_value=0)
+
+
+class IngresoPedidosSerializer(serializers.Serializer):
+    pedidos = PedidoLoteSerializer(many=True, allow_empty=False, max_length=1000)
+
+    # Relaciones que se validan con una consulta por modelo
+    RELACIONES = (('client', User), ('tecnico', Tecnico), ('scheme', Scheme))
+
+    def validate(self, attrs):
+        """
+        Separa los pedidos cuya clave ya se cargó (un reintento) y valida las
+        relaciones de los nuevos con una consulta por modelo
+        """
+        pedidos = attrs['pedidos']
+        errores = [{} for _ in pedidos]
+
+        repetidas = Counter(pedido['clave'] for pedido in pedidos)
+        for indice, pedido in enumerate(pedidos):
+            if repetidas[pedido['clave']] > 1:
+                errores[indice]['clave'] = ['Clave repetida dentro del lote.']
+
+        existentes = dict(
+            Pedido.objects.filter(clave_idempotencia__in=list(repetidas))
+            .order_by()
+            .values_list('clave_idempotencia', 'id')
+        )
+        nuevos = [
+            (indice, pedido) for indice, pedido in enumerate(pedidos)
+            if pedido['clave'] not in existentes
+        ]
+
+        for campo, modelo in self.RELACIONES:
+            ids = {pedido[campo] for _, pedido in nuevos if pedido[campo] is not None}
+            validos = set(
+                modelo.objects.filter(id__in=ids).order_by().values_list('id', flat=True)
+            ) if ids else set()
+            for indice, pedido in nuevos:
+                if pedido[campo] is not None and pedido[campo] not in validos:
+                    errores[indice][campo] = [f'No existe {campo} con id {pedido[campo]}.']
+
+        if any(errores):
+            raise serializers.ValidationError({'pedidos': errores})
+
+        attrs['existentes'] = existentes
+        return attrs
+
+    def create(self, validated_data):
+        """
+        Crea los pedidos nuevos en lote (ver PedidoQuerySet.crear_en_lote) y
+        retorna el id de cada pedido del lote
+        """
+        existentes = validated_data['existentes']
+        nuevos = [
+            Pedido(
+                clave_idempotencia=pedido['clave'],
+                type_request=pedido['type_request'],
+                client_id=pedido['client'],
+                tecnico_id=pedido['tecnico'],
+                scheme_id=pedido['scheme'],
+                hours_worked=pedido['hours_worked'],
+            )
+            for pedido in validated_data['pedidos']
+            if pedido['clave'] not in existentes
+        ]
+        if nuevos:
+            Pedido.objects.crear_en_lote(nuevos)
+
+        ids = {**existentes, **{pedido.clave_idempotencia: pedido.id for pedido in nuevos}}
+        return {
+            'creados': len(nuevos),
+            'existentes': len(existentes),
+            'pedidos': [
+                {
+                    'clave': pedido['clave'],
+                    'id': ids[pedido['clave']],
+                    'creado': pedido['clave'] not in existentes,
+                }
+                for pedido in validated_data['pedidos']
+            ],
+        }
+
+
+# Serializers para la simulación de liquidación con escalas alternativas
+class EscalaSerializer(serializers.Serializer):
+    hasta = serializers.IntegerField(min_value=0, allow_null=True, default=None)
+    valor_hora = serializers.FloatField(min_value=0)
+    descuento = serializers.FloatField(min_value=0, max_value=1)
+
+
+class SimulacionLiquidacionSerializer(serializers.Serializer):
+    escalas = EscalaSerializer(many=True)
+
+    # Validar que la tabla de escalas sea consistente
+    def validate_escalas(self, value):
+        try:
+            return construir_escalas(value)
+        except ValueError as e:
+            raise serializers.ValidationError(str(e))
+
+
+# Serializer para la consulta de técnicos por lote
+class LoteTecnicosSerializer(serializers.Serializer):
+    ids = serializers.ListField(
+        child=serializers.IntegerField(min_value=1),
+        allow_empty=False,
+        max_length=500
+    )
+
+
+# Serializer para el feed de cambios de pedidos
+class CambioPedidoSerializer(serializers.ModelSerializer):
+
+    class Meta:
+        model = CambioPedido
+        fields = [
+            'id', 'pedido_id', 'operacion',
+            'horas_antes', 'horas_despues',
+            'tecnico_antes', 'tecnico_despues',
+            'scheme_antes', 'scheme_despues',
+            'creado_en'
+        ]
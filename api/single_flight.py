@@ -0,0 +1,117 @@
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+
+from rapihogar.models import VersionLiquidacion
+
+from .metricas import registrar_cache
+
+
+class _Llamada:
+    def __init__(self):
+        self.evento = threading.Event()
+        self.resultado = None
+        self.error = None
+
+
+class SingleFlight:
+    """
+    Coalescencia de cálculos dentro de un proceso
+
+    Las llamadas concurrentes con la misma clave comparten un único cálculo
+    en curso: la primera lo ejecuta y las demás esperan su resultado.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._en_curso = {}
+
+    def ejecutar(self, clave, funcion):
+        with self._lock:
+            llamada = self._en_curso.get(clave)
+            lider = llamada is None
+            if lider:
+                llamada = self._en_curso[clave] = _Llamada()
+
+        if not lider:
+            llamada.evento.wait()
+            if llamada.error is not None:
+                raise llamada.error
+            return llamada.resultado
+
+        try:
+            llamada.resultado = funcion()
+        except Exception as e:
+            llamada.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._en_curso[clave]
+            llamada.evento.set()
+        return llamada.resultado
+
+
+single_flight = SingleFlight()
+
+
+def obtener_cacheado(clave, funcion):
+    """
+    Retorna el valor de 'funcion' guardado en el cache de Django
+
+    - Es válido mientras no cambie la versión de liquidación ni venza el TTL
+    - Al quedar desactualizado, un lock en el cache elige un único proceso
+      que lo recalcula; los demás sirven el valor anterior mientras tanto
+    - Dentro del proceso, los requests concurrentes comparten el cálculo
+    """
+    version = VersionLiquidacion.actual()
+    entrada = cache.get(clave)
+    vigente = _vigente(entrada, version)
+    registrar_cache('reportes', vigente)
+    if vigente:
+        return entrada['valor']
+    return single_flight.ejecutar(clave, lambda: _recalcular(clave, funcion, version))
+
+
+def _vigente(entrada, version):
+    return (
+        entrada is not None
+        and entrada['version'] == version
+        and entrada['vence'] > time.time()
+    )
+
+
+def _recalcular(clave, funcion, version):
+    config = settings.CACHE_REPORTES
+    clave_lock = f'{clave}:lock'
+
+    # Otro request del proceso pudo haberlo recalculado mientras esperábamos
+    entrada = cache.get(clave)
+    if _vigente(entrada, version):
+        return entrada['valor']
+
+    if not cache.add(clave_lock, 1, config['TIMEOUT_LOCK']):
+        # Otro proceso lo está recalculando: servir el valor anterior si existe
+        if entrada is not None:
+            return entrada['valor']
+
+        # Sin valor anterior, esperar brevemente el resultado del otro proceso
+        limite = time.time() + config['ESPERA_MAXIMA']
+        while time.time() < limite:
+            time.sleep(0.05)
+            entrada = cache.get(clave)
+            if entrada is not None:
+                return entrada['valor']
+        return funcion()
+
+    try:
+        valor = funcion()
+        cache.set(
+            clave,
+            {'valor': valor, 'version': version, 'vence': time.time() + config['TTL']},
+            config['TTL'] + config['GRACIA']
+        )
+        return valor
+    finally:
+        cache.delete(clave_lock)
@@ -0,0 +1,199 @@
+"""
+Endpoint Server-Sent Events con los cambios de la liquidación, servido por la app ASGI
+"""
+import asyncio
+import io
+import json
+import logging
+import math
+import time
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.auth.middleware import AuthenticationMiddleware
+from django.contrib.sessions.middleware import SessionMiddleware
+from django.core.handlers.asgi import ASGIRequest
+from django.db import close_old_connections
+from django.urls import ResolverMatch
+from rest_framework import exceptions
+from rest_framework.request import Request
+from rest_framework.settings import api_settings
+
+from rapihogar.eventos import publicador
+
+from .metricas import registro
+from .throttling import CostoThrottle
+
+logger = logging.getLogger(__name__)
+
+# Espera del cliente antes de reconectarse, en milisegundos
+REINTENTO_MS = 2000
+
+
+def evento_sse(tipo, cursor, datos):
+    """Codifica un evento en el formato de text/event-stream"""
+    lineas = []
+    if cursor is not None:
+        lineas.append(f'id: {cursor}')
+    lineas.append(f'event: {tipo}')
+    lineas.append(f'data: {json.dumps(datos, separators=(",", ":"), default=str)}')
+    return ('\n'.join(lineas) + '\n\n').encode()
+
+
+# Nombre con el que el stream se informa en el throttle y las métricas
+NOMBRE_URL = 'eventos-liquidacion'
+
+
+async def _responder(send, estado, datos, headers=()):
+    await send({
+        'type': 'http.response.start',
+        'status': estado,
+        'headers': [(b'content-type', b'application/json'), *headers],
+    })
+    await send({'type': 'http.response.body', 'body': json.dumps(datos).encode()})
+
+
+async def _esperar_desconexion(receive):
+    while (await receive())['type'] != 'http.disconnect':
+        pass
+
+
+def _autorizar(scope):
+    """
+    Autentica y limita la conexión como a los demás endpoints de la API: el
+    stream se atiende fuera de Django, sin middleware ni vistas de DRF.
+
+    Retorna None si la conexión se acepta, o (estado, datos, headers) del error.
+    """
+    close_old_connections()
+    try:
+        request = ASGIRequest(scope, io.BytesIO())
+        request.resolver_match = ResolverMatch(eventos_liquidacion, (), {}, url_name=NOMBRE_URL)
+        SessionMiddleware(lambda request: None).process_request(request)
+        AuthenticationMiddleware(lambda request: None).process_request(request)
+        autenticado = Request(
+            request,
+            authenticators=[clase() for clase in api_settings.DEFAULT_AUTHENTICATION_CLASSES]
+        )
+        try:
+            usuario = autenticado.user
+        except exceptions.APIException as e:
+            return e.status_code, {'error': str(e.detail)}, ()
+
+        if settings.EVENTOS_LIQUIDACION['SOLO_AUTENTICADOS'] and not usuario.is_authenticated:
+            return 401, {'error': 'Las credenciales de autenticación no se proveyeron.'}, ()
+
+        throttle = CostoThrottle()
+        if not throttle.allow_request(autenticado, None):
+            espera = str(math.ceil(throttle.wait() or 1)).encode()
+            return 429, {'error': 'Demasiadas conexiones, reintente más tarde'}, ((b'retry-after', espera), )
+        return None
+    finally:
+        close_old_connections()
+
+
+def _registrar_metricas(estado, inicio):
+    if settings.METRICAS['HABILITADO']:
+        metricas = registro()
+        # Se mide la apertura del stream, no su duración
+        metricas.registrar_request(metricas.endpoint(NOMBRE_URL), estado, time.perf_counter() - inicio, 0)
+
+
+def _ultimo_evento(scope):
+    """Cursor del header Last-Event-ID que envía el navegador al reconectarse"""
+    for nombre, valor in scope['headers']:
+        if nombre == b'last-event-id':
+            try:
+                return int(valor)
+            except ValueError:
+                return None
+    return None
+
+
+async def _emitir(send, suscripcion, cursor, informe, ultimo):
+    async def enviar(contenido):
+        await send({'type': 'http.response.body', 'body': contenido, 'more_body': True})
+
+    await enviar(f'retry: {REINTENTO_MS}\n\n'.encode())
+
+    # Reconexión: los técnicos que cambiaron mientras el cliente no estaba
+    if ultimo is not None and ultimo < cursor:
+        tecnicos, completo = await publicador.ponerse_al_dia(ultimo)
+        if not completo:
+            await enviar(evento_sse('resincronizar', cursor, {}))
+        elif tecnicos:
+            await enviar(evento_sse('tecnicos', cursor, {'tecnicos': tecnicos}))
+
+    await enviar(evento_sse('informe', cursor, informe))
+
+    keepalive = settings.EVENTOS_LIQUIDACION['KEEPALIVE']
+    while True:
+        evento = await suscripcion.siguiente(keepalive)
+        if evento is None:
+            await enviar(b': keepalive\n\n')
+        else:
+            await enviar(evento_sse(*evento))
+
+
+async def eventos_liquidacion(scope, receive, send):
+    """
+    Stream de eventos de la liquidación (GET /api/eventos/)
+
+    Eventos:
+    - informe: totales del informe; se envía al conectarse y cada vez que cambian
+    - tecnicos: horas, pedidos y pago actuales de los técnicos afectados por
+      una escritura
+    - resincronizar: el cliente se atrasó y debe volver a leer /api/tecnicos/
+
+    El id de cada evento es el cursor del feed de cambios de pedidos: al
+    reconectarse con Last-Event-ID el cliente recibe los técnicos que
+    cambiaron mientras estuvo desconectado.
+
+    Requiere un usuario autenticado (sesión, basic o token de la API) y
+    cada conexión pasa por el throttle por costo.
+    """
+    inicio = time.perf_counter()
+    if scope['method'] != 'GET':
+        _registrar_metricas(405, inicio)
+        await _responder(send, 405, {'error': 'Método no permitido'})
+        return
+
+    try:
+        rechazo = await sync_to_async(_autorizar)(scope)
+        if rechazo is not None:
+            estado, datos, headers = rechazo
+            _registrar_metricas(estado, inicio)
+            await _responder(send, estado, datos, headers)
+            return
+        suscripcion, cursor, informe = await publicador.suscribir()
+    except Exception as e:
+        logger.error(f'Error en API Eventos: {str(e)}')
+        _registrar_metricas(500, inicio)
+        await _responder(send, 500, {'error': 'Error al iniciar los eventos'})
+        return
+
+    _registrar_metricas(200, inicio)
+
+    tareas = []
+    try:
+        await send({
+            'type': 'http.response.start',
+            'status': 200,
+            'headers': [
+                (b'content-type', b'text/event-stream'),
+                (b'cache-control', b'no-cache'),
+                # Sin buffer en nginx: cada evento se entrega al llegar
+                (b'x-accel-buffering', b'no'),
+            ],
+        })
+        emisor = asyncio.create_task(
+            _emitir(send, suscripcion, cursor, informe, _ultimo_evento(scope))
+        )
+        tareas = [emisor, asyncio.create_task(_esperar_desconexion(receive))]
+        await asyncio.wait(tareas, return_when=asyncio.FIRST_COMPLETED)
+        if emisor.done() and not emisor.cancelled() and emisor.exception():
+            logger.debug(f'API Eventos: conexión terminada: {emisor.exception()}')
+    finally:
+        for tarea in tareas:
+            tarea.cancel()
+        publicador.cancelar(suscripcion)
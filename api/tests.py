@@ -1,9 +1,18 @@
 import json
+import os
+import shutil
+import tempfile
+import time
 from decimal import Decimal
-from django.test import TestCase
+from django.conf import settings
+from django.core.cache import cache
+from django.test import LiveServerTestCase, TestCase, TransactionTestCase, override_settings
 from django.contrib.auth import get_user_model
 from rest_framework import status
-from rapihogar.models import Tecnico, Pedido, Scheme, Company
+from rapihogar.models import Tecnico, Pedido, Scheme, Company, CambioPedido, Trabajo, VersionLiquidacion
+from rapihogar.indice_pagos import indice_pagos
+from rapihogar.cola import encolar, metricas, procesar_pendientes
+from api.perfilado import muestreador_lentos, podar_directorio
 from django.urls import reverse
 
 from rest_framework.authtoken.models import Token
@@ -11,6 +20,22 @@ from rest_framework.test import APITestCase
 
 User = get_user_model()
 
+_metricas_de_tests = None
+
+
+def setUpModule():
+    # Las métricas de los requests de los tests no van al directorio compartido
+    global _metricas_de_tests
+    directorio = tempfile.mkdtemp()
+    _metricas_de_tests = override_settings(METRICAS={**settings.METRICAS, 'DIRECTORIO': directorio})
+    _metricas_de_tests.enable()
+
+
+def tearDownModule():
+    _metricas_de_tests.disable()
+    shutil.rmtree(_metricas_de_tests.options['METRICAS']['DIRECTORIO'], ignore_errors=True)
+
+
 class CompanyListCreateAPIViewTestCase(APITestCase):
     url = reverse("company-list")
 
@@ -71,6 +96,24 @@ class TecnicoModelTest(TestCase):
         """Test del método __str__"""
         self.assertEqual(str(self.tecnico), 'Juan Pérez')
     
+    def test_save_revierte_si_fallan_los_datos_derivados(self):
+        """Test de que el técnico y sus datos derivados se guardan en la misma transacción"""
+        from django.db.models.signals import post_save
+
+        def fallar(sender, **kwargs):
+            raise RuntimeError('Error al actualizar los datos derivados')
+
+        post_save.connect(fallar, sender=Tecnico)
+        self.addCleanup(post_save.disconnect, fallar, sender=Tecnico)
+
+        with self.assertRaises(RuntimeError):
+            Tecnico(first_name='Ana', last_name='Gómez', email='ana.gomez@test.com').save()
+
+        self.assertFalse(Tecnico.objects.filter(email='ana.gomez@test.com').exists())
+        self.assertFalse(Trabajo.objects.filter(tarea='recalcular_totales').exclude(
+            clave=f'totales:{self.tecnico.id}'
+        ).exists())
+    
     def test_total_hours_worked_sin_pedidos(self):
         """Test de total_hours_worked sin pedidos"""
         self.assertEqual(self.tecnico.total_hours_worked(), 0)
@@ -190,10 +233,210 @@ class TecnicoAPITest(APITestCase):
         self.assertEqual(response.data['results'][0]['full_name'], 'Juan Pérez')
 
 
+
+class TecnicoOrdenFiltroAPITest(APITestCase):
+    """Tests de ordenamiento y filtros por horas y pago del listado de técnicos"""
+
+    def setUp(self):
+        self.cliente = User.objects.create_user(
+            email='cliente@test.com',
+            first_name='Cliente',
+            last_name='Test',
+            username='cliente_test'
+        )
+
+        self.scheme = Scheme.objects.create(name='Esquema Test')
+
+        # Técnicos con 10, 30 y 20 horas
+        self.tecnicos = []
+        for indice, horas in enumerate([10, 30, 20]):
+            tecnico = Tecnico.objects.create(
+                first_name=f'Tecnico{indice}',
+                last_name='Test',
+                email=f'tecnico{indice}@test.com'
+            )
+            Pedido.objects.create(
+                client=self.cliente,
+                tecnico=tecnico,
+                scheme=self.scheme,
+                hours_worked=horas
+            )
+            self.tecnicos.append(tecnico)
+
+    def test_totales_precalculados(self):
+        """Test de que los totales se actualizan al crear pedidos"""
+        tecnico = Tecnico.objects.get(pk=self.tecnicos[1].pk)
+        self.assertEqual(tecnico.horas_totales, 30)
+        self.assertEqual(tecnico.pedidos_totales, 1)
+        self.assertEqual(tecnico.pago_total, tecnico.calculate_payment())
+
+    def test_ordenar_por_pago(self):
+        """Test del ordenamiento por pago total descendente"""
+        url = reverse('tecnicos-list')
+        response = self.client.get(url, {'ordering': '-total_payment'})
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        horas = [t['total_hours_worked'] for t in response.data['results']]
+        self.assertEqual(horas, [30, 20, 10])
+
+    def test_filtrar_por_horas(self):
+        """Test del filtro por rango de horas"""
+        url = reverse('tecnicos-list')
+        response = self.client.get(url, {'min_hours': 15, 'max_hours': 25})
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(response.data['results']), 1)
+        self.assertEqual(response.data['results'][0]['total_hours_worked'], 20)
+
+    def test_filtrar_por_escala(self):
+        """Test del filtro por escala de pago"""
+        url = reverse('tecnicos-list')
+        response = self.client.get(url, {'tier': 3})
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(response.data['results']), 1)
+        self.assertEqual(response.data['results'][0]['id'], self.tecnicos[1].id)
+
+    def test_filtrar_por_escala_invalida(self):
+        """Test de escala inexistente"""
+        url = reverse('tecnicos-list')
+        response = self.client.get(url, {'tier': 9})
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_campos_parciales(self):
+        """Test de que ?fields= limita los campos y no lee los totales"""
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+
+        url = reverse('tecnicos-list')
+        with CaptureQueriesContext(connection) as consultas:
+            response = self.client.get(url, {'fields': 'id,full_name'})
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(set(response.data['results'][0]), {'id', 'full_name'})
+        for consulta in consultas:
+            self.assertNotIn('pago_total', consulta['sql'])
+            self.assertNotIn('horas_totales', consulta['sql'])
+
+    def test_campos_parciales_con_totales(self):
+        """Test de que los totales pedidos en ?fields= se siguen devolviendo"""
+        url = reverse('tecnicos-list')
+        response = self.client.get(url, {'fields': 'id,total_payment', 'ordering': '-total_payment'})
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(set(response.data['results'][0]), {'id', 'total_payment'})
+        self.assertEqual(response.data['results'][0]['id'], self.tecnicos[1].id)
+
+    def test_campos_desconocidos(self):
+        """Test de que un campo desconocido en ?fields= devuelve 400"""
+        url = reverse('tecnicos-list')
+        response = self.client.get(url, {'fields': 'id,email'})
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_consulta_por_lote(self):
+        """Test de la consulta por lote: orden pedido, una consulta e ids inexistentes"""
+        url = reverse('tecnicos-lote')
+        ids = [self.tecnicos[2].id, 9999, self.tecnicos[0].id, self.tecnicos[2].id]
+
+        with self.assertNumQueries(1):
+            response = self.client.post(url, {'ids': ids}, format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            [tecnico['id'] for tecnico in response.data['tecnicos']],
+            [self.tecnicos[2].id, self.tecnicos[0].id]
+        )
+        self.assertEqual(response.data['tecnicos'][0]['total_hours_worked'], 20)
+        self.assertEqual(response.data['no_encontrados'], [9999])
+
+    def test_consulta_por_lote_con_parametros(self):
+        """Test de la consulta por lote con ids repetidos en la URL"""
+        url = reverse('tecnicos-lote')
+        response = self.client.get(f'{url}?id={self.tecnicos[1].id}&id={self.tecnicos[0].id}')
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            [tecnico['total_hours_worked'] for tecnico in response.data['tecnicos']],
+            [30, 10]
+        )
+
+    def test_consulta_por_lote_invalida(self):
+        """Test de que un lote vacío o con ids inválidos devuelve 400"""
+        url = reverse('tecnicos-lote')
+
+        self.assertEqual(self.client.get(url).status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(
+            self.client.post(url, {'ids': ['abc']}, format='json').status_code,
+            status.HTTP_400_BAD_REQUEST
+        )
+
+
+class TecnicoDetalleAPITest(APITestCase):
+    """Tests para el detalle de un técnico con el desglose de sus pedidos"""
+
+    def setUp(self):
+        from datetime import datetime, timezone as tz
+
+        self.tecnico = Tecnico.objects.create(
+            first_name='Juan',
+            last_name='Pérez',
+            email='juan.perez@test.com'
+        )
+        cliente = User.objects.create_user(
+            email='cliente@test.com',
+            first_name='Cliente',
+            last_name='Test',
+            username='cliente_test'
+        )
+        self.scheme1 = Scheme.objects.create(name='Esquema 1')
+        self.scheme2 = Scheme.objects.create(name='Esquema 2')
+
+        for scheme, horas, fecha in [
+            (self.scheme1, 5, datetime(2024, 1, 10, tzinfo=tz.utc)),
+            (self.scheme1, 7, datetime(2024, 2, 3, tzinfo=tz.utc)),
+            (self.scheme2, 4, datetime(2024, 2, 20, tzinfo=tz.utc)),
+        ]:
+            pedido = Pedido.objects.create(
+                client=cliente, tecnico=self.tecnico, scheme=scheme, hours_worked=horas
+            )
+            Pedido.objects.filter(pk=pedido.pk).update(created_at=fecha)
+
+        self.url = reverse('tecnico-detalle', kwargs={'pk': self.tecnico.pk})
+
+    def test_detalle_con_desglose(self):
+        """Test de totales y desglose por esquema y por mes"""
+        with self.assertNumQueries(3):
+            response = self.client.get(self.url)
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['total_hours_worked'], 16)
+        self.assertEqual(response.data['total_pedidos'], 3)
+        self.assertEqual(response.data['total_payment'], round(self.tecnico.calculate_payment(), 2))
+        self.assertEqual(
+            [(fila['esquema'], fila['horas'], fila['pedidos']) for fila in response.data['por_esquema']],
+            [('Esquema 1', 12, 2), ('Esquema 2', 4, 1)]
+        )
+        self.assertEqual(
+            [(fila['mes'], fila['horas'], fila['pedidos']) for fila in response.data['por_mes']],
+            [('2024-01', 5, 1), ('2024-02', 11, 2)]
+        )
+
+    def test_detalle_inexistente(self):
+        """Test de técnico inexistente"""
+        response = self.client.get(reverse('tecnico-detalle', kwargs={'pk': 9999}))
+
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
 class InformeAPITest(APITestCase):
     """Tests para la API de informe"""
     
     def setUp(self):
+        # Baldes del throttle por costo limpios en cada test
+        cache.clear()
+        indice_pagos.invalidar()
+
         # Crear técnicos con diferentes pagos
         self.tecnico1 = Tecnico.objects.create(
             first_name='Juan',
@@ -256,15 +499,2066 @@ class InformeAPITest(APITestCase):
             self.assertIn(field, informe)
 
 
-class ManagementCommandTest(TestCase):
-    """Tests para los comandos de gestión"""
-    
-    def test_generar_pedidos_command_exists(self):
-        """Test de que el comando existe y es importable"""
-        from rapihogar.management.commands.generar_pedidos import Command
-        self.assertTrue(Command)
-    
-    def test_crear_tecnicos_command_exists(self):
-        """Test de que el comando crear_tecnicos existe"""
-        from rapihogar.management.commands.crear_tecnicos import Command
+
+
+class InformeEstadisticasAPITest(APITestCase):
+    """Tests para las estadísticas de distribución de pagos del informe"""
+
+    def setUp(self):
+        # Baldes del throttle por costo limpios en cada test
+        cache.clear()
+        indice_pagos.invalidar()
+
+        self.cliente = User.objects.create_user(
+            email='cliente@test.com',
+            first_name='Cliente',
+            last_name='Test',
+            username='cliente_test'
+        )
+
+        self.scheme = Scheme.objects.create(name='Esquema Test')
+
+        # Técnicos con 10, 20 y 30 horas: pagos 1700, 4200 y 7470
+        for indice, horas in enumerate([10, 20, 30]):
+            tecnico = Tecnico.objects.create(
+                first_name=f'Tecnico{indice}',
+                last_name='Test',
+                email=f'tecnico{indice}@test.com'
+            )
+            Pedido.objects.create(
+                client=self.cliente,
+                tecnico=tecnico,
+                scheme=self.scheme,
+                hours_worked=horas
+            )
+
+    def test_informe_estadisticas(self):
+        """Test de mediana, percentiles y técnicos por escala"""
+        url = reverse('informe-tecnicos')
+        response = self.client.get(url, {'estadisticas': 'true'})
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        estadisticas = response.data['informe']['estadisticas']
+
+        self.assertEqual(estadisticas['cantidad'], 3)
+        self.assertEqual(estadisticas['mediana'], 4200)
+        self.assertEqual(estadisticas['p10'], 2200)
+        self.assertEqual(estadisticas['p90'], 6816)
+        self.assertEqual(sum(t['tecnicos'] for t in estadisticas['histograma']), 3)
+        self.assertEqual(
+            [escala['tecnicos'] for escala in estadisticas['escalas']],
+            [1, 1, 1, 0]
+        )
+
+    def test_informe_sin_estadisticas(self):
+        """Test de que las estadísticas son opcionales"""
+        url = reverse('informe-tecnicos')
+        response = self.client.get(url)
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertNotIn('estadisticas', response.data['informe'])
+
+    def test_informe_estadisticas_consultas_constantes(self):
+        """Test de que el informe no hace consultas por técnico"""
+        url = reverse('informe-tecnicos')
+        self.client.get(url)
+        cache.clear()
+
+        # Versión (cache e índice) + técnicos del informe + estadísticas (agregado y recorrido)
+        with self.assertNumQueries(5):
+            self.client.get(url, {'estadisticas': 'true'})
+
+
+class IndicePagosTest(TestCase):
+    """Tests para el índice de pagos en memoria"""
+
+    def setUp(self):
+        self.cliente = User.objects.create_user(
+            email='cliente@test.com',
+            first_name='Cliente',
+            last_name='Test',
+            username='cliente_test'
+        )
+
+        self.scheme = Scheme.objects.create(name='Esquema Test')
+
+        self.tecnico1 = Tecnico.objects.create(
+            first_name='Juan',
+            last_name='Pérez',
+            email='juan.perez@test.com'
+        )
+
+        self.tecnico2 = Tecnico.objects.create(
+            first_name='María',
+            last_name='González',
+            email='maria.gonzalez@test.com'
+        )
+
+        # 10 horas = 1700 y 20 horas = 4200
+        Pedido.objects.create(
+            client=self.cliente,
+            tecnico=self.tecnico1,
+            scheme=self.scheme,
+            hours_worked=10
+        )
+        Pedido.objects.create(
+            client=self.cliente,
+            tecnico=self.tecnico2,
+            scheme=self.scheme,
+            hours_worked=20
+        )
+
+        # Índice del proceso, el que actualizan las señales
+        self.indice = indice_pagos
+        self.indice.invalidar()
+
+    def test_consultar(self):
+        """Test del resumen calculado por el índice"""
+        resumen = self.indice.consultar()
+
+        self.assertEqual(resumen['monto_promedio'], 2950)
+        self.assertEqual(resumen['tecnicos_bajo_promedio'], [self.tecnico1.id])
+        self.assertEqual(resumen['ultimo_trabajador_monto_bajo'], self.tecnico1.id)
+        self.assertEqual(resumen['ultimo_trabajador_monto_alto'], self.tecnico2.id)
+        self.assertEqual(resumen['total_horas_sistema'], 30)
+        self.assertEqual(resumen['total_pedidos_sistema'], 2)
+
+    def test_ultimo_ingresado_en_empate(self):
+        """Test de que en un empate gana el último técnico ingresado"""
+        tecnico3 = Tecnico.objects.create(
+            first_name='Pedro',
+            last_name='Gómez',
+            email='pedro.gomez@test.com'
+        )
+        Pedido.objects.create(
+            client=self.cliente,
+            tecnico=tecnico3,
+            scheme=self.scheme,
+            hours_worked=20
+        )
+
+        resumen = self.indice.consultar()
+        self.assertEqual(resumen['ultimo_trabajador_monto_alto'], tecnico3.id)
+
+    def test_actualizacion_incremental(self):
+        """Test de que un cambio propio actualiza el índice sin reconstruirlo"""
+        self.indice.consultar()
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Pedido.objects.create(
+                client=self.cliente,
+                tecnico=self.tecnico1,
+                scheme=self.scheme,
+                hours_worked=20
+            )
+
+        # Solo se consultan la versión vigente y el técnico modificado
+        with self.assertNumQueries(2):
+            resumen = self.indice.consultar()
+
+        self.assertEqual(resumen['ultimo_trabajador_monto_alto'], self.tecnico1.id)
+        self.assertEqual(resumen['total_horas_sistema'], 50)
+
+    def test_reconstruye_si_otro_proceso_escribio(self):
+        """Test de que una versión distinta en la base fuerza la reconstrucción"""
+        self.indice.consultar()
+
+        # Otro proceso modifica los datos y renueva la versión
+        Pedido.objects.filter(tecnico=self.tecnico1).update(hours_worked=30)
+        VersionLiquidacion.renovar()
+
+        with self.assertNumQueries(2):
+            resumen = self.indice.consultar()
+
+        self.assertEqual(resumen['ultimo_trabajador_monto_alto'], self.tecnico1.id)
+
+
+class SingleFlightTest(TestCase):
+    """Tests para la coalescencia de cálculos y el cache de reportes"""
+
+    def setUp(self):
+        cache.clear()
+        indice_pagos.invalidar()
+        self.llamadas = 0
+
+    def calcular(self):
+        self.llamadas += 1
+        return self.llamadas
+
+    def test_llamadas_concurrentes_comparten_calculo(self):
+        """Test de que los hilos concurrentes ejecutan un único cálculo"""
+        import threading
+        from api.single_flight import SingleFlight
+
+        single_flight = SingleFlight()
+        liberar = threading.Event()
+        resultados = []
+
+        def lento():
+            liberar.wait()
+            return self.calcular()
+
+        hilos = [
+            threading.Thread(target=lambda: resultados.append(single_flight.ejecutar('clave', lento)))
+            for _ in range(5)
+        ]
+        for hilo in hilos:
+            hilo.start()
+        liberar.set()
+        for hilo in hilos:
+            hilo.join()
+
+        self.assertEqual(self.llamadas, 1)
+        self.assertEqual(resultados, [1] * 5)
+
+    def test_cache_hasta_cambio_de_version(self):
+        """Test de que el valor se recalcula solo al cambiar los datos"""
+        from api.single_flight import obtener_cacheado
+
+        self.assertEqual(obtener_cacheado('reporte', self.calcular), 1)
+        self.assertEqual(obtener_cacheado('reporte', self.calcular), 1)
+
+        VersionLiquidacion.renovar()
+        self.assertEqual(obtener_cacheado('reporte', self.calcular), 2)
+
+    def test_sirve_valor_anterior_si_otro_proceso_recalcula(self):
+        """Test de que sin el lock se sirve el valor anterior"""
+        from api.single_flight import obtener_cacheado
+
+        obtener_cacheado('reporte', self.calcular)
+        VersionLiquidacion.renovar()
+
+        # Otro proceso tiene el lock de recálculo
+        cache.add('reporte:lock', 1)
+        self.assertEqual(obtener_cacheado('reporte', self.calcular), 1)
+        self.assertEqual(self.llamadas, 1)
+
+
+@override_settings(COLA_TRABAJOS={**settings.COLA_TRABAJOS, 'RECALCULO_EN_COLA': True})
+class ColaTrabajosTest(TestCase):
+    """Tests para la cola local de trabajos"""
+
+    def setUp(self):
+        self.tecnico = Tecnico.objects.create(
+            first_name='Juan',
+            last_name='Pérez',
+            email='juan.perez@test.com'
+        )
+
+        self.cliente = User.objects.create_user(
+            email='cliente@test.com',
+            first_name='Cliente',
+            last_name='Test',
+            username='cliente_test'
+        )
+        procesar_pendientes()
+
+    def test_escritura_encola_recalculo(self):
+        """Test de que los totales se recalculan fuera de la escritura"""
+        Pedido.objects.create(client=self.cliente, tecnico=self.tecnico, hours_worked=10)
+
+        self.tecnico.refresh_from_db()
+        self.assertEqual(self.tecnico.horas_totales, 0)
+        self.assertEqual(metricas()['profundidad'], 1)
+
+        procesar_pendientes()
+
+        self.tecnico.refresh_from_db()
+        self.assertEqual(self.tecnico.horas_totales, 10)
+        self.assertEqual(self.tecnico.pago_total, 1700)
+        self.assertEqual(metricas()['profundidad'], 0)
+
+    def test_deduplicacion_por_tecnico(self):
+        """Test de que varias escrituras del mismo técnico encolan un solo trabajo"""
+        for horas in [1, 2, 3]:
+            Pedido.objects.create(client=self.cliente, tecnico=self.tecnico, hours_worked=horas)
+
+        self.assertEqual(Trabajo.objects.filter(estado=Trabajo.PENDIENTE).count(), 1)
+
+    def test_sin_worker_recalcula_en_la_escritura(self):
+        """Test de que sin worker de la cola los totales se recalculan al escribir"""
+        with override_settings(COLA_TRABAJOS={**settings.COLA_TRABAJOS, 'RECALCULO_EN_COLA': False}):
+            Pedido.objects.create(client=self.cliente, tecnico=self.tecnico, hours_worked=10)
+
+        self.tecnico.refresh_from_db()
+        self.assertEqual(self.tecnico.horas_totales, 10)
+        self.assertEqual(metricas()['profundidad'], 0)
+
+    def test_reintento_con_backoff(self):
+        """Test de que un trabajo fallido vuelve a la cola con espera"""
+        encolar('recalcular_totales', tecnico_id='no-es-un-id')
+        procesar_pendientes()
+
+        trabajo = Trabajo.objects.get(tarea='recalcular_totales', clave=None)
+        self.assertEqual(trabajo.estado, Trabajo.PENDIENTE)
+        self.assertEqual(trabajo.intentos, 1)
+        self.assertGreater(trabajo.disponible_en, trabajo.creado_en)
+        self.assertTrue(trabajo.error)
+
+
+@override_settings(COLA_TRABAJOS={**settings.COLA_TRABAJOS, 'RECALCULO_EN_COLA': True})
+class ProcesarColaCommandTest(TransactionTestCase):
+    """Tests para el worker de la cola"""
+
+    def test_recupera_colgados_con_el_worker_corriendo(self):
+        """Test de que un worker ya iniciado recupera los trabajos en curso que vencieron"""
+        import threading
+        from datetime import timedelta
+        from io import StringIO
+        from django.core.management import call_command
+        from django.utils import timezone
+        from rapihogar.management.commands.procesar_cola import Command
+
+        tecnico = Tecnico.objects.create(first_name='Juan', last_name='Pérez', email='juan.perez@test.com')
+        cliente = User.objects.create_user(
+            email='cliente@test.com', first_name='Cliente', last_name='Test', username='cliente_test'
+        )
+        Pedido.objects.create(client=cliente, tecnico=tecnico, hours_worked=10)
+        Trabajo.objects.all().delete()
+
+        comando = Command(stdout=StringIO())
+        hilo = threading.Thread(target=call_command, args=(comando, '--intervalo', '0.05'))
+        hilo.start()
+        self.addCleanup(hilo.join)
+        self.addCleanup(comando._detener.set)
+        time.sleep(0.2)
+
+        # Trabajo de un worker anterior que se cayó, ya vencido el timeout
+        vencido = timezone.now() - timedelta(seconds=settings.COLA_TRABAJOS['TIMEOUT_EN_CURSO'] + 1)
+        trabajo = Trabajo.objects.create(
+            tarea='recalcular_totales',
+            parametros={'tecnico_id': tecnico.id},
+            estado=Trabajo.EN_CURSO,
+            intentos=1,
+            iniciado_en=vencido,
+        )
+
+        limite = time.time() + 5
+        while time.time() < limite:
+            trabajo.refresh_from_db()
+            if trabajo.estado == Trabajo.COMPLETADO:
+                break
+            time.sleep(0.05)
+
+        self.assertEqual(trabajo.estado, Trabajo.COMPLETADO)
+        tecnico.refresh_from_db()
+        self.assertEqual(tecnico.horas_totales, 10)
+
+class SimulacionLiquidacionAPITest(APITestCase):
+    """Tests para la API de simulación de liquidación"""
+
+    def setUp(self):
+        # Baldes del throttle por costo limpios en cada test
+        cache.clear()
+        indice_pagos.invalidar()
+
+        self.tecnico1 = Tecnico.objects.create(
+            first_name='Juan',
+            last_name='Pérez',
+            email='juan.perez@test.com'
+        )
+
+        self.tecnico2 = Tecnico.objects.create(
+            first_name='María',
+            last_name='González',
+            email='maria.gonzalez@test.com'
+        )
+
+        self.cliente = User.objects.create_user(
+            email='cliente@test.com',
+            first_name='Cliente',
+            last_name='Test',
+            username='cliente_test'
+        )
+
+        self.scheme = Scheme.objects.create(name='Esquema Test')
+
+        Pedido.objects.create(
+            client=self.cliente,
+            tecnico=self.tecnico1,
+            scheme=self.scheme,
+            hours_worked=10
+        )
+
+        Pedido.objects.create(
+            client=self.cliente,
+            tecnico=self.tecnico2,
+            scheme=self.scheme,
+            hours_worked=30
+        )
+
+        self.escalas = [
+            {'hasta': 14, 'valor_hora': 200, 'descuento': 0.15},
+            {'hasta': 28, 'valor_hora': 250, 'descuento': 0.16},
+            {'hasta': 47, 'valor_hora': 320, 'descuento': 0.17},
+            {'hasta': None, 'valor_hora': 350, 'descuento': 0.18},
+        ]
+
+    def test_simulacion_escala_29_47(self):
+        """Test de la simulación subiendo la escala 29-47 a 320"""
+        url = reverse('liquidacion-simular')
+        response = self.client.post(url, {'escalas': self.escalas}, format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        # 30 horas: (30 * 300) * 0.83 = 7470 -> (30 * 320) * 0.83 = 7968
+        self.assertEqual(response.data['total_actual'], 1700 + 7470)
+        self.assertEqual(response.data['total_simulado'], 1700 + 7968)
+        self.assertEqual(response.data['diferencia_total'], 498)
+
+        tecnicos_por_escala = [escala['tecnicos'] for escala in response.data['escalas']]
+        self.assertEqual(tecnicos_por_escala, [1, 0, 1, 0])
+
+        diferencias = {t['id']: t['diferencia'] for t in response.data['tecnicos']}
+        self.assertEqual(diferencias, {self.tecnico1.id: 0, self.tecnico2.id: 498})
+
+        # La simulación no modifica el pago vigente
+        self.assertEqual(self.tecnico2.calculate_payment(), 7470)
+
+    def test_simulacion_escalas_invalidas(self):
+        """Test de validación de escalas desordenadas"""
+        url = reverse('liquidacion-simular')
+        escalas = list(reversed(self.escalas))
+        response = self.client.post(url, {'escalas': escalas}, format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('escalas', response.data)
+
+
+
+class CambiosPedidosAPITest(APITestCase):
+    """Tests para el feed de cambios de pedidos"""
+
+    def setUp(self):
+        self.tecnico1 = Tecnico.objects.create(
+            first_name='Juan',
+            last_name='Pérez',
+            email='juan.perez@test.com'
+        )
+
+        self.tecnico2 = Tecnico.objects.create(
+            first_name='María',
+            last_name='González',
+            email='maria.gonzalez@test.com'
+        )
+
+        self.cliente = User.objects.create_user(
+            email='cliente@test.com',
+            first_name='Cliente',
+            last_name='Test',
+            username='cliente_test'
+        )
+
+        self.scheme = Scheme.objects.create(name='Esquema Test')
+        self.url = reverse('pedidos-cambios')
+
+    def test_registro_de_cambios(self):
+        """Test de que alta, modificación y baja quedan registradas con antes/después"""
+        pedido = Pedido.objects.create(
+            client=self.cliente,
+            tecnico=self.tecnico1,
+            scheme=self.scheme,
+            hours_worked=5
+        )
+        pedido_id = pedido.id
+
+        pedido = Pedido.objects.get(pk=pedido_id)
+        pedido.hours_worked = 8
+        pedido.tecnico = self.tecnico2
+        pedido.save()
+        pedido.delete()
+
+        response = self.client.get(self.url)
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        cambios = response.data['cambios']
+        self.assertEqual(
+            [cambio['operacion'] for cambio in cambios],
+            [CambioPedido.CREADO, CambioPedido.ACTUALIZADO, CambioPedido.ELIMINADO]
+        )
+        self.assertEqual(cambios[0]['horas_antes'], None)
+        self.assertEqual(cambios[0]['horas_despues'], 5)
+        self.assertEqual(cambios[1]['horas_antes'], 5)
+        self.assertEqual(cambios[1]['horas_despues'], 8)
+        self.assertEqual(cambios[1]['tecnico_antes'], self.tecnico1.id)
+        self.assertEqual(cambios[1]['tecnico_despues'], self.tecnico2.id)
+        self.assertEqual(cambios[2]['pedido_id'], pedido_id)
+        self.assertEqual(cambios[2]['horas_antes'], 8)
+        self.assertFalse(response.data['hay_mas'])
+
+    def test_consumo_por_cursor(self):
+        """Test de lectura incremental en lotes con el cursor"""
+        for horas in range(1, 6):
+            Pedido.objects.create(
+                client=self.cliente,
+                tecnico=self.tecnico1,
+                scheme=self.scheme,
+                hours_worked=horas
+            )
+
+        primero = self.client.get(self.url, {'limite': 3}).data
+        self.assertEqual(len(primero['cambios']), 3)
+        self.assertTrue(primero['hay_mas'])
+
+        segundo = self.client.get(self.url, {'cursor': primero['cursor'], 'limite': 3}).data
+        self.assertEqual(
+            [cambio['horas_despues'] for cambio in segundo['cambios']],
+            [4, 5]
+        )
+        self.assertFalse(segundo['hay_mas'])
+
+        # Sin cambios nuevos el cursor no avanza
+        tercero = self.client.get(self.url, {'cursor': segundo['cursor']}).data
+        self.assertEqual(tercero['cambios'], [])
+        self.assertEqual(tercero['cursor'], segundo['cursor'])
+
+    def test_ventana_de_seguridad(self):
+        """Test de que el cursor no avanza sobre cambios más recientes que la ventana"""
+        from datetime import timedelta
+        from django.utils import timezone
+
+        for horas in [1, 2, 3]:
+            Pedido.objects.create(
+                client=self.cliente,
+                tecnico=self.tecnico1,
+                scheme=self.scheme,
+                hours_worked=horas
+            )
+        # Solo el primer cambio es más antiguo que la ventana
+        primero = CambioPedido.objects.order_by('id').first()
+        CambioPedido.objects.filter(id=primero.id).update(
+            creado_en=timezone.now() - timedelta(seconds=120)
+        )
+
+        with override_settings(FEED_CAMBIOS={'VENTANA_SEGURIDAD': 60}):
+            response = self.client.get(self.url)
+
+        self.assertEqual([cambio['id'] for cambio in response.data['cambios']], [primero.id])
+        self.assertEqual(response.data['cursor'], primero.id)
+
+
+class PedidoConcurrenciaAPITest(APITestCase):
+    """Tests para el control de concurrencia optimista al actualizar pedidos"""
+
+    def setUp(self):
+        self.tecnico = Tecnico.objects.create(
+            first_name='Juan',
+            last_name='Pérez',
+            email='juan.perez@test.com'
+        )
+
+        self.cliente = User.objects.create_user(
+            email='cliente@test.com',
+            first_name='Cliente',
+            last_name='Test',
+            username='cliente_test'
+        )
+
+        self.pedido = Pedido.objects.create(
+            client=self.cliente,
+            tecnico=self.tecnico,
+            hours_worked=10
+        )
+        self.url = reverse('pedido-update', kwargs={'pk': self.pedido.pk})
+
+    def test_etag_en_lectura(self):
+        """Test de que el detalle expone la versión como ETag"""
+        response = self.client.get(self.url)
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response['ETag'], '"1"')
+
+    def test_actualizacion_con_version_vigente(self):
+        """Test de que If-Match con la versión vigente actualiza e incrementa la versión"""
+        response = self.client.patch(
+            self.url, {'hours_worked': 12}, format='json', HTTP_IF_MATCH='"1"'
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response['ETag'], '"2"')
+        self.pedido.refresh_from_db()
+        self.assertEqual(self.pedido.hours_worked, 12)
+        self.assertEqual(self.pedido.version, 2)
+
+    def test_conflicto_de_version(self):
+        """Test de que una escritura con versión vieja no pisa la anterior"""
+        self.client.patch(self.url, {'hours_worked': 12}, format='json', HTTP_IF_MATCH='"1"')
+
+        response = self.client.patch(
+            self.url, {'hours_worked': 15}, format='json', HTTP_IF_MATCH='"1"'
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_412_PRECONDITION_FAILED)
+        self.assertEqual(response.data['version_actual'], 2)
+        self.pedido.refresh_from_db()
+        self.assertEqual(self.pedido.hours_worked, 12)
+
+    def test_actualizacion_sin_cambios(self):
+        """Test de que enviar los mismos valores no escribe ni cambia la versión"""
+        cambios = CambioPedido.objects.count()
+
+        response = self.client.patch(self.url, {'hours_worked': 10}, format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.pedido.refresh_from_db()
+        self.assertEqual(self.pedido.version, 1)
+        self.assertEqual(CambioPedido.objects.count(), cambios)
+
+    def test_if_match_invalido(self):
+        """Test de que un ETag mal formado se rechaza con 400"""
+        response = self.client.patch(
+            self.url, {'hours_worked': 12}, format='json', HTTP_IF_MATCH='abc'
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_base_ocupada(self):
+        """Test de que un lock de la base que no se libera responde 503 y no 500"""
+        from django.db import OperationalError
+        from django.db.models.signals import post_save
+
+        def bloquear(sender, **kwargs):
+            raise OperationalError('database is locked')
+
+        post_save.connect(bloquear, sender=Pedido)
+        self.addCleanup(post_save.disconnect, bloquear, sender=Pedido)
+
+        response = self.client.patch(self.url, {'hours_worked': 12}, format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_503_SERVICE_UNAVAILABLE)
+        self.assertEqual(response['Retry-After'], '1')
+        self.pedido.refresh_from_db()
+        self.assertEqual(self.pedido.hours_worked, 10)
+
+
+class TransaccionesEscrituraTest(TransactionTestCase):
+    """Tests para el modo de las transacciones de SQLite"""
+
+    def setUp(self):
+        tecnico = Tecnico.objects.create(first_name='Juan', last_name='Pérez', email='juan.perez@test.com')
+        cliente = User.objects.create_user(
+            email='cliente@test.com', first_name='Cliente', last_name='Test', username='cliente_test'
+        )
+        self.pedido = Pedido.objects.create(client=cliente, tecnico=tecnico, hours_worked=10)
+
+    def _inicios(self, funcion):
+        """Sentencias BEGIN ejecutadas por 'funcion'"""
+        from django.db import connection
+
+        inicios = []
+
+        def capturar(execute, sql, params, many, context):
+            if sql.startswith('BEGIN'):
+                inicios.append(sql)
+            return execute(sql, params, many, context)
+
+        with connection.execute_wrapper(capturar):
+            funcion()
+        return inicios
+
+    def test_escritura_toma_el_lock_al_empezar(self):
+        """Test de que el PATCH de un pedido empieza con BEGIN IMMEDIATE"""
+        from rest_framework.test import APIClient
+
+        url = reverse('pedido-update', kwargs={'pk': self.pedido.pk})
+        inicios = self._inicios(lambda: APIClient().patch(url, {'hours_worked': 12}, format='json'))
+
+        self.assertEqual(inicios[0], 'BEGIN IMMEDIATE')
+        self.pedido.refresh_from_db()
+        self.assertEqual(self.pedido.hours_worked, 12)
+
+    def test_lecturas_diferidas(self):
+        """Test de que una transacción de solo lectura no toma el lock de escritura"""
+        from django.db import transaction
+
+        def leer():
+            with transaction.atomic():
+                list(Pedido.objects.all())
+
+        self.assertEqual(self._inicios(leer), ['BEGIN'])
+
+    def test_instantanea_en_lectura_diferida(self):
+        """Test de que la instantánea lee sin tomar el lock de escritura aunque la conexión lo haga por defecto"""
+        from django.db import connection
+        from rapihogar.instantanea import escribir_instantanea
+
+        directorio = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directorio, ignore_errors=True)
+        connection.ensure_connection()
+        self.addCleanup(setattr, connection, 'transaction_mode', connection.transaction_mode)
+        connection.transaction_mode = 'IMMEDIATE'
+
+        inicios = self._inicios(lambda: escribir_instantanea(os.path.join(directorio, 'liquidacion.inst')))
+
+        self.assertEqual(inicios, ['BEGIN DEFERRED'])
+        self.assertEqual(connection.transaction_mode, 'IMMEDIATE')
+
+
+class PedidosLoteAPITest(APITestCase):
+    """Tests para la carga idempotente de pedidos en lote"""
+
+    def setUp(self):
+        self.tecnico1 = Tecnico.objects.create(
+            first_name='Juan',
+            last_name='Pérez',
+            email='juan.perez@test.com'
+        )
+        self.tecnico2 = Tecnico.objects.create(
+            first_name='María',
+            last_name='González',
+            email='maria.gonzalez@test.com'
+        )
+        self.cliente = User.objects.create_user(
+            email='cliente@test.com',
+            first_name='Cliente',
+            last_name='Test',
+            username='cliente_test'
+        )
+        self.scheme = Scheme.objects.create(name='Esquema Test')
+        self.url = reverse('pedidos-lote')
+
+    def _lote(self, cantidad, prefijo='movil-1'):
+        return {
+            'pedidos': [
+                {
+                    'clave': f'{prefijo}-{numero}',
+                    'client': self.cliente.id,
+                    'tecnico': (self.tecnico1, self.tecnico2)[numero % 2].id,
+                    'scheme': self.scheme.id,
+                    'hours_worked': numero + 1,
+                }
+                for numero in range(cantidad)
+            ]
+        }
+
+    def test_crea_el_lote(self):
+        """Test de que el lote se crea con su feed de cambios y datos derivados"""
+        version = VersionLiquidacion.actual()
+
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(self.url, self._lote(4), format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(response.data['creados'], 4)
+        self.assertEqual(Pedido.objects.count(), 4)
+        ids = [pedido['id'] for pedido in response.data['pedidos']]
+        self.assertEqual(
+            list(Pedido.objects.filter(id__in=ids).order_by('id').values_list('hours_worked', flat=True)),
+            [1, 2, 3, 4]
+        )
+        self.assertEqual(
+            CambioPedido.objects.filter(operacion=CambioPedido.CREADO, pedido_id__in=ids).count(), 4
+        )
+        self.assertNotEqual(VersionLiquidacion.actual(), version)
+
+        self.tecnico1.refresh_from_db()
+        self.assertEqual(self.tecnico1.horas_totales, 1 + 3)
+
+    def test_reintento_idempotente(self):
+        """Test de que reenviar el mismo lote no duplica pedidos"""
+        primera = self.client.post(self.url, self._lote(3), format='json')
+        cambios = CambioPedido.objects.count()
+
+        lote = self._lote(4)
+        response = self.client.post(self.url, lote, format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(response.data['creados'], 1)
+        self.assertEqual(response.data['existentes'], 3)
+        self.assertEqual(
+            [pedido['id'] for pedido in response.data['pedidos'][:3]],
+            [pedido['id'] for pedido in primera.data['pedidos']]
+        )
+        self.assertEqual(
+            [pedido['creado'] for pedido in response.data['pedidos']],
+            [False, False, False, True]
+        )
+        self.assertEqual(Pedido.objects.count(), 4)
+        self.assertEqual(CambioPedido.objects.count(), cambios + 1)
+
+        response = self.client.post(self.url, lote, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['creados'], 0)
+
+    def test_consultas_independientes_del_tamano(self):
+        """Test de que la cantidad de consultas no crece con el lote"""
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+
+        with CaptureQueriesContext(connection) as chico:
+            self.client.post(self.url, self._lote(2, 'chico'), format='json')
+        with CaptureQueriesContext(connection) as grande:
+            self.client.post(self.url, self._lote(100, 'grande'), format='json')
+
+        self.assertEqual(Pedido.objects.count(), 102)
+        self.assertEqual(len(grande), len(chico))
+
+    def test_relacion_inexistente(self):
+        """Test de que un técnico inexistente rechaza el lote completo"""
+        lote = self._lote(3)
+        lote['pedidos'][1]['tecnico'] = 99999
+
+        response = self.client.post(self.url, lote, format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(response.data['pedidos'][0], {})
+        self.assertIn('tecnico', response.data['pedidos'][1])
+        self.assertFalse(Pedido.objects.exists())
+
+    def test_clave_repetida_en_el_lote(self):
+        """Test de que una clave repetida dentro del lote se rechaza"""
+        lote = self._lote(2)
+        lote['pedidos'][1]['clave'] = lote['pedidos'][0]['clave']
+
+        response = self.client.post(self.url, lote, format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('clave', response.data['pedidos'][1])
+        self.assertFalse(Pedido.objects.exists())
+
+
+def _registrar_request_en_otro_proceso():
+    from api.metricas import registro
+    registro().registrar_request('informe', 200, 0.02, 3)
+
+
+class MetricasAPITest(APITestCase):
+    """Tests para el registro de métricas y su exportación a Prometheus"""
+
+    def setUp(self):
+        cache.clear()
+        indice_pagos.invalidar()
+        self.directorio = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directorio, ignore_errors=True)
+        configuracion = override_settings(METRICAS={
+            **settings.METRICAS,
+            'DIRECTORIO': self.directorio,
+        })
+        configuracion.enable()
+        self.addCleanup(configuracion.disable)
+
+        Tecnico.objects.create(
+            first_name='Juan',
+            last_name='Pérez',
+            email='juan.perez@test.com'
+        )
+        self.staff = User.objects.create_user(
+            email='staff@test.com',
+            first_name='Staff',
+            last_name='Test',
+            username='staff_test',
+            is_staff=True
+        )
+        self.url = reverse('metricas')
+
+    def _metricas(self):
+        self.client.force_login(self.staff)
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(response['Content-Type'].startswith('text/plain'))
+        muestras = {}
+        for linea in response.content.decode().splitlines():
+            if not linea.startswith('#'):
+                nombre, valor = linea.rsplit(' ', 1)
+                muestras[nombre] = float(valor)
+        return muestras
+
+    def test_requests_por_endpoint(self):
+        """Test de que se cuentan requests, latencia y consultas por endpoint"""
+        self.client.get(reverse('tecnicos-list'))
+        self.client.get(reverse('tecnicos-list'))
+        self.client.get(reverse('pedido-update', kwargs={'pk': 99999}))
+
+        muestras = self._metricas()
+
+        self.assertEqual(muestras['rapihogar_http_requests_total{endpoint="tecnicos",codigo="2xx"}'], 2)
+        self.assertEqual(muestras['rapihogar_http_requests_total{endpoint="pedido",codigo="4xx"}'], 1)
+        self.assertEqual(muestras['rapihogar_http_request_duration_seconds_count{endpoint="tecnicos"}'], 2)
+        self.assertEqual(
+            muestras['rapihogar_http_request_duration_seconds_bucket{endpoint="tecnicos",le="+Inf"}'], 2
+        )
+        self.assertGreater(muestras['rapihogar_http_request_duration_seconds_sum{endpoint="tecnicos"}'], 0)
+        self.assertGreater(muestras['rapihogar_db_queries_total{endpoint="tecnicos"}'], 0)
+
+    def test_aciertos_del_cache(self):
+        """Test de que se cuentan los aciertos y fallos del cache de reportes"""
+        self.client.get(reverse('informe-tecnicos'))
+        self.client.get(reverse('informe-tecnicos'))
+
+        muestras = self._metricas()
+
+        self.assertEqual(muestras['rapihogar_cache_requests_total{cache="reportes",resultado="fallo"}'], 1)
+        self.assertEqual(muestras['rapihogar_cache_requests_total{cache="reportes",resultado="acierto"}'], 1)
+
+    def test_suma_entre_procesos(self):
+        """Test de que la exportación suma los valores de otros procesos"""
+        import multiprocessing
+        from api.metricas import registro
+
+        registro().registrar_request('informe', 200, 0.02, 3)
+        proceso = multiprocessing.get_context('fork').Process(target=_registrar_request_en_otro_proceso)
+        proceso.start()
+        proceso.join(10)
+        self.assertEqual(proceso.exitcode, 0)
+
+        muestras = self._metricas()
+
+        self.assertEqual(muestras['rapihogar_http_requests_total{endpoint="informe",codigo="2xx"}'], 2)
+        self.assertEqual(muestras['rapihogar_db_queries_total{endpoint="informe"}'], 6)
+
+        # El archivo del proceso terminado se incorporó al acumulado y se borró
+        archivos = os.listdir(self.directorio)
+        self.assertEqual(len([nombre for nombre in archivos if nombre.endswith('.db')]), 1)
+        self.assertEqual(len([nombre for nombre in archivos if nombre.endswith('.acum')]), 1)
+        muestras = self._metricas()
+        self.assertEqual(muestras['rapihogar_http_requests_total{endpoint="informe",codigo="2xx"}'], 2)
+        self.assertEqual(
+            muestras['rapihogar_http_request_duration_seconds_bucket{endpoint="informe",le="0.025"}'], 2
+        )
+        self.assertEqual(
+            muestras['rapihogar_http_request_duration_seconds_bucket{endpoint="informe",le="0.01"}'], 0
+        )
+
+    def test_solo_staff(self):
+        """Test de que las métricas no están disponibles para otros usuarios"""
+        response = self.client.get(self.url)
+        self.assertIn(response.status_code, (status.HTTP_401_UNAUTHORIZED, status.HTTP_403_FORBIDDEN))
+
+        usuario = User.objects.create_user(
+            email='usuario@test.com',
+            first_name='Usuario',
+            last_name='Test',
+            username='usuario_test'
+        )
+        self.client.force_login(usuario)
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+
+class PerfiladoAPITest(APITestCase):
+    """Tests para el perfilado de requests a pedido y por latencia"""
+
+    def setUp(self):
+        cache.clear()
+        indice_pagos.invalidar()
+        self.directorio = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directorio, ignore_errors=True)
+        self.config = {
+            **settings.PERFILADO,
+            'DIRECTORIO': self.directorio,
+            'UMBRAL_SEGUNDOS': 60,
+        }
+        self.url = reverse('informe-tecnicos')
+
+        Tecnico.objects.create(
+            first_name='Juan',
+            last_name='Pérez',
+            email='juan.perez@test.com'
+        )
+
+        self.staff = User.objects.create_user(
+            email='staff@test.com',
+            first_name='Staff',
+            last_name='Test',
+            username='staff_test',
+            is_staff=True
+        )
+
+    def test_perfil_a_pedido_staff(self):
+        """Test de que un usuario staff recibe las estadísticas de cProfile"""
+        self.client.force_login(self.staff)
+
+        with self.settings(PERFILADO=self.config):
+            response = self.client.get(self.url, {'perfilar': '1'})
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response['X-Perfil-Status'], '200')
+        self.assertIn('function calls', response.content.decode())
+
+    def test_perfil_guardado_con_header(self):
+        """Test de que con el header y 'guardar' el perfil queda en el directorio"""
+        self.client.force_login(self.staff)
+
+        with self.settings(PERFILADO=self.config):
+            response = self.client.get(self.url, HTTP_X_PERFILAR='guardar')
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertIn(response['X-Perfil'], os.listdir(self.directorio))
+
+    def test_perfil_a_pedido_staff_sin_sesion(self):
+        """Test de que el staff autenticado por la API (basic), sin sesión, puede perfilar"""
+        import base64
+
+        self.staff.set_password('clave-staff')
+        self.staff.save()
+        credenciales = base64.b64encode(b'staff@test.com:clave-staff').decode()
+
+        with self.settings(PERFILADO=self.config):
+            response = self.client.get(
+                self.url, {'perfilar': '1'}, HTTP_AUTHORIZATION=f'Basic {credenciales}'
+            )
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response['X-Perfil-Status'], '200')
+
+    def test_perfil_ignorado_sin_staff(self):
+        """Test de que el pedido de perfilado se ignora para usuarios comunes"""
+        with self.settings(PERFILADO=self.config):
+            response = self.client.get(self.url, {'perfilar': '1'})
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertNotIn('X-Perfil-Status', response)
+        self.assertEqual(os.listdir(self.directorio), [])
+
+    def test_muestreo_de_requests_lentos(self):
+        """Test de que las pilas de un request que supera el umbral se guardan"""
+        config = {**self.config, 'UMBRAL_SEGUNDOS': 0, 'INTERVALO_MUESTREO': 0.005}
+
+        with self.settings(PERFILADO=config):
+            with muestreador_lentos.vigilar('GET /api/lento/'):
+                time.sleep(0.1)
+
+        archivos = os.listdir(self.directorio)
+        self.assertEqual(len(archivos), 1)
+        with open(os.path.join(self.directorio, archivos[0]), encoding='utf-8') as archivo:
+            self.assertIn('GET /api/lento/', archivo.readline())
+
+    def test_sin_muestras_bajo_el_umbral(self):
+        """Test de que un request que no llega al umbral no se muestrea"""
+        config = {**self.config, 'UMBRAL_SEGUNDOS': 0.5, 'INTERVALO_MUESTREO': 0.005}
+
+        with self.settings(PERFILADO=config):
+            with muestreador_lentos.vigilar('GET /api/rapido/') as vigilado:
+                time.sleep(0.1)
+
+        self.assertFalse(vigilado.muestras)
+        self.assertEqual(os.listdir(self.directorio), [])
+
+    def test_requests_en_el_mismo_hilo(self):
+        """Test de que dos requests en el mismo hilo (ASGI) no se pisan el registro"""
+        config = {**self.config, 'UMBRAL_SEGUNDOS': 0, 'INTERVALO_MUESTREO': 0.005}
+
+        with self.settings(PERFILADO=config):
+            with muestreador_lentos.vigilar('GET /api/primero/') as primero:
+                time.sleep(0.05)
+                with muestreador_lentos.vigilar('GET /api/segundo/') as segundo:
+                    time.sleep(0.05)
+                time.sleep(0.05)
+
+        self.assertTrue(primero.muestras)
+        self.assertTrue(segundo.muestras)
+        self.assertEqual(len(os.listdir(self.directorio)), 2)
+
+    def test_directorio_acotado(self):
+        """Test de que se eliminan los perfiles más viejos al superar el tamaño máximo"""
+        for indice in range(5):
+            ruta = os.path.join(self.directorio, f'perfil{indice}.prof')
+            with open(ruta, 'wb') as archivo:
+                archivo.write(b'x' * 100)
+            os.utime(ruta, (indice, indice))
+
+        podar_directorio({**self.config, 'MAX_BYTES': 250})
+
+        self.assertEqual(sorted(os.listdir(self.directorio)), ['perfil3.prof', 'perfil4.prof'])
+
+
+class VerificacionEntornoTest(TestCase):
+    """Tests para la verificación del perfil de configuración"""
+
+    def test_desarrollo_sin_errores(self):
+        """Test de que el perfil de desarrollo no reporta problemas"""
+        from rapihogar.checks import verificar_entorno
+        self.assertEqual(verificar_entorno(None), [])
+
+    def test_produccion_mal_configurada(self):
+        """Test de que producción con DEBUG y clave de desarrollo se reporta"""
+        from rapihogar.checks import verificar_entorno
+
+        with self.settings(ENTORNO=settings.PRODUCCION, DEBUG=True):
+            ids = {error.id for error in verificar_entorno(None)}
+
+        self.assertIn('rapihogar.E001', ids)
+        self.assertIn('rapihogar.E002', ids)
+        self.assertIn('rapihogar.W003', ids)
+        self.assertIn('rapihogar.W004', ids)
+
+    def test_verificacion_al_iniciar(self):
+        """Test de que el servidor no arranca en producción con errores de configuración"""
+        from django.core.exceptions import ImproperlyConfigured
+        from rapihogar.checks import verificar_al_iniciar
+
+        verificar_al_iniciar()
+
+        with self.settings(ENTORNO=settings.PRODUCCION, DEBUG=True):
+            with self.assertRaisesMessage(ImproperlyConfigured, 'rapihogar.E001'):
+                verificar_al_iniciar()
+
+        silenciados = ['rapihogar.E001', 'rapihogar.E002']
+        with self.settings(ENTORNO=settings.PRODUCCION, DEBUG=True, SILENCED_SYSTEM_CHECKS=silenciados):
+            verificar_al_iniciar()
+
+@override_settings(THROTTLE_COSTO={
+    'CAPACIDAD': 30,
+    'RECARGA_POR_SEGUNDO': 1,
+    'COSTO_DEFAULT': 1,
+    'COSTOS': {'informe-tecnicos': 20},
+})
+class CostoThrottleAPITest(APITestCase):
+    """Tests para el throttle por costo de endpoint"""
+
+    def setUp(self):
+        cache.clear()
+        indice_pagos.invalidar()
+
+        self.tecnico = Tecnico.objects.create(
+            first_name='Juan',
+            last_name='Pérez',
+            email='juan.perez@test.com'
+        )
+
+        self.cliente = User.objects.create_user(
+            email='cliente@test.com',
+            first_name='Cliente',
+            last_name='Test',
+            username='cliente_test'
+        )
+
+        self.pedido = Pedido.objects.create(
+            client=self.cliente,
+            tecnico=self.tecnico,
+            hours_worked=10
+        )
+
+    def test_informe_agota_su_balde(self):
+        """Test de que un endpoint costoso se limita y devuelve Retry-After"""
+        url = reverse('informe-tecnicos')
+
+        self.assertEqual(self.client.get(url).status_code, status.HTTP_200_OK)
+
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+        self.assertIn('Retry-After', response)
+
+    def test_informe_no_bloquea_pedidos(self):
+        """Test de que agotar el balde de reportes no afecta a los pedidos"""
+        self.client.get(reverse('informe-tecnicos'))
+        self.client.get(reverse('informe-tecnicos'))
+
+        url = reverse('pedido-update', kwargs={'pk': self.pedido.pk})
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_usuario_exento(self):
+        """Test de que un usuario de THROTTLE_COSTO['EXENTOS'] no se limita"""
+        token = Token.objects.create(user=self.cliente)
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {token.key}')
+        url = reverse('informe-tecnicos')
+
+        with self.settings(THROTTLE_COSTO={**settings.THROTTLE_COSTO, 'EXENTOS': ('cliente@test.com',)}):
+            estados = [self.client.get(url).status_code for _ in range(3)]
+
+        self.assertEqual(estados, [status.HTTP_200_OK] * 3)
+
+    def test_requests_simultaneos_no_gastan_de_mas(self):
+        """Test de que los requests simultáneos de un usuario no superan la capacidad del balde"""
+        import threading
+        from django.contrib.auth.models import AnonymousUser
+        from django.test import RequestFactory
+        from api.throttling import CostoThrottle
+
+        class CacheLento:
+            # Intercala los requests entre la lectura y la escritura del balde
+            def __getattr__(self, nombre):
+                return getattr(cache, nombre)
+
+            def get(self, *args, **kwargs):
+                valor = cache.get(*args, **kwargs)
+                time.sleep(0.01)
+                return valor
+
+        class ThrottleLento(CostoThrottle):
+            cache = CacheLento()
+            espera_lock = 5
+
+        request = RequestFactory().get('/api/pedidos/')
+        request.user = AnonymousUser()
+        request.resolver_match = None
+        permitidos = []
+
+        def pedir():
+            if ThrottleLento().allow_request(request, None):
+                permitidos.append(True)
+
+        hilos = [threading.Thread(target=pedir) for _ in range(50)]
+        for hilo in hilos:
+            hilo.start()
+        for hilo in hilos:
+            hilo.join()
+
+        self.assertEqual(len(permitidos), 30)
+
+class SincronizarTecnicosCommandTest(TestCase):
+    """Tests para la sincronización de técnicos desde el CSV de RR.HH."""
+
+    def setUp(self):
+        self.existente = Tecnico.objects.create(
+            first_name='Juan',
+            last_name='Pérez',
+            email='juan.perez@test.com'
+        )
+        self.ausente = Tecnico.objects.create(
+            first_name='María',
+            last_name='González',
+            email='maria.gonzalez@test.com'
+        )
+
+    def _sincronizar(self, contenido, *args):
+        from io import StringIO
+        from django.core.management import call_command
+
+        with tempfile.NamedTemporaryFile('w', suffix='.csv', delete=False, encoding='utf-8') as archivo:
+            archivo.write(contenido)
+        self.addCleanup(os.remove, archivo.name)
+
+        salida = StringIO()
+        call_command('sincronizar_tecnicos', archivo.name, *args, stdout=salida)
+        return salida.getvalue()
+
+    def test_alta_actualizacion_y_baja(self):
+        """Test de que se insertan, actualizan y desactivan los técnicos según el archivo"""
+        version = VersionLiquidacion.actual()
+
+        salida = self._sincronizar(
+            'email,nombre,apellido,telefono\n'
+            'juan.perez@test.com,Juan Carlos,Pérez,+5491100\n'
+            'nuevo@test.com,Ana,Rodríguez,\n'
+            'sin-arroba,Diego,Fernández,\n',
+            '--lote', '1'
+        )
+
+        self.existente.refresh_from_db()
+        self.ausente.refresh_from_db()
+        self.assertEqual(self.existente.first_name, 'Juan Carlos')
+        self.assertEqual(self.existente.phone, '+5491100')
+        self.assertFalse(self.ausente.is_active)
+        self.assertTrue(Tecnico.objects.get(email='nuevo@test.com').is_active)
+        self.assertEqual(Tecnico.objects.count(), 3)
+        self.assertIn('Insertados: 1, actualizados: 1, desactivados: 1, filas con errores: 1', salida)
+        self.assertNotEqual(VersionLiquidacion.actual(), version)
+
+    def test_reactivacion_y_sin_desactivar(self):
+        """Test de que un técnico inactivo que vuelve al padrón se reactiva"""
+        Tecnico.objects.filter(pk=self.existente.pk).update(is_active=False)
+
+        self._sincronizar(
+            'email,first_name,last_name\njuan.perez@test.com,Juan,Pérez\n',
+            '--sin-desactivar'
+        )
+
+        self.existente.refresh_from_db()
+        self.ausente.refresh_from_db()
+        self.assertTrue(self.existente.is_active)
+        self.assertTrue(self.ausente.is_active)
+
+    def test_fila_invalida_no_modifica_al_existente(self):
+        """Test de que una fila con errores se omite sin desactivar al técnico existente"""
+        salida = self._sincronizar(
+            'email,first_name,last_name\n'
+            'juan.perez@test.com,,Pérez\n'
+            'maria.gonzalez@test.com,María,González\n'
+        )
+
+        self.existente.refresh_from_db()
+        self.assertTrue(self.existente.is_active)
+        self.assertEqual(self.existente.first_name, 'Juan')
+        self.assertIsNone(self.existente.sincronizado_en)
+        self.assertIn('desactivados: 0, filas con errores: 1', salida)
+
+
+class InstantaneaLiquidacionTest(TestCase):
+    """Tests para la instantánea columnar de la liquidación"""
+
+    def setUp(self):
+        self.tecnico1 = Tecnico.objects.create(
+            first_name='Juan',
+            last_name='Pérez',
+            email='juan.perez@test.com'
+        )
+        self.tecnico2 = Tecnico.objects.create(
+            first_name='María',
+            last_name='González',
+            email='maria.gonzalez@test.com',
+            is_active=False
+        )
+        cliente = User.objects.create_user(
+            email='cliente@test.com',
+            first_name='Cliente',
+            last_name='Test',
+            username='cliente_test'
+        )
+        self.scheme = Scheme.objects.create(name='Esquema Test')
+
+        for tecnico, horas, scheme in [
+            (self.tecnico1, 10, self.scheme),
+            (self.tecnico1, 5, None),
+            (self.tecnico2, 20, self.scheme),
+        ]:
+            Pedido.objects.create(client=cliente, tecnico=tecnico, scheme=scheme, hours_worked=horas)
+
+        directorio = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directorio, ignore_errors=True)
+        self.ruta = os.path.join(directorio, 'liquidacion.inst')
+
+    def test_escritura_y_lectura(self):
+        """Test de que las columnas se leen tal como se escribieron"""
+        from rapihogar.instantanea import Instantanea, escribir_instantanea
+
+        filas = escribir_instantanea(self.ruta)
+
+        self.assertEqual(filas, {'tecnicos': 2, 'pedidos': 3})
+        with Instantanea(self.ruta) as instantanea:
+            tecnicos = instantanea['tecnicos']
+            indice = list(tecnicos['id']).index(self.tecnico1.id)
+            self.assertEqual(tecnicos['horas'][indice], 15)
+            self.assertAlmostEqual(tecnicos['pago'][indice], self.tecnico1.calculate_payment())
+            self.assertEqual(sorted(instantanea['pedidos']['horas']), [5, 10, 20])
+
+    def test_consultas(self):
+        """Test de filtros y agrupamientos sobre la instantánea"""
+        from rapihogar.instantanea import NULO, Instantanea, escribir_instantanea
+
+        escribir_instantanea(self.ruta)
+
+        with Instantanea(self.ruta) as instantanea:
+            pedidos = instantanea['pedidos']
+            por_tecnico = pedidos.consultar(
+                agrupar_por='tecnico_id',
+                agregados={'horas': ('sum', 'horas'), 'maximo': ('max', 'horas')}
+            )
+            por_esquema = pedidos.consultar(
+                filtros=[('horas', '>=', 10)],
+                agrupar_por='scheme_id'
+            )
+            activos = instantanea['tecnicos'].consultar(
+                filtros=[('activo', '==', 1), ('horas', 'entre', (1, 20))],
+                agregados={'cantidad': ('count', None), 'promedio': ('avg', 'horas')}
+            )
+
+        self.assertEqual(por_tecnico[self.tecnico1.id], {'horas': 15, 'maximo': 10})
+        self.assertEqual(por_tecnico[self.tecnico2.id], {'horas': 20, 'maximo': 20})
+        self.assertEqual(por_esquema, {self.scheme.id: {'cantidad': 2}})
+        self.assertNotIn(NULO, por_esquema)
+        self.assertEqual(activos, {'cantidad': 1, 'promedio': 15})
+
+    def test_fechas_nulas(self):
+        """Test de que las fechas nulas (NaN) no alteran min, max ni avg"""
+        import math
+        from array import array
+        from rapihogar.instantanea import Tabla
+
+        tabla = Tabla(5, {
+            'tecnico_id': array('q', [1, 1, 2, 2, 3]),
+            'created_at': array('d', [20.0, math.nan, math.nan, 10.0, math.nan]),
+        })
+        agregados = {
+            'desde': ('min', 'created_at'),
+            'hasta': ('max', 'created_at'),
+            'promedio': ('avg', 'created_at'),
+            'cantidad': ('count', None),
+        }
+
+        self.assertEqual(
+            tabla.consultar(agregados=agregados),
+            {'desde': 10.0, 'hasta': 20.0, 'promedio': 15.0, 'cantidad': 5}
+        )
+        self.assertEqual(
+            tabla.consultar(agrupar_por='tecnico_id', agregados=agregados),
+            {
+                1: {'desde': 20.0, 'hasta': 20.0, 'promedio': 20.0, 'cantidad': 2},
+                2: {'desde': 10.0, 'hasta': 10.0, 'promedio': 10.0, 'cantidad': 2},
+                3: {'desde': None, 'hasta': None, 'promedio': None, 'cantidad': 1},
+            }
+        )
+
+
+class ArchivarPedidosCommandTest(TestCase):
+    """Tests para el archivo de pedidos antiguos"""
+
+    def setUp(self):
+        from datetime import timedelta
+        from django.utils import timezone
+
+        self.tecnico1 = Tecnico.objects.create(
+            first_name='Juan',
+            last_name='Pérez',
+            email='juan.perez@test.com'
+        )
+        self.tecnico2 = Tecnico.objects.create(
+            first_name='María',
+            last_name='González',
+            email='maria.gonzalez@test.com'
+        )
+        cliente = User.objects.create_user(
+            email='cliente@test.com',
+            first_name='Cliente',
+            last_name='Test',
+            username='cliente_test'
+        )
+
+        antiguo = timezone.now() - timedelta(days=400)
+        for tecnico, horas, fecha in [
+            (self.tecnico1, 10, antiguo),
+            (self.tecnico1, 8, antiguo),
+            (self.tecnico1, 5, None),
+            (self.tecnico2, 20, antiguo),
+            (None, 3, antiguo),
+        ]:
+            pedido = Pedido.objects.create(client=cliente, tecnico=tecnico, hours_worked=horas)
+            if fecha:
+                Pedido.objects.filter(pk=pedido.pk).update(created_at=fecha)
+
+    def _totales(self):
+        return sorted(
+            Tecnico.objects.con_liquidacion().values_list(
+                'id', 'horas_trabajadas', 'cantidad_pedidos', 'pago'
+            )
+        )
+
+    def _archivar(self):
+        from io import StringIO
+        from django.core.management import call_command
+
+        call_command('archivar_pedidos', '--dias', '365', '--lote', '2', stdout=StringIO())
+
+    def test_totales_identicos(self):
+        """Test de que archivar mueve los pedidos sin cambiar los totales"""
+        from rapihogar.models import PedidoArchivado
+
+        totales = self._totales()
+        cambios = CambioPedido.objects.count()
+
+        self._archivar()
+
+        self.assertEqual(self._totales(), totales)
+        self.assertEqual(Pedido.objects.count(), 1)
+        self.assertEqual(PedidoArchivado.objects.count(), 4)
+        self.assertEqual(CambioPedido.objects.count(), cambios)
+
+        # El histórico se lee una vez por instancia, o con el técnico
+        tecnico = Tecnico.objects.get(pk=self.tecnico1.pk)
+        with self.assertNumQueries(3):
+            self.assertEqual(tecnico.total_hours_worked(), 23)
+            self.assertEqual(tecnico.total_pedidos(), 3)
+
+        tecnico = Tecnico.objects.select_related('historico').get(pk=self.tecnico1.pk)
+        with self.assertNumQueries(2):
+            self.assertEqual(tecnico.total_hours_worked(), 23)
+            self.assertEqual(tecnico.total_pedidos(), 3)
+
+    def test_sin_cambios_ni_trabajos(self):
+        """Test de que archivar no registra cambios en el feed ni encola recálculos"""
+        CambioPedido.objects.all().delete()
+        Trabajo.objects.all().delete()
+
+        with override_settings(COLA_TRABAJOS={**settings.COLA_TRABAJOS, 'RECALCULO_EN_COLA': True}):
+            with self.captureOnCommitCallbacks(execute=True):
+                self._archivar()
+
+        self.assertEqual(Pedido.objects.count(), 1)
+        self.assertFalse(CambioPedido.objects.exists())
+        self.assertFalse(Trabajo.objects.exists())
+
+    def test_archivo_acumulado(self):
+        """Test de que archivos sucesivos acumulan el histórico"""
+        from django.utils import timezone
+        from datetime import timedelta
+
+        self._archivar()
+        Pedido.objects.filter(tecnico=self.tecnico1).update(
+            created_at=timezone.now() - timedelta(days=500)
+        )
+        self._archivar()
+
+        self.assertFalse(Pedido.objects.exists())
+        self.assertEqual(self.tecnico1.historico.horas, 23)
+        self.assertEqual(self.tecnico1.historico.pedidos, 3)
+
+        response = self.client.get(reverse('tecnico-detalle', kwargs={'pk': self.tecnico1.pk}))
+        self.assertEqual(response.data['total_hours_worked'], 23)
+        self.assertEqual(response.data['historico']['pedidos'], 3)
+
+
+class JSONRapidoRendererTest(TestCase):
+    """Tests para el renderer JSON rápido"""
+
+    def test_misma_salida_que_drf(self):
+        """Test de que Decimal, datetime, UUID y textos lazy se codifican como en DRF"""
+        import uuid
+        from django.utils import timezone
+        from django.utils.translation import gettext_lazy
+        from rest_framework.renderers import JSONRenderer
+        from api.renderers import JSONRapidoRenderer
+
+        datos = {
+            'monto': Decimal('1234.50'),
+            'fecha': timezone.now(),
+            'version': uuid.uuid4(),
+            'mensaje': gettext_lazy('Técnico'),
+            'lista': [1, 2.5, None, 'ñ'],
+        }
+
+        self.assertEqual(
+            json.loads(JSONRapidoRenderer().render(datos)),
+            json.loads(JSONRenderer().render(datos))
+        )
+
+    def test_indentacion(self):
+        """Test de que se respeta la indentación pedida por el cliente"""
+        from api.renderers import JSONRapidoRenderer
+
+        contenido = JSONRapidoRenderer().render(
+            {'a': [1]}, 'application/json; indent=4'
+        )
+
+        self.assertEqual(contenido.decode(), '{\n    "a": [\n        1\n    ]\n}')
+
+    def test_respuesta_del_listado(self):
+        """Test de que la API responde JSON con el renderer configurado"""
+        response = self.client.get(reverse('tecnicos-list'), HTTP_ACCEPT='application/json')
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response['Content-Type'], 'application/json')
+        self.assertEqual(json.loads(response.content)['count'], 0)
+
+
+class MedirContencionCommandTest(TransactionTestCase):
+    """Tests para el benchmark de contención de escrituras de pedidos"""
+
+    def setUp(self):
+        cliente = User.objects.create_user(
+            email='cliente@test.com',
+            first_name='Cliente',
+            last_name='Test',
+            username='cliente_test'
+        )
+        tecnico = Tecnico.objects.create(first_name='Juan', last_name='Pérez', email='juan@test.com')
+        for horas in range(1, 6):
+            Pedido.objects.create(client=cliente, tecnico=tecnico, hours_worked=horas)
+
+    def _medir(self, *args):
+        from io import StringIO
+        from django.core.management import call_command
+
+        salida = StringIO()
+        call_command(
+            'medir_contencion', '--escritores', '1', '--lectores', '1',
+            '--duracion', '0.5', '--duracion-base', '0.2', '--json', *args,
+            stdout=salida
+        )
+        return json.loads(salida.getvalue())
+
+    def test_claves_calientes(self):
+        """Test de que con fracción caliente 1 todas las escrituras van a la clave caliente"""
+        resultado = self._medir('--claves-calientes', '1', '--fraccion-caliente', '1')
+
+        self.assertGreater(resultado['commits'], 0)
+        self.assertEqual(Pedido.objects.filter(version__gt=1).count(), 1)
+        self.assertEqual(Pedido.objects.filter(version__gt=1).count(), 1)
+        # Una escritura que falló por lock después de confirmarse también sube la versión
+        version = Pedido.objects.get(version__gt=1).version
+        self.assertGreaterEqual(version, resultado['commits'] + 1)
+        self.assertLessEqual(version, resultado['commits'] + 1 + resultado['bloqueos_lock'])
+        self.assertGreater(resultado['lectores_sin_carga']['cantidad'], 0)
+        for campo in ('commits_por_segundo', 'esperas_lock', 'bloqueos_lock', 'errores_base', 'degradacion_lectores'):
+            self.assertIn(campo, resultado)
+
+    def test_errores_de_lock(self):
+        """Test de que una sentencia que falla por lock cuenta como contención aunque sea rápida"""
+        from django.db import OperationalError
+        from rapihogar.management.commands.medir_contencion import MedidorSentencias
+
+        def bloqueada(sql, params, many, context):
+            raise OperationalError('database table is locked: rapihogar_pedido')
+
+        def fallida(sql, params, many, context):
+            raise OperationalError('no such column: foo')
+
+        medidor = MedidorSentencias(umbral=60)
+        for execute in (bloqueada, bloqueada, fallida):
+            with self.assertRaises(OperationalError):
+                medidor(execute, 'UPDATE', (), False, {})
+
+        self.assertEqual(medidor.bloqueos, 2)
+        self.assertEqual(medidor.esperas, 0)
+        self.assertEqual(sum(medidor.errores.values()), 3)
+
+    def test_proceso_escritor_que_muere(self):
+        """Test de que en modo procesos un escritor que muere no bloquea la medición"""
+        from unittest import mock
+        from django.core.management.base import CommandError
+
+        inicio = time.time()
+        with mock.patch(
+            'rapihogar.management.commands.medir_contencion.escribir', side_effect=lambda *args: os._exit(3)
+        ):
+            with self.assertRaisesMessage(CommandError, '[3]'):
+                self._medir('--modo', 'procesos', '--lectores', '0', '--duracion-base', '0')
+
+        self.assertLess(time.time() - inicio, 10)
+
+    def test_sin_pedidos(self):
+        """Test de que sin pedidos ni --sembrar el comando falla"""
+        from django.core.management.base import CommandError
+
+        Pedido.objects.all().delete()
+        with self.assertRaises(CommandError):
+            self._medir()
+
+    def test_sembrar(self):
+        """Test de que --sembrar crea los pedidos faltantes con su feed de cambios"""
+        self._medir('--sembrar', '--pedidos', '20', '--duracion', '0.1', '--lectores', '0')
+
+        self.assertEqual(Pedido.objects.count(), 20)
+        self.assertEqual(
+            CambioPedido.objects.filter(operacion=CambioPedido.CREADO).count(), 20
+        )
+
+
+class AuditarConsultasCommandTest(TestCase):
+    """Tests para la auditoría de planes de consultas de los endpoints"""
+
+    def _auditar(self, *args):
+        from io import StringIO
+        from django.core.management import call_command
+
+        salida = StringIO()
+        call_command('auditar_consultas', '--tecnicos', '5', *args, stdout=salida)
+        return salida.getvalue()
+
+    def test_todos_los_endpoints_tienen_request(self):
+        """Test de que cada URL de api/urls.py tiene un request de auditoría"""
+        from rapihogar.management.commands.auditar_consultas import nombres_endpoints, peticiones
+
+        muestra = {'tecnico_ids': [1], 'pedido': 1, 'company': 1, 'cliente': 1, 'scheme': 1}
+        nombres = nombres_endpoints()
+
+        self.assertIn('tecnicos-list', nombres)
+        self.assertIn('pedidos-lote', nombres)
+        self.assertEqual(set(nombres) - set(peticiones(muestra)), set())
+
+    def test_auditoria_sin_hallazgos(self):
+        """Test de que los endpoints actuales cumplen las reglas y los datos se descartan"""
+        salida = self._auditar()
+
+        self.assertIn('Todas las consultas cumplen las reglas', salida)
+        self.assertEqual(Tecnico.objects.count(), 0)
+
+    def test_scan_sin_excepcion_falla(self):
+        """Test de que un scan completo de técnicos sin excepción configurada termina con error"""
+        from django.core.management.base import CommandError
+
+        reglas = {**settings.AUDITORIA_CONSULTAS, 'EXCEPCIONES': {}}
+        with override_settings(AUDITORIA_CONSULTAS=reglas):
+            with self.assertRaises(CommandError):
+                self._auditar('--endpoint', 'informe-tecnicos')
+
+    def test_analizar_scan_y_repeticiones(self):
+        """Test de que se detectan scans de pedidos y consultas repetidas por fila"""
+        from rapihogar.management.commands.auditar_consultas import analizar
+
+        reglas = {**settings.AUDITORIA_CONSULTAS, 'MAXIMO_REPETICIONES': 2}
+        por_id = 'SELECT "rapihogar_pedido"."id" FROM "rapihogar_pedido" WHERE "rapihogar_pedido"."id" = %s'
+        consultas = [(por_id, (numero, )) for numero in range(3)] + [
+            ('SELECT "rapihogar_pedido"."id" FROM "rapihogar_pedido" WHERE "rapihogar_pedido"."hours_worked" > %s', (5, )),
+        ]
+
+        reglas_rotas = {hallazgo['regla'] for hallazgo in analizar(consultas, reglas)}
+
+        self.assertEqual(reglas_rotas, {'repeticion', 'scan:rapihogar_pedido'})
+        excepciones = (
+            {'regla': 'repeticion', 'sql': '"rapihogar_pedido"."id" = %s'},
+            {'regla': 'scan:rapihogar_pedido', 'sql': '"rapihogar_pedido"."hours_worked" > %s'},
+        )
+        self.assertTrue(all(hallazgo['permitido'] for hallazgo in analizar(consultas, reglas, excepciones)))
+
+    def test_excepcion_de_otra_consulta(self):
+        """Test de que una excepción acepta la regla solo para su consulta, no para todo el endpoint"""
+        from rapihogar.management.commands.auditar_consultas import analizar
+
+        consultas = [
+            ('SELECT "rapihogar_pedido"."id" FROM "rapihogar_pedido" WHERE "rapihogar_pedido"."hours_worked" > %s', (5, )),
+            ('SELECT "rapihogar_pedido"."id" FROM "rapihogar_pedido" WHERE "rapihogar_pedido"."version" > %s', (1, )),
+        ]
+        excepciones = ({'regla': 'scan:rapihogar_pedido', 'sql': '"rapihogar_pedido"."hours_worked" > %s'}, )
+
+        hallazgos = analizar(consultas, settings.AUDITORIA_CONSULTAS, excepciones)
+
+        self.assertEqual(
+            [(hallazgo['regla'], hallazgo['permitido']) for hallazgo in hallazgos],
+            [('scan:rapihogar_pedido', True), ('scan:rapihogar_pedido', False)]
+        )
+
+    def test_excepcion_de_regla_completa_falla(self):
+        """Test de que una excepción sin sql ni plan (la regla en todo el endpoint) se rechaza"""
+        from django.core.management.base import CommandError
+
+        reglas = {
+            **settings.AUDITORIA_CONSULTAS,
+            'EXCEPCIONES': {'informe-tecnicos': ({'regla': 'scan:rapihogar_tecnico'}, )},
+        }
+        with override_settings(AUDITORIA_CONSULTAS=reglas):
+            with self.assertRaisesMessage(CommandError, 'debe indicar "sql" o "plan"'):
+                self._auditar('--endpoint', 'informe-tecnicos')
+
+
+class RecalcularLiquidacionesCommandTest(TestCase):
+    """Tests para el recálculo de totales por rangos de técnicos"""
+
+    def setUp(self):
+        cliente = User.objects.create_user(
+            email='cliente@test.com',
+            first_name='Cliente',
+            last_name='Test',
+            username='cliente_test'
+        )
+        self.tecnicos = [
+            Tecnico.objects.create(
+                first_name=f'Técnico{numero}',
+                last_name='Test',
+                email=f'tecnico{numero}@test.com'
+            )
+            for numero in range(5)
+        ]
+        for numero, tecnico in enumerate(self.tecnicos):
+            for horas in range(numero + 1):
+                Pedido.objects.create(client=cliente, tecnico=tecnico, hours_worked=horas + 5)
+        # Totales desactualizados, como tras un cambio de precios o una reparación
+        Tecnico.objects.update(horas_totales=0, pedidos_totales=0, pago_total=0)
+
+    def _recalcular(self, *args):
+        from io import StringIO
+        from django.core.management import call_command
+
+        salida = StringIO()
+        call_command('recalcular_liquidaciones', '--procesos', '1', *args, stdout=salida)
+        return salida.getvalue()
+
+    def test_rangos_tecnicos(self):
+        """Test de que los rangos cubren todos los técnicos sin solaparse"""
+        from rapihogar.liquidacion import rangos_tecnicos
+
+        ids = [tecnico.id for tecnico in self.tecnicos]
+        rangos = rangos_tecnicos(2)
+
+        self.assertEqual(len(rangos), 3)
+        self.assertEqual(rangos[0][0], ids[0])
+        self.assertEqual(rangos[-1][1], ids[-1] + 1)
+        for (_, hasta), (desde, _) in zip(rangos, rangos[1:]):
+            self.assertEqual(hasta, desde)
+
+    def test_recalcula_todos(self):
+        """Test de que los totales quedan iguales a los calculados en vivo"""
+        version = VersionLiquidacion.actual()
+
+        salida = self._recalcular('--rango', '2')
+
+        self.assertIn('5 técnicos recalculados', salida)
+        self.assertEqual(
+            sorted(
+                Tecnico.objects.con_totales().values_list(
+                    'id', 'horas_trabajadas', 'cantidad_pedidos', 'pago'
+                )
+            ),
+            sorted(
+                Tecnico.objects.con_liquidacion().values_list(
+                    'id', 'horas_trabajadas', 'cantidad_pedidos', 'pago'
+                )
+            )
+        )
+        self.assertNotEqual(VersionLiquidacion.actual(), version)
+
+    def test_solo_rangos_indicados(self):
+        """Test de que --rangos recalcula solo los técnicos de esos rangos"""
+        primero = self.tecnicos[0]
+
+        self._recalcular('--rangos', f'{primero.id}-{primero.id + 1}')
+
+        primero.refresh_from_db()
+        self.assertEqual(primero.horas_totales, 5)
+        self.assertEqual(Tecnico.objects.filter(horas_totales=0).count(), 4)
+
+    def test_rango_invalido(self):
+        """Test de que un rango vacío se rechaza"""
+        from django.core.management.base import CommandError
+
+        with self.assertRaises(CommandError):
+            self._recalcular('--rangos', '10-3')
+
+
+@override_settings(EVENTOS_LIQUIDACION={
+    **settings.EVENTOS_LIQUIDACION,
+    'AGRUPAR_SEGUNDOS': 0,
+})
+class EventosLiquidacionTest(TestCase):
+    """Tests para el stream SSE de cambios de la liquidación"""
+
+    def setUp(self):
+        indice_pagos.invalidar()
+        self.tecnico = Tecnico.objects.create(
+            first_name='Juan',
+            last_name='Pérez',
+            email='juan.perez@test.com'
+        )
+        self.cliente = User.objects.create_user(
+            email='cliente@test.com',
+            first_name='Cliente',
+            last_name='Test',
+            username='cliente_test'
+        )
+        Pedido.objects.create(client=self.cliente, tecnico=self.tecnico, hours_worked=5)
+        self.token = Token.objects.create(user=self.cliente)
+        # Baldes del throttle por costo limpios en cada test
+        cache.clear()
+
+    def _crear_pedido(self, horas):
+        with self.captureOnCommitCallbacks(execute=True):
+            Pedido.objects.create(client=self.cliente, tecnico=self.tecnico, hours_worked=horas)
+
+    async def _conectar(self, headers=(), autenticar=True):
+        import asyncio
+        from rapihogar.asgi import application
+
+        entrada = asyncio.Queue()
+        salida = asyncio.Queue()
+        if autenticar:
+            headers = [(b'authorization', f'Token {self.token.key}'.encode()), *headers]
+        scope = {
+            'type': 'http',
+            'method': 'GET',
+            'path': '/api/eventos/',
+            'headers': list(headers),
+        }
+        tarea = asyncio.create_task(application(scope, entrada.get, salida.put))
+        inicio = await asyncio.wait_for(salida.get(), 5)
+        return tarea, entrada, salida, inicio
+
+    async def _siguiente_evento(self, salida):
+        import asyncio
+
+        while True:
+            mensaje = await asyncio.wait_for(salida.get(), 5)
+            contenido = mensaje['body'].decode()
+            if 'event: ' not in contenido:
+                continue
+            campos = dict(
+                linea.split(': ', 1) for linea in contenido.strip().split('\n')
+            )
+            return campos['event'], json.loads(campos['data']), campos.get('id')
+
+    async def _desconectar(self, tarea, entrada):
+        import asyncio
+
+        await entrada.put({'type': 'http.disconnect'})
+        await asyncio.wait_for(tarea, 5)
+
+    async def test_informe_y_cambios(self):
+        """Test de que se envía el informe al conectarse y los cambios al escribir"""
+        from asgiref.sync import sync_to_async
+        from rapihogar.eventos import publicador
+
+        tarea, entrada, salida, inicio = await self._conectar()
+
+        self.assertEqual(inicio['status'], 200)
+        self.assertIn((b'content-type', b'text/event-stream'), inicio['headers'])
+
+        tipo, informe, _ = await self._siguiente_evento(salida)
+        self.assertEqual(tipo, 'informe')
+        self.assertEqual(informe['total_horas_sistema'], 5)
+
+        await sync_to_async(self._crear_pedido)(3)
+
+        tipo, datos, cursor = await self._siguiente_evento(salida)
+        self.assertEqual(tipo, 'tecnicos')
+        self.assertEqual(datos['tecnicos'][0]['id'], self.tecnico.id)
+        self.assertEqual(datos['tecnicos'][0]['horas_trabajadas'], 8)
+        self.assertEqual(int(cursor), await sync_to_async(
+            lambda: CambioPedido.objects.latest('id').id
+        )())
+
+        tipo, informe, _ = await self._siguiente_evento(salida)
+        self.assertEqual(tipo, 'informe')
+        self.assertEqual(informe['total_horas_sistema'], 8)
+
+        await self._desconectar(tarea, entrada)
+        # Sin clientes conectados no queda nada consultando la base
+        self.assertIsNone(publicador._tarea)
+
+    async def test_reconexion_con_last_event_id(self):
+        """Test de que al reconectarse se envían los técnicos que cambiaron"""
+        from asgiref.sync import sync_to_async
+
+        cursor = await sync_to_async(lambda: CambioPedido.objects.latest('id').id)()
+        await sync_to_async(self._crear_pedido)(2)
+
+        tarea, entrada, salida, _ = await self._conectar(
+            [(b'last-event-id', str(cursor).encode())]
+        )
+
+        tipo, datos, _ = await self._siguiente_evento(salida)
+        self.assertEqual(tipo, 'tecnicos')
+        self.assertEqual(datos['tecnicos'][0]['horas_trabajadas'], 7)
+
+        tipo, _, _ = await self._siguiente_evento(salida)
+        self.assertEqual(tipo, 'informe')
+
+        await self._desconectar(tarea, entrada)
+
+    async def test_requiere_autenticacion(self):
+        """Test de que el stream rechaza las conexiones sin credenciales"""
+        _, _, salida, inicio = await self._conectar(autenticar=False)
+
+        self.assertEqual(inicio['status'], 401)
+        self.assertIn('error', json.loads((await salida.get())['body']))
+
+    async def test_metodo_no_permitido(self):
+        """Test de que el stream solo acepta GET"""
+        import asyncio
+        from rapihogar.asgi import application
+
+        salida = asyncio.Queue()
+        scope = {'type': 'http', 'method': 'POST', 'path': '/api/eventos/', 'headers': []}
+        await application(scope, asyncio.Queue().get, salida.put)
+
+        self.assertEqual((await salida.get())['status'], 405)
+
+
+class GeneradorTraficoTest(LiveServerTestCase):
+    """Tests para el generador de carga contra un servidor real"""
+
+    def setUp(self):
+        tecnico = Tecnico.objects.create(
+            first_name='Juan',
+            last_name='Pérez',
+            email='juan.perez@test.com'
+        )
+        cliente = User.objects.create_user(
+            email='cliente@test.com',
+            first_name='Cliente',
+            last_name='Test',
+            username='cliente_test'
+        )
+        self.pedido = Pedido.objects.create(client=cliente, tecnico=tecnico, hours_worked=5)
+        # Pedido anterior al feed de cambios (ej: cargado antes de registrarlo)
+        CambioPedido.objects.all().delete()
+        self.usuario = User.objects.create_user(
+            email='carga@test.com',
+            first_name='Carga',
+            last_name='Test',
+            username='carga_test'
+        )
+
+    def test_carga_con_mezcla(self):
+        """Test de que la mezcla de operaciones se ejecuta y se reporta"""
+        import asyncio
+        from rapihogar.management.commands.cargar_trafico import pedido_ids_existentes
+        from rapihogar.trafico import GeneradorTrafico
+
+        pedido_ids = pedido_ids_existentes()
+        self.assertEqual(pedido_ids, [self.pedido.id])
+
+        token = Token.objects.create(user=self.usuario)
+        generador = GeneradorTrafico(
+            self.live_server_url,
+            {'listado': 1, 'informe': 1, 'pedido_get': 1, 'pedido_patch': 1},
+            concurrencia=2,
+            rps=40,
+            pedido_ids=pedido_ids,
+            token=token.key,
+        )
+        with override_settings(THROTTLE_COSTO={**settings.THROTTLE_COSTO, 'EXENTOS': ('carga@test.com',)}):
+            resumen = asyncio.run(generador.ejecutar(0.5))
+
+        self.assertGreater(resumen['requests'], 0)
+        for datos in resumen['operaciones'].values():
+            self.assertNotIn('error', datos['estados'])
+            self.assertNotIn('429', datos['estados'])
+            self.assertIsNotNone(datos['p95'])
+
+    def test_pedidos_inexistentes_en_el_servidor(self):
+        """Test de que se detectan los ids de pedidos que el servidor no tiene"""
+        import asyncio
+        from rapihogar.trafico import GeneradorTrafico
+
+        generador = GeneradorTrafico(
+            self.live_server_url,
+            {'pedido_get': 1},
+            concurrencia=1,
+            pedido_ids=[self.pedido.id, self.pedido.id + 1000],
+            token=Token.objects.create(user=self.usuario).key,
+        )
+
+        self.assertEqual(asyncio.run(generador.pedidos_inexistentes(muestra=2)), 1)
+
+
+class ManagementCommandTest(TestCase):
+    """Tests para los comandos de gestión"""
+    
+    def test_generar_pedidos_command_exists(self):
+        """Test de que el comando existe y es importable"""
+        from rapihogar.management.commands.generar_pedidos import Command
+        self.assertTrue(Command)
+    
+    def test_crear_tecnicos_command_exists(self):
+        """Test de que el comando crear_tecnicos existe"""
+        from rapihogar.management.commands.crear_tecnicos import Command
+        self.assertTrue(Command)
+
+    def test_simular_liquidacion_command_exists(self):
+        """Test de que el comando simular_liquidacion existe"""
+        from rapihogar.management.commands.simular_liquidacion import Command
+        self.assertTrue(Command)
+
+    def test_sincronizar_tecnicos_command_exists(self):
+        """Test de que el comando sincronizar_tecnicos existe"""
+        from rapihogar.management.commands.sincronizar_tecnicos import Command
+        self.assertTrue(Command)
+
+    def test_generar_instantanea_command_exists(self):
+        """Test de que el comando generar_instantanea existe"""
+        from rapihogar.management.commands.generar_instantanea import Command
+        self.assertTrue(Command)
+
+    def test_archivar_pedidos_command_exists(self):
+        """Test de que el comando archivar_pedidos existe"""
+        from rapihogar.management.commands.archivar_pedidos import Command
+        self.assertTrue(Command)
+
+    def test_medir_renderers_command_exists(self):
+        """Test de que el comando medir_renderers existe"""
+        from rapihogar.management.commands.medir_renderers import Command
+        self.assertTrue(Command)
+
+    def test_cargar_trafico_command_exists(self):
+        """Test de que el comando cargar_trafico existe"""
+        from rapihogar.management.commands.cargar_trafico import Command
+        self.assertTrue(Command)
+
+    def test_recalcular_liquidaciones_command_exists(self):
+        """Test de que el comando recalcular_liquidaciones existe"""
+        from rapihogar.management.commands.recalcular_liquidaciones import Command
+        self.assertTrue(Command)
+
+    def test_auditar_consultas_command_exists(self):
+        """Test de que el comando auditar_consultas existe"""
+        from rapihogar.management.commands.auditar_consultas import Command
+        self.assertTrue(Command)
+
+    def test_medir_contencion_command_exists(self):
+        """Test de que el comando medir_contencion existe"""
+        from rapihogar.management.commands.medir_contencion import Command
+        self.assertTrue(Command)
+
+    def test_procesar_cola_command_exists(self):
+        """Test de que el comando procesar_cola existe"""
+        from rapihogar.management.commands.procesar_cola import Command
         self.assertTrue(Command)
@@ -0,0 +1,105 @@
+import math
+import time
+
+from django.conf import settings
+from django.core.cache import cache as default_cache
+from rest_framework.throttling import BaseThrottle
+
+
+class CostoThrottle(BaseThrottle):
+    """
+    Throttle por costo de endpoint (token bucket)
+
+    - Cada usuario (o IP si es anónimo) tiene un balde de fichas en el cache de Django
+    - Cada request consume las fichas que cuesta su endpoint (settings.THROTTLE_COSTO['COSTOS'])
+    - Los endpoints con costo propio usan un balde separado, así los reportes
+      no agotan las fichas de las operaciones baratas como los pedidos
+    - Al rechazar, DRF responde 429 con el header Retry-After
+    - Los usuarios de THROTTLE_COSTO['EXENTOS'] (ej: el de las pruebas de
+      carga) no se limitan
+    - Leer y descontar las fichas se hace con un lock en el cache (cache.add),
+      así los requests simultáneos de un mismo usuario no gastan de más.
+      Con un cache compartido (settings.CACHES) el límite vale para todos
+      los procesos.
+    """
+    cache = default_cache
+    cache_format = 'throttle_costo_%(balde)s_%(ident)s'
+    timer = time.time
+    # Espera máxima por el lock de un balde y vencimiento del lock si su
+    # dueño no lo libera (ej: el proceso terminó)
+    espera_lock = 0.1
+    timeout_lock = 2
+
+    def __init__(self):
+        self.espera = None
+
+    def get_config(self):
+        return settings.THROTTLE_COSTO
+
+    def get_costo(self, request, view):
+        config = self.get_config()
+        url_name = getattr(request.resolver_match, 'url_name', None)
+        if url_name in config['COSTOS']:
+            return 'reportes', config['COSTOS'][url_name]
+        return 'general', config['COSTO_DEFAULT']
+
+    def get_cache_key(self, request, balde):
+        if request.user and request.user.is_authenticated:
+            ident = f'user_{request.user.pk}'
+        else:
+            ident = f'ip_{self.get_ident(request)}'
+        return self.cache_format % {'balde': balde, 'ident': ident}
+
+    def allow_request(self, request, view):
+        config = self.get_config()
+        balde, costo = self.get_costo(request, view)
+        if costo <= 0 or self.es_exento(request, config):
+            return True
+
+        clave = self.get_cache_key(request, balde)
+        if not self._tomar_lock(clave):
+            # Otro request del mismo usuario está descontando: reintentar enseguida
+            self.espera = 1
+            return False
+        try:
+            return self._consumir(clave, costo, config)
+        finally:
+            self.cache.delete(f'{clave}_lock')
+
+    def es_exento(self, request, config):
+        usuario = request.user
+        return bool(
+            usuario and usuario.is_authenticated
+            and usuario.get_username() in config.get('EXENTOS', ())
+        )
+
+    def _tomar_lock(self, clave):
+        limite = time.monotonic() + self.espera_lock
+        while not self.cache.add(f'{clave}_lock', 1, self.timeout_lock):
+            if time.monotonic() >= limite:
+                return False
+            time.sleep(0.002)
+        return True
+
+    def _consumir(self, clave, costo, config):
+        capacidad = config['CAPACIDAD']
+        recarga = config['RECARGA_POR_SEGUNDO']
+        ahora = self.timer()
+
+        # Recargar las fichas según el tiempo transcurrido desde el último uso
+        fichas, ultimo = self.cache.get(clave, (capacidad, ahora))
+        fichas = min(capacidad, fichas + (ahora - ultimo) * recarga)
+
+        # Tiempo en que el balde vuelve a llenarse, vencido ese plazo no hace falta guardarlo
+        timeout = math.ceil(capacidad / recarga)
+
+        if fichas < costo:
+            self.espera = (costo - fichas) / recarga
+            self.cache.set(clave, (fichas, ahora), timeout)
+            return False
+
+        self.cache.set(clave, (fichas - costo, ahora), timeout)
+        return True
+
+    def wait(self):
+        return self.espera
@@ -11,9 +11,19 @@ router.register(r'stats', views.SecretView, basename='stats')
 urlpatterns = [
     path('', include(router.urls)),
     path('tecnicos/', views.TecnicoListAPIView.as_view(), name='tecnicos-list'),
+    path('tecnicos/lote/', views.tecnicos_lote_view, name='tecnicos-lote'),
+    path('tecnicos/<int:pk>/', views.tecnico_detalle_view, name='tecnico-detalle'),
     path('informe/', views.informe_tecnicos_view, name='informe-tecnicos'),
+    path('liquidacion/simular/', views.simular_liquidacion_view, name='liquidacion-simular'),
+    path('metricas/', views.metricas_view, name='metricas'),
 
     # API opcional para actualizar pedidos
     path('pedidos/<int:pk>/', views.PedidoUpdateAPIView.as_view(), name='pedido-update'),
 
+    # Feed de cambios de pedidos para consumidores externos
+    path('pedidos/cambios/', views.cambios_pedidos_view, name='pedidos-cambios'),
+
+    # Carga de pedidos en lote, idempotente por clave
+    path('pedidos/lote/', views.ingresar_pedidos_view, name='pedidos-lote'),
+
 ]
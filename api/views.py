@@ -1,14 +1,27 @@
-from rest_framework import viewsets, permissions, serializers, generics, status, filters
-from rapihogar.models import Company, Pedido, Tecnico
+from rest_framework import viewsets, permissions, serializers, generics, status, filters, exceptions
+from rapihogar.models import CambioPedido, Company, Pedido, Tecnico
 from rest_framework.response import Response
-from rest_framework.decorators import api_view
+from rest_framework.decorators import api_view, permission_classes
 from rest_framework.pagination import PageNumberPagination
+import hashlib
 import logging
 from django.conf import settings
+from django.http import HttpResponse
+from django.db import IntegrityError, OperationalError
+from django.shortcuts import get_object_or_404
 from django.db.models import Q, Sum, Avg
 from decimal import Decimal
 from django_filters.rest_framework import DjangoFilterBackend
-from .serializers import ( TecnicoSerializer,   TecnicoListSerializer, InformeSerializer,PedidoSerializer)
+from rapihogar.indice_pagos import indice_pagos
+from rapihogar.escalas import calcular_pago
+from rapihogar.transacciones import transaccion_escritura
+from rapihogar.liquidacion import desglose_tecnico, estadisticas_pagos, simular_liquidacion
+from .filters import TecnicoFilter, TecnicoOrderingFilter
+from .metricas import registro
+from .single_flight import obtener_cacheado
+from .serializers import ( TecnicoSerializer,   TecnicoListSerializer, InformeSerializer,PedidoSerializer,
+                           SimulacionLiquidacionSerializer, CambioPedidoSerializer, LoteTecnicosSerializer,
+                           TecnicoDetalleSerializer, IngresoPedidosSerializer)
 
 logger = logging.getLogger(__name__)
 
@@ -76,26 +89,69 @@ class TecnicoListAPIView(generics.ListAPIView):
     
     Funcionalidades:
     - Lista todos los técnicos activos
-    - Calcula automáticamente horas trabajadas, cantidad de pedidos y pago total
+    - Horas trabajadas, cantidad de pedidos y pago total precalculados por técnico
     - Filtro por nombre (búsqueda parcial)
-    - Ordenamiento por diferentes campos
+    - Filtro por rango de horas (min_hours, max_hours) y escala de pago (tier)
+    - Ordenamiento por diferentes campos, incluidos horas, pedidos y pago total
     - Paginación
+    - Campos parciales con ?fields=id,full_name: los totales solo se leen si se piden
     """
-    queryset = Tecnico.objects.filter(is_active=True).prefetch_related('pedidos')
+    queryset = Tecnico.objects.filter(is_active=True)
     serializer_class = TecnicoListSerializer
     pagination_class = StandardResultsSetPagination
-    filter_backends = [DjangoFilterBackend, filters.SearchFilter, filters.OrderingFilter]
+    filter_backends = [DjangoFilterBackend, filters.SearchFilter, TecnicoOrderingFilter]
+    filterset_class = TecnicoFilter
     
     # Filtro por nombre (búsqueda parcial)
     search_fields = ['first_name', 'last_name']
     
     # Campos por los que se puede ordenar
-    ordering_fields = ['date_joined', 'first_name', 'last_name']
+    ordering_fields = [
+        'date_joined', 'first_name', 'last_name',
+        'total_hours_worked', 'total_pedidos', 'total_payment'
+    ]
     ordering = ['-date_joined']  # Orden por defecto
     
+    # Columnas necesarias para cada campo del listado
+    columnas_por_campo = {
+        'id': ['id'],
+        'full_name': ['first_name', 'last_name'],
+        'total_hours_worked': ['horas_totales'],
+        'total_pedidos': ['pedidos_totales'],
+        'total_payment': ['pago_total'],
+    }
+    campos_calculados = {'total_hours_worked', 'total_pedidos', 'total_payment'}
+    
+    def get_campos(self):
+        """Campos pedidos con ?fields=, None si se piden todos"""
+        valor = self.request.query_params.get('fields')
+        if not valor:
+            return None
+        campos = [campo.strip() for campo in valor.split(',') if campo.strip()]
+        desconocidos = [campo for campo in campos if campo not in self.columnas_por_campo]
+        if desconocidos:
+            raise exceptions.ValidationError(
+                {'fields': f'Campos desconocidos: {", ".join(desconocidos)}'}
+            )
+        return campos
+    
+    def get_serializer(self, *args, **kwargs):
+        kwargs.setdefault('fields', self.get_campos())
+        return super().get_serializer(*args, **kwargs)
+    
     def get_queryset(self):
-        queryset_first = super().get_queryset()        
-        queryset = queryset_first.prefetch_related('pedidos')
+        queryset = super().get_queryset()
+        
+        # Leer solo las columnas de los campos pedidos
+        campos = self.get_campos()
+        if campos is None:
+            queryset = queryset.con_totales()
+        else:
+            if self.campos_calculados.intersection(campos):
+                queryset = queryset.con_totales()
+            queryset = queryset.only(*{
+                columna for campo in campos for columna in self.columnas_por_campo[campo]
+            })
         
         # Log de consulta
         logger.info(f'API Técnicos: Consulta ejecutada con {queryset.count()} resultados')
@@ -111,6 +167,10 @@ class TecnicoListAPIView(generics.ListAPIView):
                 'total_tecnicos': total_count,
                 'filtros_aplicados': {
                     'search': request.query_params.get('search', None),
+                    'min_hours': request.query_params.get('min_hours', None),
+                    'max_hours': request.query_params.get('max_hours', None),
+                    'tier': request.query_params.get('tier', None),
+                    'fields': request.query_params.get('fields', None),
                     'ordering': request.query_params.get('ordering', '-date_joined')
                 }
             }
@@ -118,6 +178,10 @@ class TecnicoListAPIView(generics.ListAPIView):
             logger.info(f'API Técnicos: Respuesta exitosa con {len(response.data["results"])} elementos')
             return response
             
+        except exceptions.APIException:
+            # Errores de validación de filtros: respuesta estándar de DRF
+            raise
+            
         except Exception as e:
             logger.error(f'Error en API Técnicos: {str(e)}')
             return Response(
@@ -126,6 +190,51 @@ class TecnicoListAPIView(generics.ListAPIView):
             )
 
 
+def _generar_informe(con_estadisticas):
+    """
+    Calcula los datos serializados del informe, o None si no hay técnicos activos
+    """
+    # Resumen desde el índice de pagos en memoria (se reconstruye si está desactualizado)
+    resumen = indice_pagos.consultar()
+    
+    if not resumen['total_tecnicos']:
+        return None
+    
+    # Cargar solo los técnicos que aparecen en el informe, con sus datos calculados
+    bajo_promedio_ids = set(resumen['tecnicos_bajo_promedio'])
+    ids = bajo_promedio_ids | {
+        resumen['ultimo_trabajador_monto_bajo'],
+        resumen['ultimo_trabajador_monto_alto'],
+    }
+    tecnicos = {
+        tecnico.id: tecnico
+        for tecnico in Tecnico.objects.filter(id__in=ids).con_liquidacion()
+    }
+    
+    # Preparar datos para el serializer
+    informe_data = {
+        'monto_promedio': Decimal(str(round(resumen['monto_promedio'], 2))),
+        'tecnicos_bajo_promedio': [
+            tecnico for tecnico in tecnicos.values() if tecnico.id in bajo_promedio_ids
+        ],
+        'ultimo_trabajador_monto_bajo': tecnicos[resumen['ultimo_trabajador_monto_bajo']],
+        'ultimo_trabajador_monto_alto': tecnicos[resumen['ultimo_trabajador_monto_alto']],
+        'total_tecnicos': resumen['total_tecnicos'],
+        'total_horas_sistema': resumen['total_horas_sistema'],
+        'total_pedidos_sistema': resumen['total_pedidos_sistema']
+    }
+    
+    # Distribución de pagos opcional
+    if con_estadisticas:
+        informe_data['estadisticas'] = estadisticas_pagos(
+            Tecnico.objects.filter(is_active=True).con_liquidacion()
+        )
+    
+    logger.info(f'API Informe: Generado exitosamente para {resumen["total_tecnicos"]} técnicos')
+    
+    return dict(InformeSerializer(informe_data).data)
+
+
 @api_view(['GET'])
 def informe_tecnicos_view(request):
     """
@@ -136,93 +245,294 @@ def informe_tecnicos_view(request):
     - Datos de técnicos que cobraron menos que el promedio
     - El último trabajador ingresado que cobró el monto más bajo
     - El último trabajador ingresado que cobró el monto más alto
+
+    Los montos salen del índice de pagos en memoria (rapihogar.indice_pagos),
+    que se actualiza con cada cambio de pedidos y técnicos. El informe se
+    guarda en cache y los requests simultáneos comparten un único cálculo.
+
+    Con ?estadisticas=true agrega la distribución de pagos: mediana,
+    percentiles p10/p90, histograma y cantidad de técnicos por escala.
     """
     try:
-        # Obtener todos los técnicos activos con sus datos calculados
-        tecnicos = Tecnico.objects.filter(is_active=True).prefetch_related('pedidos')
+        con_estadisticas = request.query_params.get('estadisticas', '').lower() in ('1', 'true')
+        informe = obtener_cacheado(
+            f'informe_tecnicos:{int(con_estadisticas)}',
+            lambda: _generar_informe(con_estadisticas)
+        )
         
-        if not tecnicos.exists():
+        if informe is None:
             return Response(
                 {'error': 'No hay técnicos activos en el sistema'}, 
                 status=status.HTTP_404_NOT_FOUND
             )
         
-        # Calcular datos para cada técnico
-        tecnicos_data = []
-        for tecnico in tecnicos:
-            tecnico_info = {
-                'tecnico': tecnico,
-                'pago': tecnico.calculate_payment(),
-                'horas': tecnico.total_hours_worked(),
-                'pedidos': tecnico.total_pedidos()
+        return Response({
+            'informe': informe,
+            'meta': {
+                'fecha_generacion': 'now',
+                'criterio_ultimo_trabajador': 'Fecha de ingreso más reciente'
             }
-            tecnicos_data.append(tecnico_info)
+        })
         
-        # Calcular monto promedio
-        pagos = [data['pago'] for data in tecnicos_data if data['pago'] > 0]
-        monto_promedio = sum(pagos) / len(pagos) if pagos else 0
+    except Exception as e:
+        logger.error(f'Error en API Informe: {str(e)}')
+        return Response(
+            {'error': 'Error al generar el informe'}, 
+            status=status.HTTP_500_INTERNAL_SERVER_ERROR
+        )
+
+
+@api_view(['POST'])
+def simular_liquidacion_view(request):
+    """
+    API para simular la liquidación con una tabla de escalas alternativa
+
+    Recibe:
+    - escalas: lista de {hasta, valor_hora, descuento}, la última con hasta = null
+
+    Retorna (sin escribir nada en la base de datos):
+    - Costo total actual y simulado
+    - Cantidad de técnicos y monto por escala simulada
+    - Diferencia de pago por técnico respecto de las escalas vigentes
+    """
+    serializer = SimulacionLiquidacionSerializer(data=request.data)
+    serializer.is_valid(raise_exception=True)
+
+    try:
+        # Simulaciones idénticas simultáneas comparten el mismo cálculo
+        escalas = serializer.validated_data['escalas']
+        simulacion = obtener_cacheado(
+            f'simulacion_liquidacion:{hashlib.sha1(repr(escalas).encode()).hexdigest()}',
+            lambda: simular_liquidacion(escalas)
+        )
+
+        logger.info(
+            f'API Simulación: {len(simulacion["tecnicos"])} técnicos, '
+            f'diferencia total {simulacion["diferencia_total"]}'
+        )
+
+        return Response(simulacion)
+
+    except Exception as e:
+        logger.error(f'Error en API Simulación: {str(e)}')
+        return Response(
+            {'error': 'Error al simular la liquidación'},
+            status=status.HTTP_500_INTERNAL_SERVER_ERROR
+        )
+
+
+@api_view(['GET'])
+def tecnico_detalle_view(request, pk):
+    """
+    API con el detalle de un técnico
+    
+    Retorna los datos del técnico, sus totales (horas, pedidos y pago) y las
+    horas y cantidad de pedidos por esquema y por mes de creación. Los
+    pedidos archivados solo se informan en el histórico.
+    """
+    try:
+        tecnico = Tecnico.objects.select_related('historico').filter(pk=pk).first()
+        if tecnico is None:
+            return Response(
+                {'error': 'Técnico no encontrado'},
+                status=status.HTTP_404_NOT_FOUND
+            )
         
-        # Técnicos que cobraron menos que el promedio
-        tecnicos_bajo_promedio = [
-            data['tecnico'] for data in tecnicos_data 
-            if data['pago'] < monto_promedio
-        ]
+        # Los totales salen del desglose por esquema de los pedidos vigentes
+        # más el histórico de los archivados, sin otra consulta
+        tecnico.por_esquema, tecnico.por_mes = desglose_tecnico(tecnico.id)
+        historico = getattr(tecnico, 'historico', None)
+        tecnico.horas_trabajadas = sum(fila['horas'] for fila in tecnico.por_esquema)
+        tecnico.cantidad_pedidos = sum(fila['pedidos'] for fila in tecnico.por_esquema)
+        if historico is not None:
+            tecnico.horas_trabajadas += historico.horas
+            tecnico.cantidad_pedidos += historico.pedidos
+        tecnico.pago = calcular_pago(tecnico.horas_trabajadas)
+        
+        return Response(TecnicoDetalleSerializer(tecnico).data)
         
-        # Último trabajador (por fecha de ingreso) con monto más bajo
-        tecnico_monto_bajo = min(
-            tecnicos_data, 
-            key=lambda x: (x['pago'], -x['tecnico'].date_joined.timestamp())
-        )['tecnico']
+    except Exception as e:
+        logger.error(f'Error en API Detalle de técnico: {str(e)}')
+        return Response(
+            {'error': 'Error al obtener el técnico'},
+            status=status.HTTP_500_INTERNAL_SERVER_ERROR
+        )
+
+
+@api_view(['GET', 'POST'])
+def tecnicos_lote_view(request):
+    """
+    API para consultar la liquidación de un conjunto de técnicos
+    
+    Recibe los ids en el body de un POST ({"ids": [1, 2, 3]}) o como
+    parámetros repetidos en un GET (?id=1&id=2&id=3), hasta 500 por consulta.
+    
+    Retorna horas, cantidad de pedidos y pago de cada técnico en el orden
+    pedido (calculados en una sola consulta agrupada) y los ids inexistentes.
+    """
+    if request.method == 'POST':
+        datos = request.data
+    else:
+        datos = {'ids': request.query_params.getlist('id')}
+    serializer = LoteTecnicosSerializer(data=datos)
+    serializer.is_valid(raise_exception=True)
+    
+    try:
+        # Sin repetidos, respetando el orden del pedido
+        ids = list(dict.fromkeys(serializer.validated_data['ids']))
+        tecnicos = Tecnico.objects.filter(id__in=ids).con_liquidacion().in_bulk()
         
-        # Último trabajador (por fecha de ingreso) con monto más alto
-        tecnico_monto_alto = max(
-            tecnicos_data, 
-            key=lambda x: (x['pago'], -x['tecnico'].date_joined.timestamp())
-        )['tecnico']
+        return Response({
+            'tecnicos': TecnicoListSerializer(
+                [tecnicos[tecnico_id] for tecnico_id in ids if tecnico_id in tecnicos],
+                many=True
+            ).data,
+            'no_encontrados': [tecnico_id for tecnico_id in ids if tecnico_id not in tecnicos],
+        })
         
-        # Estadísticas adicionales del sistema
-        total_horas_sistema = sum(data['horas'] for data in tecnicos_data)
-        total_pedidos_sistema = sum(data['pedidos'] for data in tecnicos_data)
+    except Exception as e:
+        logger.error(f'Error en API Técnicos por lote: {str(e)}')
+        return Response(
+            {'error': 'Error al consultar los técnicos'},
+            status=status.HTTP_500_INTERNAL_SERVER_ERROR
+        )
+
+
+@api_view(['POST'])
+def ingresar_pedidos_view(request):
+    """
+    API para cargar pedidos en lote (ej: trabajos completados sin conexión)
+    
+    Recibe {"pedidos": [...]}, hasta 1000, cada uno con una clave única
+    generada por el cliente ("clave"), client, tecnico, scheme, type_request
+    y hours_worked.
+    
+    Los pedidos cuya clave ya se cargó no se vuelven a crear: reintentar el
+    mismo lote es seguro. Los nuevos se validan y se crean juntos, en una
+    transacción y con unas pocas consultas para todo el lote.
+    
+    Retorna el id de cada pedido en el orden recibido y si fue creado ahora.
+    """
+    try:
+        # Si otro request cargó las mismas claves en paralelo, el segundo
+        # intento las encuentra como existentes
+        for intento in range(2):
+            serializer = IngresoPedidosSerializer(data=request.data)
+            serializer.is_valid(raise_exception=True)
+            try:
+                resultado = serializer.save()
+                break
+            except IntegrityError:
+                if intento:
+                    raise
         
-        # Preparar datos para el serializer
-        informe_data = {
-            'monto_promedio': Decimal(str(round(monto_promedio, 2))),
-            'tecnicos_bajo_promedio': tecnicos_bajo_promedio,
-            'ultimo_trabajador_monto_bajo': tecnico_monto_bajo,
-            'ultimo_trabajador_monto_alto': tecnico_monto_alto,
-            'total_tecnicos': len(tecnicos_data),
-            'total_horas_sistema': total_horas_sistema,
-            'total_pedidos_sistema': total_pedidos_sistema
-        }
+        logger.info(
+            f'API Pedidos por lote: {resultado["creados"]} creados, '
+            f'{resultado["existentes"]} ya existentes'
+        )
+        return Response(
+            resultado,
+            status=status.HTTP_201_CREATED if resultado['creados'] else status.HTTP_200_OK
+        )
         
-        # Serializar y retornar
-        serializer = InformeSerializer(informe_data)
+    except exceptions.APIException:
+        raise
+    except IntegrityError as e:
+        logger.warning(f'API Pedidos por lote: conflicto al crear los pedidos: {str(e)}')
+        return Response(
+            {'error': 'Conflicto con una carga simultánea, reintente el lote'},
+            status=status.HTTP_409_CONFLICT
+        )
+    except Exception as e:
+        if _base_ocupada(e):
+            logger.warning(f'API Pedidos por lote: base de datos ocupada: {str(e)}')
+            return _respuesta_base_ocupada()
+        logger.error(f'Error en API Pedidos por lote: {str(e)}')
+        return Response(
+            {'error': 'Error al cargar los pedidos'},
+            status=status.HTTP_500_INTERNAL_SERVER_ERROR
+        )
+
+
+@api_view(['GET'])
+@permission_classes([permissions.IsAdminUser])
+def metricas_view(request):
+    """
+    API con las métricas de la API en formato de texto de Prometheus (solo staff)
+    
+    Retorna, sumados entre todos los procesos del servidor:
+    - Requests por endpoint y clase de código
+    - Histograma de latencia por endpoint
+    - Consultas a la base de datos por endpoint
+    - Aciertos y fallos del cache de reportes
+    """
+    try:
+        return HttpResponse(
+            registro().exportar(),
+            content_type='text/plain; version=0.0.4; charset=utf-8'
+        )
         
-        logger.info(f'API Informe: Generado exitosamente para {len(tecnicos_data)} técnicos')
+    except Exception as e:
+        logger.error(f'Error en API Métricas: {str(e)}')
+        return Response(
+            {'error': 'Error al exportar las métricas'},
+            status=status.HTTP_500_INTERNAL_SERVER_ERROR
+        )
+
+
+@api_view(['GET'])
+def cambios_pedidos_view(request):
+    """
+    API para consumir el feed de cambios de pedidos de forma incremental
+    
+    Parámetros:
+    - cursor: id del último cambio ya consumido (default: 0, desde el inicio)
+    - limite: cantidad máxima de cambios a devolver (default: 1000, máximo: 5000)
+    
+    Retorna los cambios con id mayor al cursor en orden, el nuevo cursor y si
+    quedan más cambios por leer. Los cambios más recientes que la ventana de
+    seguridad de FEED_CAMBIOS se sirven en la lectura siguiente.
+    """
+    try:
+        cursor = int(request.query_params.get('cursor', 0))
+        limite = int(request.query_params.get('limite', 1000))
+    except ValueError:
+        return Response(
+            {'error': 'cursor y limite deben ser números enteros'},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    limite = max(1, min(limite, 5000))
+    
+    try:
+        # Un registro extra indica si quedan cambios después del lote
+        cambios = list(CambioPedido.objects.posteriores(cursor).order_by('id')[:limite + 1])
+        hay_mas = len(cambios) > limite
+        cambios = cambios[:limite]
         
         return Response({
-            'informe': serializer.data,
-            'meta': {
-                'fecha_generacion': 'now',
-                'criterio_ultimo_trabajador': 'Fecha de ingreso más reciente'
-            }
+            'cambios': CambioPedidoSerializer(cambios, many=True).data,
+            'cursor': cambios[-1].id if cambios else cursor,
+            'hay_mas': hay_mas
         })
         
     except Exception as e:
-        logger.error(f'Error en API Informe: {str(e)}')
+        logger.error(f'Error en API Cambios de pedidos: {str(e)}')
         return Response(
-            {'error': 'Error al generar el informe'}, 
+            {'error': 'Error al obtener los cambios'},
             status=status.HTTP_500_INTERNAL_SERVER_ERROR
         )
 
-
 class PedidoUpdateAPIView(generics.RetrieveUpdateAPIView):
     """
     API para actualizar pedidos (endpoint opcional)
     
     Permite:
-    - Obtener detalles de un pedido específico
+    - Obtener detalles de un pedido específico (con su versión en el ETag)
     - Actualizar campos del pedido (solo algunos campos editables)
+    
+    Control de concurrencia optimista: si el request trae If-Match con el
+    ETag leído y el pedido cambió desde entonces, responde 412 en lugar de
+    pisar la escritura del otro cliente.
     """
     queryset = Pedido.objects.all()
     serializer_class = PedidoSerializer
@@ -231,13 +541,39 @@ class PedidoUpdateAPIView(generics.RetrieveUpdateAPIView):
         """Optimizar consulta con select_related"""
         return super().get_queryset().select_related('client', 'tecnico', 'scheme')
     
+    def retrieve(self, request, *args, **kwargs):
+        response = super().retrieve(request, *args, **kwargs)
+        response['ETag'] = _etag_pedido(response.data['version'])
+        return response
+    
     def update(self, request, *args, **kwargs):
         """Override para agregar logging y validaciones adicionales"""
         try:
-            instance = self.get_object()
-            old_hours = instance.hours_worked
+            partial = kwargs.pop('partial', False)
+            version_esperada = _version_if_match(request)
             
-            response = super().update(request, *args, **kwargs)
+            with transaccion_escritura():
+                # Una sola lectura, con el registro bloqueado hasta guardar
+                instance = get_object_or_404(
+                    self.get_queryset().select_for_update(of=('self',)),
+                    pk=kwargs['pk']
+                )
+                self.check_object_permissions(request, instance)
+                
+                if version_esperada is not None and version_esperada != instance.version:
+                    return Response(
+                        {
+                            'error': 'El pedido fue modificado por otro usuario',
+                            'version_actual': instance.version
+                        },
+                        status=status.HTTP_412_PRECONDITION_FAILED,
+                        headers={'ETag': _etag_pedido(instance.version)}
+                    )
+                
+                old_hours = instance.hours_worked
+                serializer = self.get_serializer(instance, data=request.data, partial=partial)
+                serializer.is_valid(raise_exception=True)
+                self.perform_update(serializer)
             
             # Log del cambio
             new_hours = instance.hours_worked
@@ -246,11 +582,67 @@ class PedidoUpdateAPIView(generics.RetrieveUpdateAPIView):
                 f'Horas {old_hours} -> {new_hours} por usuario API'
             )
             
-            return response
+            return Response(
+                serializer.data, headers={'ETag': _etag_pedido(instance.version)}
+            )
             
+        except exceptions.APIException:
+            raise
         except Exception as e:
+            if _base_ocupada(e):
+                logger.warning(f'Pedido #{kwargs["pk"]}: base de datos ocupada: {str(e)}')
+                return _respuesta_base_ocupada()
             logger.error(f'Error al actualizar pedido: {str(e)}')
             return Response(
                 {'error': 'Error al actualizar el pedido'}, 
                 status=status.HTTP_500_INTERNAL_SERVER_ERROR
-            )
\ No newline at end of file
+            )
+    
+    def perform_update(self, serializer):
+        """Guarda solo los campos que cambiaron e incrementa la versión"""
+        instance = serializer.instance
+        campos = [
+            campo for campo, valor in serializer.validated_data.items()
+            if getattr(instance, campo) != valor
+        ]
+        if not campos:
+            return
+        
+        for campo in campos:
+            setattr(instance, campo, serializer.validated_data[campo])
+        instance.version += 1
+        instance.save(update_fields=campos + ['version', 'updated_at'])
+
+
+def _base_ocupada(error):
+    """Si el error es por un lock de la base que no se liberó a tiempo"""
+    mensaje = str(error).lower()
+    return isinstance(error, OperationalError) and ('locked' in mensaje or 'busy' in mensaje)
+
+
+def _respuesta_base_ocupada():
+    return Response(
+        {'error': 'La base de datos está ocupada, reintente en unos segundos'},
+        status=status.HTTP_503_SERVICE_UNAVAILABLE,
+        headers={'Retry-After': '1'}
+    )
+
+
+def _etag_pedido(version):
+    return f'"{version}"'
+
+
+def _version_if_match(request):
+    """
+    Versión esperada según el header If-Match, None si no se envió o es '*'
+    """
+    valor = request.headers.get('If-Match')
+    if not valor or valor.strip() == '*':
+        return None
+    valor = valor.strip()
+    if valor.startswith('W/'):
+        valor = valor[2:]
+    try:
+        return int(valor.strip('"'))
+    except ValueError:
+        raise exceptions.ValidationError({'If-Match': 'ETag inválido'})
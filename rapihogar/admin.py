@@ -65,6 +65,10 @@ class TecnicoAdmin(admin.ModelAdmin):
         }),
     )
     
+    def get_queryset(self, request):
+        # El histórico se suma a los totales de cada fila
+        return super().get_queryset(request).select_related('historico')
+    
     def total_pedidos_display(self, obj):
         return obj.total_pedidos()
     total_pedidos_display.short_description = 'Total Pedidos'
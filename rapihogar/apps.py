@@ -0,0 +1,11 @@
+from django.apps import AppConfig
+
+
+class RapihogarConfig(AppConfig):
+    name = 'rapihogar'
+    verbose_name = 'Rapihogar'
+
+    def ready(self):
+        # Registrar las señales de la liquidación, las tareas de la cola
+        # y la verificación del perfil de configuración
+        from . import checks, signals, tareas  # noqa: F401
@@ -4,4 +4,30 @@ from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'rapihogar.settings')
 
-application = get_asgi_application()
+django_application = get_asgi_application()
+
+# Importar después de configurar Django
+from django.conf import settings  # noqa: E402
+
+from api.sse import eventos_liquidacion  # noqa: E402
+from rapihogar.checks import verificar_al_iniciar  # noqa: E402
+
+# Los checks de manage.py no corren al levantar el servidor
+verificar_al_iniciar()
+
+RUTA_EVENTOS = settings.EVENTOS_LIQUIDACION['RUTA']
+
+if settings.DEBUG:
+    # Como runserver: los archivos estáticos (ej: el admin) se sirven en desarrollo
+    from django.contrib.staticfiles.handlers import ASGIStaticFilesHandler  # noqa: E402
+
+    django_application = ASGIStaticFilesHandler(django_application)
+
+
+async def application(scope, receive, send):
+    # El stream de eventos se atiende sin pasar por Django: cada cliente
+    # conectado es una corrutina, no un hilo
+    if scope['type'] == 'http' and scope['path'] == RUTA_EVENTOS:
+        await eventos_liquidacion(scope, receive, send)
+        return
+    await django_application(scope, receive, send)
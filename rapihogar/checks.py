@@ -0,0 +1,83 @@
+"""
+Verificación al iniciar del perfil de configuración activo
+"""
+import logging
+
+from django.conf import settings
+from django.core import checks
+from django.core.exceptions import ImproperlyConfigured
+
+logger = logging.getLogger(__name__)
+
+
+@checks.register()
+def verificar_entorno(app_configs, **kwargs):
+    """
+    Informa el perfil activo y, en producción, reporta las opciones que
+    no corresponden a ese perfil
+    """
+    base = settings.DATABASES['default']
+    logger.info(
+        f'Perfil de configuración: {settings.ENTORNO} '
+        f'(DEBUG={settings.DEBUG}, CONN_MAX_AGE={base.get("CONN_MAX_AGE", 0)})'
+    )
+
+    if settings.ENTORNO != settings.PRODUCCION:
+        return []
+
+    errores = []
+    if settings.DEBUG:
+        errores.append(checks.Error(
+            'DEBUG está activo en el perfil de producción.',
+            id='rapihogar.E001',
+        ))
+    if settings.SECRET_KEY.startswith('django-insecure-'):
+        errores.append(checks.Error(
+            'El perfil de producción usa la SECRET_KEY de desarrollo.',
+            hint='Definir la variable de entorno DJANGO_SECRET_KEY.',
+            id='rapihogar.E002',
+        ))
+    if 'django_extensions' in settings.INSTALLED_APPS:
+        errores.append(checks.Warning(
+            'django_extensions está instalado en el perfil de producción.',
+            id='rapihogar.W001',
+        ))
+    if not base.get('CONN_MAX_AGE'):
+        errores.append(checks.Warning(
+            'Las conexiones a la base no son persistentes (CONN_MAX_AGE=0).',
+            id='rapihogar.W002',
+        ))
+    if settings.CACHES['default']['BACKEND'].endswith('LocMemCache'):
+        errores.append(checks.Warning(
+            'El cache es por proceso: el throttle y el cache de reportes no se comparten entre workers.',
+            hint='Definir la variable de entorno REDIS_URL.',
+            id='rapihogar.W004',
+        ))
+    renderers = settings.REST_FRAMEWORK.get('DEFAULT_RENDERER_CLASSES', [])
+    if not renderers or 'rest_framework.renderers.BrowsableAPIRenderer' in renderers:
+        errores.append(checks.Warning(
+            'La API navegable está habilitada en el perfil de producción.',
+            id='rapihogar.W003',
+        ))
+    return errores
+
+
+def verificar_al_iniciar():
+    """
+    Corre verificar_entorno al levantar la aplicación (wsgi.py y asgi.py),
+    donde no corren los checks de manage.py: registra las advertencias y no
+    arranca si hay errores. Respeta SILENCED_SYSTEM_CHECKS.
+    """
+    problemas = [
+        problema for problema in verificar_entorno(None)
+        if problema.id not in settings.SILENCED_SYSTEM_CHECKS
+    ]
+    errores = [problema for problema in problemas if problema.is_serious()]
+    for problema in problemas:
+        if not problema.is_serious():
+            logger.warning(f'{problema.id}: {problema.msg}')
+    if errores:
+        raise ImproperlyConfigured(
+            'Configuración inválida para el perfil activo: '
+            + '; '.join(f'{error.id}: {error.msg}' for error in errores)
+        )
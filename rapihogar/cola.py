@@ -0,0 +1,198 @@
+"""
+Cola local de trabajos respaldada por la base de datos (sin broker externo)
+"""
+import logging
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, Min
+from django.utils import timezone
+
+from .models import Trabajo
+
+logger = logging.getLogger(__name__)
+
+_tareas = {}
+
+
+def tarea(nombre):
+    """Registra una función como tarea de la cola con el nombre dado"""
+    def registrar(funcion):
+        _tareas[nombre] = funcion
+        return funcion
+    return registrar
+
+
+def encolar(nombre, clave=None, **parametros):
+    """
+    Encola un trabajo. Si ya hay uno pendiente con la misma clave no se
+    agrega otro. Se escribe en la transacción actual, así el trabajo solo
+    existe si la escritura que lo originó se confirma.
+    """
+    if nombre not in _tareas:
+        raise ValueError(f'Tarea desconocida: {nombre}')
+    Trabajo.objects.bulk_create(
+        [Trabajo(tarea=nombre, clave=clave, parametros=parametros)],
+        ignore_conflicts=True
+    )
+
+
+def encolar_lote(nombre, trabajos):
+    """
+    Encola varios trabajos de una tarea en una sola consulta. 'trabajos' es
+    una lista de (clave, parametros), con la misma deduplicación que encolar.
+    """
+    if nombre not in _tareas:
+        raise ValueError(f'Tarea desconocida: {nombre}')
+    Trabajo.objects.bulk_create(
+        [Trabajo(tarea=nombre, clave=clave, parametros=parametros) for clave, parametros in trabajos],
+        ignore_conflicts=True
+    )
+
+
+def _config():
+    return settings.COLA_TRABAJOS
+
+
+def _tomar(limite):
+    """Reserva hasta 'limite' trabajos disponibles, retorna los reservados"""
+    ahora = timezone.now()
+    candidatos = list(
+        Trabajo.objects.filter(estado=Trabajo.PENDIENTE, disponible_en__lte=ahora)
+        .order_by('disponible_en', 'id')
+        .values_list('id', flat=True)[:limite]
+    )
+
+    tomados = []
+    for trabajo_id in candidatos:
+        # Solo un proceso gana la actualización condicional
+        reservado = Trabajo.objects.filter(id=trabajo_id, estado=Trabajo.PENDIENTE).update(
+            estado=Trabajo.EN_CURSO,
+            iniciado_en=ahora,
+            intentos=F('intentos') + 1
+        )
+        if reservado:
+            tomados.append(trabajo_id)
+    return list(Trabajo.objects.filter(id__in=tomados).order_by('disponible_en', 'id'))
+
+
+def _cambiar_estado(trabajo, **campos):
+    """
+    Actualiza el trabajo. Si vuelve a pendiente y ya existe otro pendiente con
+    la misma clave, este queda reemplazado por aquel.
+    """
+    try:
+        with transaction.atomic():
+            Trabajo.objects.filter(id=trabajo.id).update(**campos)
+    except IntegrityError:
+        Trabajo.objects.filter(id=trabajo.id).update(
+            estado=Trabajo.COMPLETADO,
+            terminado_en=timezone.now(),
+            error='Reemplazado por un trabajo pendiente con la misma clave'
+        )
+
+
+def ejecutar(trabajo):
+    """Ejecuta un trabajo reservado y registra el resultado, con reintentos"""
+    config = _config()
+    try:
+        _tareas[trabajo.tarea](**trabajo.parametros)
+    except Exception as e:
+        if trabajo.intentos < config['MAX_INTENTOS']:
+            espera = config['BACKOFF_BASE'] * 2 ** (trabajo.intentos - 1)
+            logger.warning(
+                f'Trabajo #{trabajo.id} ({trabajo.tarea}) falló, reintento en {espera}s: {e}'
+            )
+            _cambiar_estado(
+                trabajo,
+                estado=Trabajo.PENDIENTE,
+                disponible_en=timezone.now() + timedelta(seconds=espera),
+                error=str(e)
+            )
+        else:
+            logger.error(f'Trabajo #{trabajo.id} ({trabajo.tarea}) falló definitivamente: {e}')
+            _cambiar_estado(
+                trabajo,
+                estado=Trabajo.FALLIDO,
+                terminado_en=timezone.now(),
+                error=str(e)
+            )
+        return False
+
+    terminado = timezone.now()
+    Trabajo.objects.filter(id=trabajo.id).update(
+        estado=Trabajo.COMPLETADO,
+        terminado_en=terminado
+    )
+    logger.debug(
+        f'Trabajo #{trabajo.id} ({trabajo.tarea}) completado, '
+        f'latencia {(terminado - trabajo.creado_en).total_seconds():.3f}s'
+    )
+    return True
+
+
+def procesar_lote(limite=50):
+    """Reserva y ejecuta un lote de trabajos, retorna la cantidad procesada"""
+    trabajos = _tomar(limite)
+    for trabajo in trabajos:
+        ejecutar(trabajo)
+    return len(trabajos)
+
+
+def procesar_pendientes():
+    """Procesa todos los trabajos disponibles en el hilo actual"""
+    total = 0
+    while True:
+        procesados = procesar_lote()
+        if not procesados:
+            return total
+        total += procesados
+
+
+def recuperar_colgados():
+    """Devuelve a pendiente los trabajos en curso de workers que se cayeron"""
+    limite = timezone.now() - timedelta(seconds=_config()['TIMEOUT_EN_CURSO'])
+    colgados = Trabajo.objects.filter(estado=Trabajo.EN_CURSO, iniciado_en__lt=limite)
+    for trabajo in colgados:
+        _cambiar_estado(trabajo, estado=Trabajo.PENDIENTE)
+    return len(colgados)
+
+
+def purgar_completados():
+    """Elimina los trabajos completados más antiguos que la retención configurada"""
+    limite = timezone.now() - timedelta(hours=_config()['RETENCION_HORAS'])
+    eliminados, _ = Trabajo.objects.filter(
+        estado=Trabajo.COMPLETADO, terminado_en__lt=limite
+    ).delete()
+    return eliminados
+
+
+def metricas(muestra=1000):
+    """
+    Métricas de la cola: trabajos por estado, antigüedad del pendiente más
+    viejo y latencia (encolado -> completado) de los últimos completados
+    """
+    ahora = timezone.now()
+    por_estado = {estado: 0 for estado, _ in Trabajo.ESTADOS}
+    for fila in Trabajo.objects.values('estado').annotate(total=Count('id')).order_by():
+        por_estado[fila['estado']] = fila['total']
+
+    mas_viejo = Trabajo.objects.filter(estado=Trabajo.PENDIENTE).aggregate(
+        creado=Min('creado_en')
+    )['creado']
+
+    latencias = sorted(
+        (terminado - creado).total_seconds()
+        for creado, terminado in Trabajo.objects.filter(estado=Trabajo.COMPLETADO)
+        .order_by('-terminado_en')
+        .values_list('creado_en', 'terminado_en')[:muestra]
+    )
+
+    return {
+        'profundidad': por_estado[Trabajo.PENDIENTE],
+        'por_estado': por_estado,
+        'antiguedad_pendiente': (ahora - mas_viejo).total_seconds() if mas_viejo else 0,
+        'latencia_media': sum(latencias) / len(latencias) if latencias else None,
+        'latencia_p95': latencias[int(0.95 * (len(latencias) - 1))] if latencias else None,
+    }
@@ -0,0 +1,111 @@
+"""
+Tabla de escalas de pago usada en la liquidación de técnicos
+"""
+from bisect import bisect_left
+from collections import namedtuple
+
+from django.db.models import Case, FloatField, Value, When
+from django.db.models.lookups import LessThanOrEqual
+
+
+# hasta: horas máximas de la escala (None = sin límite)
+Escala = namedtuple('Escala', ['hasta', 'valor_hora', 'descuento'])
+
+# Escalas vigentes:
+# 0-14: 200/hora - 15% descuento
+# 15-28: 250/hora - 16% descuento
+# 29-47: 300/hora - 17% descuento
+# >48: 350/hora - 18% descuento
+ESCALAS_PAGO = (
+    Escala(14, 200, 0.15),
+    Escala(28, 250, 0.16),
+    Escala(47, 300, 0.17),
+    Escala(None, 350, 0.18),
+)
+
+
+#Obtener el índice de la escala que corresponde a un total de horas
+def indice_escala(horas, escalas=ESCALAS_PAGO):
+    limites = [escala.hasta for escala in escalas[:-1]]
+    return bisect_left(limites, horas)
+
+
+#Calcular el pago de un total de horas según las escalas
+def calcular_pago(horas, escalas=ESCALAS_PAGO):
+    escala = escalas[indice_escala(horas, escalas)]
+    gross_payment = horas * escala.valor_hora
+    discount = gross_payment * escala.descuento
+    return gross_payment - discount
+
+
+#Expresión SQL equivalente a calcular_pago sobre una expresión de horas
+def expresion_pago(horas, escalas=ESCALAS_PAGO):
+    def pago(escala):
+        gross_payment = horas * Value(escala.valor_hora)
+        return gross_payment - gross_payment * Value(escala.descuento)
+
+    return Case(
+        *[
+            When(LessThanOrEqual(horas, escala.hasta), then=pago(escala))
+            for escala in escalas[:-1]
+        ],
+        default=pago(escalas[-1]),
+        output_field=FloatField(),
+    )
+
+
+#Rango de horas (desde, hasta) de una escala, hasta = None si no tiene límite
+def rango_escala(indice, escalas=ESCALAS_PAGO):
+    desde = escalas[indice - 1].hasta + 1 if indice > 0 else 0
+    return desde, escalas[indice].hasta
+
+
+#Etiqueta legible de una escala, por ejemplo "15-28" o "48+"
+def etiqueta_escala(indice, escalas=ESCALAS_PAGO):
+    desde, hasta = rango_escala(indice, escalas)
+    if hasta is None:
+        return f'{desde}+'
+    return f'{desde}-{hasta}'
+
+
+def construir_escalas(datos):
+    """
+    Construye y valida una tabla de escalas a partir de una lista de dicts
+    con las claves 'hasta', 'valor_hora' y 'descuento'.
+
+    Las escalas deben venir ordenadas por 'hasta' de forma creciente y la
+    última debe quedar abierta (hasta = None). Lanza ValueError si no es válida.
+    """
+    if not datos:
+        raise ValueError('Se requiere al menos una escala.')
+
+    escalas = []
+    anterior = -1
+    for posicion, dato in enumerate(datos):
+        try:
+            hasta = dato.get('hasta')
+            hasta = int(hasta) if hasta is not None else None
+            valor_hora = float(dato['valor_hora'])
+            descuento = float(dato['descuento'])
+        except (AttributeError, KeyError, TypeError, ValueError):
+            raise ValueError(
+                f'Escala #{posicion + 1} inválida: se esperan hasta, valor_hora y descuento.'
+            )
+
+        ultima = posicion == len(datos) - 1
+        if ultima and hasta is not None:
+            raise ValueError('La última escala debe quedar abierta (hasta = null).')
+        if not ultima:
+            if hasta is None:
+                raise ValueError('Solo la última escala puede quedar abierta.')
+            if hasta <= anterior:
+                raise ValueError('Las escalas deben estar ordenadas por horas crecientes.')
+            anterior = hasta
+        if valor_hora < 0:
+            raise ValueError('El valor hora no puede ser negativo.')
+        if not 0 <= descuento <= 1:
+            raise ValueError('El descuento debe estar entre 0 y 1.')
+
+        escalas.append(Escala(hasta, valor_hora, descuento))
+
+    return tuple(escalas)
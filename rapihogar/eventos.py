@@ -0,0 +1,241 @@
+"""
+Publicación en vivo de los cambios de liquidación, con pub/sub dentro del proceso
+"""
+import asyncio
+import logging
+import threading
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import close_old_connections
+
+from .indice_pagos import indice_pagos
+from .models import CambioPedido, Tecnico
+
+logger = logging.getLogger(__name__)
+
+# Campos del resumen de informe que se publican cuando cambian
+CAMPOS_INFORME = (
+    'monto_promedio',
+    'total_tecnicos',
+    'total_horas_sistema',
+    'total_pedidos_sistema',
+    'ultimo_trabajador_monto_bajo',
+    'ultimo_trabajador_monto_alto',
+)
+
+
+def _config():
+    return settings.EVENTOS_LIQUIDACION
+
+
+def ultimo_cambio():
+    """Id del último cambio de pedidos que ya se puede consumir (0 si no hay)"""
+    return CambioPedido.objects.posteriores(0).order_by('-id').values_list('id', flat=True).first() or 0
+
+
+def resumen_informe():
+    """Totales del informe desde el índice de pagos en memoria"""
+    resumen = indice_pagos.consultar()
+    informe = {campo: resumen.get(campo) for campo in CAMPOS_INFORME}
+    if informe['monto_promedio'] is not None:
+        informe['monto_promedio'] = round(informe['monto_promedio'], 2)
+    return informe
+
+
+def resumen_tecnicos(tecnico_ids):
+    """Horas, pedidos y pago actuales de los técnicos indicados"""
+    return [
+        {**fila, 'pago': round(fila['pago'], 2)}
+        for fila in Tecnico.objects.filter(id__in=tecnico_ids).con_liquidacion()
+        .order_by('id')
+        .values('id', 'first_name', 'last_name', 'is_active',
+                'horas_trabajadas', 'cantidad_pedidos', 'pago')
+    ]
+
+
+def calcular_delta(cursor, tecnico_ids=(), limite=None):
+    """
+    Lee los cambios de pedidos posteriores a 'cursor' y calcula el resumen
+    de los técnicos afectados (más 'tecnico_ids'), en una consulta agrupada.
+
+    Retorna (nuevo_cursor, tecnicos, completo): completo es False si
+    quedaron cambios sin leer por el límite.
+    """
+    limite = limite or _config()['LIMITE_CAMBIOS']
+    cambios = list(
+        CambioPedido.objects.posteriores(cursor)
+        .order_by('id')
+        .values_list('id', 'tecnico_antes', 'tecnico_despues')[:limite + 1]
+    )
+    completo = len(cambios) <= limite
+    cambios = cambios[:limite]
+
+    afectados = set(tecnico_ids)
+    for _, antes, despues in cambios:
+        afectados.update((antes, despues))
+    afectados.discard(None)
+
+    if cambios:
+        cursor = cambios[-1][0]
+    tecnicos = resumen_tecnicos(afectados) if afectados else []
+    return cursor, tecnicos, completo
+
+
+class Suscripcion:
+    """Cola de eventos de un cliente conectado"""
+
+    def __init__(self, maximo):
+        self.cola = asyncio.Queue(maxsize=maximo)
+        self.desbordada = False
+
+    def entregar(self, evento):
+        try:
+            self.cola.put_nowait(evento)
+        except asyncio.QueueFull:
+            # Cliente lento: se descartan sus eventos y se le pide resincronizar
+            self.desbordada = True
+
+    async def siguiente(self, timeout):
+        """Próximo evento (tipo, cursor, datos), o None si pasó el timeout"""
+        if self.desbordada:
+            self.desbordada = False
+            while not self.cola.empty():
+                self.cola.get_nowait()
+            return 'resincronizar', None, {}
+        try:
+            return await asyncio.wait_for(self.cola.get(), timeout)
+        except asyncio.TimeoutError:
+            return None
+
+
+class PublicadorLiquidacion:
+    """
+    Publica los cambios de la liquidación a los clientes conectados al proceso.
+
+    Una única tarea por proceso lee el feed de cambios de pedidos desde su
+    cursor, calcula una vez el resumen de los técnicos afectados y del
+    informe, y lo reparte en las colas de los suscriptores:
+
+    - Las escrituras del mismo proceso la despiertan al confirmarse (notificar)
+    - Las de otros procesos se leen consultando el feed cada
+      INTERVALO_CONSULTA segundos: no hace falta un broker
+    - Sin suscriptores la tarea se detiene, así no consulta la base
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._suscripciones = set()
+        self._pendientes = set()  # técnicos modificados en este proceso
+        self._loop = None
+        self._despertar = None
+        self._listo = None
+        self._tarea = None
+        self.cursor = 0
+        self._informe = None
+
+    async def suscribir(self):
+        """Registra un suscriptor, retorna (suscripcion, cursor, informe actual)"""
+        if self._tarea is None:
+            self._loop = asyncio.get_running_loop()
+            self._despertar = asyncio.Event()
+            self._listo = asyncio.Event()
+            self._tarea = asyncio.create_task(self._ciclo())
+        tarea = self._tarea
+        listo = asyncio.ensure_future(self._listo.wait())
+        await asyncio.wait([listo, tarea], return_when=asyncio.FIRST_COMPLETED)
+        if not listo.done():
+            listo.cancel()
+            self._detener()
+            raise tarea.exception()
+
+        suscripcion = Suscripcion(_config()['MAXIMO_PENDIENTES'])
+        self._suscripciones.add(suscripcion)
+        return suscripcion, self.cursor, self._informe
+
+    def cancelar(self, suscripcion):
+        self._suscripciones.discard(suscripcion)
+        if not self._suscripciones:
+            self._detener()
+
+    def _detener(self):
+        if self._tarea is not None:
+            self._tarea.cancel()
+        with self._lock:
+            self._tarea = self._loop = self._despertar = self._listo = None
+
+    def notificar(self, tecnico_ids=()):
+        """Avisa una escritura confirmada; se puede llamar desde cualquier hilo"""
+        with self._lock:
+            self._pendientes.update(tecnico_ids)
+            loop, despertar = self._loop, self._despertar
+        if loop is not None:
+            try:
+                loop.call_soon_threadsafe(despertar.set)
+            except RuntimeError:
+                # El loop se cerró entre la lectura y el aviso
+                pass
+
+    async def ponerse_al_dia(self, cursor):
+        """
+        Técnicos afectados por los cambios posteriores a 'cursor', para un
+        cliente que se reconecta. Retorna (tecnicos, completo).
+        """
+        _, tecnicos, completo = await sync_to_async(self._con_conexion)(calcular_delta, cursor)
+        return tecnicos, completo
+
+    def _con_conexion(self, funcion, *args):
+        # Fuera de un request nadie cierra las conexiones vencidas
+        close_old_connections()
+        try:
+            return funcion(*args)
+        finally:
+            close_old_connections()
+
+    def _publicar(self, tipo, datos):
+        for suscripcion in self._suscripciones:
+            suscripcion.entregar((tipo, self.cursor, datos))
+
+    async def _ciclo(self):
+        config = _config()
+        self.cursor = await sync_to_async(self._con_conexion)(ultimo_cambio)
+        self._informe = await sync_to_async(self._con_conexion)(resumen_informe)
+        self._listo.set()
+
+        while True:
+            try:
+                await asyncio.wait_for(self._despertar.wait(), config['INTERVALO_CONSULTA'])
+            except asyncio.TimeoutError:
+                pass
+            # Agrupar las escrituras seguidas en un solo evento
+            await asyncio.sleep(config['AGRUPAR_SEGUNDOS'])
+            self._despertar.clear()
+
+            with self._lock:
+                tecnico_ids, self._pendientes = self._pendientes, set()
+            try:
+                await self._procesar(tecnico_ids)
+            except Exception as e:
+                logger.error(f'Eventos de liquidación: error al calcular los cambios: {e}')
+
+    async def _procesar(self, tecnico_ids):
+        cursor, tecnicos, completo = await sync_to_async(self._con_conexion)(
+            calcular_delta, self.cursor, tecnico_ids
+        )
+        if not completo:
+            # Quedan cambios por leer: seguir sin esperar
+            self._despertar.set()
+        if cursor == self.cursor and not tecnicos:
+            return
+
+        self.cursor = cursor
+        if tecnicos:
+            self._publicar('tecnicos', {'tecnicos': tecnicos})
+
+        informe = await sync_to_async(self._con_conexion)(resumen_informe)
+        if informe != self._informe:
+            self._informe = informe
+            self._publicar('informe', informe)
+
+
+publicador = PublicadorLiquidacion()
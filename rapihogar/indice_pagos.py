@@ -0,0 +1,141 @@
+"""
+Índice en memoria de los pagos de los técnicos activos
+"""
+import threading
+from bisect import bisect_left, insort
+
+from .models import Tecnico, VersionLiquidacion
+
+
+class IndicePagos:
+    """
+    Índice por proceso de los técnicos activos ordenado por (pago, fecha de
+    ingreso), con la suma y cantidad de pagos mantenidas de forma incremental.
+
+    Se carga una vez desde la base y se actualiza con las señales de Pedido y
+    Técnico: los técnicos modificados se releen en la siguiente consulta.
+    Cada consulta compara la versión del índice con VersionLiquidacion: si
+    otro proceso escribió, el índice se reconstruye.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._version = None
+        self._vaciar()
+
+    def _vaciar(self):
+        self._pendientes = set()  # técnicos modificados a releer
+        self._entradas = []  # (pago, fecha de ingreso, id) ordenadas
+        self._tecnicos = {}  # id -> (entrada, horas, pedidos)
+        self._suma_centavos = 0  # suma de pagos mayores a cero
+        self._cantidad_pagos = 0
+        self._total_horas = 0
+        self._total_pedidos = 0
+
+    def _consulta(self):
+        return Tecnico.objects.filter(is_active=True).con_liquidacion().values_list(
+            'id', 'date_joined', 'pago', 'horas_trabajadas', 'cantidad_pedidos'
+        )
+
+    def _agregar(self, tecnico_id, date_joined, pago, horas, pedidos):
+        entrada = (pago, date_joined.timestamp(), tecnico_id)
+        self._tecnicos[tecnico_id] = (entrada, horas, pedidos)
+        insort(self._entradas, entrada)
+        self._acumular(entrada, horas, pedidos, 1)
+
+    def _quitar(self, tecnico_id):
+        if tecnico_id not in self._tecnicos:
+            return
+        entrada, horas, pedidos = self._tecnicos.pop(tecnico_id)
+        del self._entradas[bisect_left(self._entradas, entrada)]
+        self._acumular(entrada, horas, pedidos, -1)
+
+    def _acumular(self, entrada, horas, pedidos, signo):
+        pago = entrada[0]
+        if pago > 0:
+            self._suma_centavos += signo * round(pago * 100)
+            self._cantidad_pagos += signo
+        self._total_horas += signo * horas
+        self._total_pedidos += signo * pedidos
+
+    def _cargar(self, version):
+        self._vaciar()
+        for tecnico_id, date_joined, pago, horas, pedidos in self._consulta().iterator():
+            entrada = (pago, date_joined.timestamp(), tecnico_id)
+            self._tecnicos[tecnico_id] = (entrada, horas, pedidos)
+            self._entradas.append(entrada)
+            self._acumular(entrada, horas, pedidos, 1)
+        self._entradas.sort()
+        self._version = version
+
+    def marcar_cambio(self, tecnico_ids, anterior, nueva):
+        """
+        Registra una escritura que pasó la versión de 'anterior' a 'nueva'.
+        Los técnicos afectados se vuelven a leer en la próxima consulta, así
+        la escritura no paga el recálculo. Si el índice no estaba en
+        'anterior' (otro proceso escribió en el medio) queda marcado para
+        reconstruirse.
+        """
+        with self._lock:
+            if self._version is None or self._version != anterior:
+                self._version = None
+                return
+            self._pendientes.update(tecnico_ids)
+            self._version = nueva
+
+    def _actualizar_pendientes(self):
+        tecnico_ids = self._pendientes
+        self._pendientes = set()
+        filas = list(self._consulta().filter(id__in=tecnico_ids))
+        for tecnico_id in tecnico_ids:
+            self._quitar(tecnico_id)
+        for fila in filas:
+            self._agregar(*fila)
+
+    def invalidar(self):
+        with self._lock:
+            self._version = None
+
+    def consultar(self):
+        """
+        Retorna el resumen del informe: monto promedio, ids de los técnicos
+        que cobraron menos que el promedio, id del último ingresado con el
+        monto más bajo y con el más alto, y los totales del sistema.
+        """
+        version = VersionLiquidacion.actual()
+
+        with self._lock:
+            if version is None or version != self._version:
+                self._cargar(version)
+            elif self._pendientes:
+                self._actualizar_pendientes()
+
+            if not self._entradas:
+                return {'total_tecnicos': 0}
+
+            if self._cantidad_pagos:
+                monto_promedio = self._suma_centavos / self._cantidad_pagos / 100
+            else:
+                monto_promedio = 0
+
+            # Todas las entradas con pago menor al promedio
+            bajo_promedio = bisect_left(self._entradas, (monto_promedio,))
+
+            # Última entrada con el pago mínimo = último ingresado que cobró menos
+            pago_minimo = self._entradas[0][0]
+            monto_bajo = self._entradas[bisect_left(self._entradas, (pago_minimo, float('inf'))) - 1]
+
+            return {
+                'monto_promedio': monto_promedio,
+                'tecnicos_bajo_promedio': [
+                    entrada[2] for entrada in self._entradas[:bajo_promedio]
+                ],
+                'ultimo_trabajador_monto_bajo': monto_bajo[2],
+                'ultimo_trabajador_monto_alto': self._entradas[-1][2],
+                'total_tecnicos': len(self._entradas),
+                'total_horas_sistema': self._total_horas,
+                'total_pedidos_sistema': self._total_pedidos,
+            }
+
+
+indice_pagos = IndicePagos()
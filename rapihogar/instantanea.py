@@ -0,0 +1,338 @@
+"""
+Instantánea columnar de la liquidación en un archivo mapeado en memoria
+"""
+import json
+import math
+import mmap
+import operator
+import os
+import struct
+import sys
+import tempfile
+from array import array
+from itertools import compress, repeat
+
+from django.utils import timezone
+
+from .models import Pedido, Tecnico, VersionLiquidacion
+from .transacciones import transaccion_lectura
+
+MAGIA = b'RHINST01'
+ALINEACION = 8
+# Valor de las claves foráneas nulas (los ids empiezan en 1)
+NULO = 0
+
+# Columnas de cada tabla: nombre -> código de tipo de array
+COLUMNAS = {
+    'tecnicos': {
+        'id': 'q',
+        'horas': 'q',
+        'pedidos': 'q',
+        'pago': 'd',
+        'activo': 'b',
+        'date_joined': 'd',  # segundos desde epoch
+    },
+    'pedidos': {
+        'id': 'q',
+        'tecnico_id': 'q',
+        'scheme_id': 'q',
+        'tipo': 'b',
+        'horas': 'q',
+        'created_at': 'd',  # segundos desde epoch, NaN si es nulo
+    },
+}
+
+_OPERADORES = {
+    '==': operator.eq,
+    '!=': operator.ne,
+    '<': operator.lt,
+    '<=': operator.le,
+    '>': operator.gt,
+    '>=': operator.ge,
+}
+
+_AGREGADOS = ('count', 'sum', 'min', 'max', 'avg')
+
+
+def _epoch(fecha):
+    return fecha.timestamp() if fecha is not None else math.nan
+
+
+def _leer_tecnicos():
+    columnas = {nombre: array(tipo) for nombre, tipo in COLUMNAS['tecnicos'].items()}
+    consulta = Tecnico.objects.con_liquidacion().order_by('id').values_list(
+        'id', 'horas_trabajadas', 'cantidad_pedidos', 'pago', 'is_active', 'date_joined'
+    )
+    for tecnico_id, horas, pedidos, pago, activo, date_joined in consulta.iterator():
+        columnas['id'].append(tecnico_id)
+        columnas['horas'].append(horas)
+        columnas['pedidos'].append(pedidos)
+        columnas['pago'].append(pago)
+        columnas['activo'].append(int(activo))
+        columnas['date_joined'].append(_epoch(date_joined))
+    return columnas
+
+
+def _leer_pedidos():
+    columnas = {nombre: array(tipo) for nombre, tipo in COLUMNAS['pedidos'].items()}
+    consulta = Pedido.objects.order_by('id').values_list(
+        'id', 'tecnico_id', 'scheme_id', 'type_request', 'hours_worked', 'created_at'
+    )
+    for pedido_id, tecnico_id, scheme_id, tipo, horas, created_at in consulta.iterator(chunk_size=5000):
+        columnas['id'].append(pedido_id)
+        columnas['tecnico_id'].append(tecnico_id or NULO)
+        columnas['scheme_id'].append(scheme_id or NULO)
+        columnas['tipo'].append(tipo)
+        columnas['horas'].append(horas)
+        columnas['created_at'].append(_epoch(created_at))
+    return columnas
+
+
+def _relleno(posicion):
+    return -posicion % ALINEACION
+
+
+def escribir_instantanea(ruta):
+    """
+    Escribe la instantánea de técnicos y pedidos en 'ruta'.
+
+    El archivo se escribe aparte y se reemplaza de forma atómica: los
+    procesos que tienen abierta la instantánea anterior la siguen leyendo
+    sin cambios. Retorna la cantidad de filas por tabla.
+
+    Técnicos, pedidos y versión se leen en una misma transacción de
+    lectura, para que los totales de los técnicos correspondan a los pedidos
+    de la instantánea, sin bloquear las escrituras mientras se leen.
+    """
+    with transaccion_lectura():
+        tablas = {'tecnicos': _leer_tecnicos(), 'pedidos': _leer_pedidos()}
+        version = VersionLiquidacion.actual()
+
+    # Encabezado con la ubicación de cada columna, luego las columnas alineadas
+    encabezado = {
+        'creado_en': timezone.now().isoformat(),
+        'version_liquidacion': str(version),
+        'orden_bytes': sys.byteorder,
+        'tablas': {},
+    }
+    posicion = 0
+    for nombre, columnas in tablas.items():
+        filas = len(columnas['id'])
+        encabezado['tablas'][nombre] = {'filas': filas, 'columnas': {}}
+        for columna, datos in columnas.items():
+            encabezado['tablas'][nombre]['columnas'][columna] = {
+                'tipo': datos.typecode,
+                'desplazamiento': posicion,
+            }
+            posicion += len(datos) * datos.itemsize
+            posicion += _relleno(posicion)
+
+    datos_encabezado = json.dumps(encabezado).encode()
+    datos_encabezado += b' ' * _relleno(len(MAGIA) + 8 + len(datos_encabezado))
+
+    directorio = os.path.dirname(os.path.abspath(ruta))
+    os.makedirs(directorio, exist_ok=True)
+    descriptor, temporal = tempfile.mkstemp(dir=directorio, suffix='.tmp')
+    try:
+        with os.fdopen(descriptor, 'wb') as archivo:
+            archivo.write(MAGIA)
+            archivo.write(struct.pack('<Q', len(datos_encabezado)))
+            archivo.write(datos_encabezado)
+            for columnas in tablas.values():
+                for datos in columnas.values():
+                    archivo.write(memoryview(datos).cast('B'))
+                    archivo.write(b'\0' * _relleno(len(datos) * datos.itemsize))
+        os.replace(temporal, ruta)
+    except BaseException:
+        os.remove(temporal)
+        raise
+
+    return {nombre: len(columnas['id']) for nombre, columnas in tablas.items()}
+
+
+class Tabla:
+    """
+    Tabla de la instantánea: cada columna es una vista tipada sobre el
+    archivo mapeado, sin copias.
+    """
+
+    def __init__(self, filas, columnas):
+        self.filas = filas
+        self.columnas = columnas
+
+    def __getitem__(self, columna):
+        return self.columnas[columna]
+
+    def __len__(self):
+        return self.filas
+
+    def mascara(self, filtros):
+        """
+        Filas que cumplen todos los filtros, como lista de booleanos.
+        Cada filtro es (columna, operador, valor) con los operadores
+        ==, !=, <, <=, >, >=, 'in' y 'entre' (valor = (desde, hasta) inclusive).
+        """
+        mascara = None
+        for columna, operador, valor in filtros:
+            datos = self.columnas[columna]
+            if operador == 'in':
+                valores = frozenset(valor)
+                cumple = map(valores.__contains__, datos)
+            elif operador == 'entre':
+                desde, hasta = valor
+                cumple = (desde <= dato <= hasta for dato in datos)
+            elif operador in _OPERADORES:
+                cumple = map(_OPERADORES[operador], datos, repeat(valor))
+            else:
+                raise ValueError(f'Operador desconocido: {operador}')
+            mascara = list(cumple) if mascara is None else list(map(operator.and_, mascara, cumple))
+        return mascara
+
+    def consultar(self, filtros=(), agrupar_por=None, agregados=None):
+        """
+        Agregados sobre las filas que cumplen los filtros.
+
+        - agregados: {nombre: (funcion, columna)} con las funciones count,
+          sum, min, max y avg (count no usa columna). Por defecto cuenta filas
+        - agrupar_por: columna por la que agrupar; sin agrupar retorna un
+          solo dict, agrupando {clave: dict}
+
+        Como los NULL en SQL, los NaN (fechas nulas) no entran en sum, min,
+        max ni avg; count cuenta filas.
+        """
+        agregados = agregados or {'cantidad': ('count', None)}
+        for funcion, _ in agregados.values():
+            if funcion not in _AGREGADOS:
+                raise ValueError(f'Agregado desconocido: {funcion}')
+
+        mascara = self.mascara(filtros) if filtros else None
+
+        def seleccionar(datos):
+            return compress(datos, mascara) if mascara is not None else iter(datos)
+
+        if agrupar_por is None:
+            return {
+                nombre: self._agregar(funcion, seleccionar(self.columnas[columna]) if columna else None,
+                                      mascara)
+                for nombre, (funcion, columna) in agregados.items()
+            }
+
+        # Una pasada por las filas: la clave y los valores de cada agregado
+        # van juntos y cada grupo lleva [cantidad, acumulado] por agregado
+        funciones = [funcion for funcion, _ in agregados.values()]
+        columnas = [
+            seleccionar(self.columnas[columna]) if columna else repeat(None)
+            for _, columna in agregados.values()
+        ]
+        grupos = {}
+        for clave, *valores in zip(seleccionar(self.columnas[agrupar_por]), *columnas):
+            acumuladores = grupos.get(clave)
+            if acumuladores is None:
+                acumuladores = grupos[clave] = [[0, None] for _ in funciones]
+            for acumulador, funcion, valor in zip(acumuladores, funciones, valores):
+                if funcion == 'count':
+                    acumulador[0] += 1
+                elif valor == valor:
+                    # Los NaN no cuentan
+                    acumulador[0] += 1
+                    if acumulador[1] is None:
+                        acumulador[1] = valor
+                    elif funcion in ('sum', 'avg'):
+                        acumulador[1] += valor
+                    elif funcion == 'min':
+                        if valor < acumulador[1]:
+                            acumulador[1] = valor
+                    elif valor > acumulador[1]:
+                        acumulador[1] = valor
+
+        return {
+            clave: {
+                nombre: _resultado(funcion, cantidad, acumulado)
+                for nombre, funcion, (cantidad, acumulado) in zip(agregados, funciones, acumuladores)
+            }
+            for clave, acumuladores in grupos.items()
+        }
+
+    def _agregar(self, funcion, valores, mascara):
+        if funcion == 'count':
+            return self.filas if mascara is None else sum(mascara)
+        valores = [valor for valor in valores if valor == valor]  # sin NaN
+        if not valores:
+            return None if funcion != 'sum' else 0
+        if funcion == 'sum':
+            return sum(valores)
+        if funcion == 'min':
+            return min(valores)
+        if funcion == 'max':
+            return max(valores)
+        return sum(valores) / len(valores)
+
+
+def _resultado(funcion, cantidad, acumulado):
+    """Valor final de un agregado por grupo; con todos los valores en NaN, como _agregar"""
+    if funcion == 'count':
+        return cantidad
+    if acumulado is None:
+        return 0 if funcion == 'sum' else None
+    if funcion == 'avg':
+        return acumulado / cantidad
+    return acumulado
+
+
+class Instantanea:
+    """
+    Instantánea abierta en modo lectura. El archivo se mapea en memoria:
+    varios procesos que abren la misma instantánea comparten las páginas
+    del sistema operativo y no consultan la base de datos.
+
+    Uso:
+        with Instantanea(ruta) as instantanea:
+            pedidos = instantanea['pedidos']
+            pedidos.consultar(filtros=[('horas', '>=', 10)],
+                              agrupar_por='tecnico_id',
+                              agregados={'horas': ('sum', 'horas')})
+    """
+
+    def __init__(self, ruta):
+        with open(ruta, 'rb') as archivo:
+            self._mmap = mmap.mmap(archivo.fileno(), 0, access=mmap.ACCESS_READ)
+        vista = memoryview(self._mmap)
+        try:
+            if vista[:len(MAGIA)] != MAGIA:
+                raise ValueError(f'{ruta} no es una instantánea de liquidación')
+            inicio = len(MAGIA) + 8
+            (largo,) = struct.unpack('<Q', vista[len(MAGIA):inicio])
+            self.encabezado = json.loads(bytes(vista[inicio:inicio + largo]))
+            if self.encabezado['orden_bytes'] != sys.byteorder:
+                raise ValueError('La instantánea se generó con otro orden de bytes')
+
+            datos = inicio + largo
+            self.tablas = {}
+            for nombre, tabla in self.encabezado['tablas'].items():
+                columnas = {}
+                for columna, info in tabla['columnas'].items():
+                    desde = datos + info['desplazamiento']
+                    tamano = tabla['filas'] * array(info['tipo']).itemsize
+                    columnas[columna] = vista[desde:desde + tamano].cast(info['tipo'])
+                self.tablas[nombre] = Tabla(tabla['filas'], columnas)
+        except Exception:
+            vista.release()
+            self._mmap.close()
+            raise
+        self._vista = vista
+
+    def __getitem__(self, nombre):
+        return self.tablas[nombre]
+
+    def cerrar(self):
+        for tabla in self.tablas.values():
+            for columna in tabla.columnas.values():
+                columna.release()
+        self._vista.release()
+        self._mmap.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.cerrar()
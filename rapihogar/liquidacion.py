@@ -0,0 +1,234 @@
+"""
+Cálculos de liquidación sobre el conjunto completo de técnicos
+"""
+from array import array
+
+from django.db.models import Count, F, Max, Min, Sum
+from django.db.models.functions import TruncMonth
+
+from .escalas import ESCALAS_PAGO, calcular_pago, etiqueta_escala, indice_escala
+from .models import Pedido, Tecnico
+
+
+def cargar_horas():
+    """
+    Carga en una sola consulta las horas totales de cada técnico activo.
+
+    Retorna dos arrays compactos alineados: ids de técnico y horas totales.
+    """
+    ids = array('q')
+    horas = array('q')
+    consulta = (
+        Tecnico.objects.filter(is_active=True)
+        .con_liquidacion()
+        .order_by('id')
+        .values_list('id', 'horas_trabajadas')
+    )
+    for tecnico_id, total in consulta.iterator():
+        ids.append(tecnico_id)
+        horas.append(total)
+    return ids, horas
+
+
+def simular_liquidacion(escalas, escalas_actuales=ESCALAS_PAGO):
+    """
+    Recalcula la liquidación de todos los técnicos activos con una tabla de
+    escalas alternativa, sin escribir nada en la base de datos.
+
+    Las horas se cargan una única vez y se recorren en una sola pasada; el
+    pago de cada total de horas se calcula una vez por esquema y se reutiliza.
+
+    Retorna el costo total actual y simulado, la cantidad de técnicos y el
+    monto por escala simulada, y la diferencia por técnico.
+    """
+    ids, horas = cargar_horas()
+
+    precios = {}
+    tecnicos_por_escala = [0] * len(escalas)
+    monto_por_escala = [0.0] * len(escalas)
+    total_actual = 0.0
+    total_simulado = 0.0
+    detalle = []
+
+    for tecnico_id, total_horas in zip(ids, horas):
+        if total_horas not in precios:
+            precios[total_horas] = (
+                calcular_pago(total_horas, escalas_actuales),
+                calcular_pago(total_horas, escalas),
+                indice_escala(total_horas, escalas),
+            )
+        pago_actual, pago_simulado, indice = precios[total_horas]
+
+        total_actual += pago_actual
+        total_simulado += pago_simulado
+        tecnicos_por_escala[indice] += 1
+        monto_por_escala[indice] += pago_simulado
+        detalle.append({
+            'id': tecnico_id,
+            'horas': total_horas,
+            'pago_actual': round(pago_actual, 2),
+            'pago_simulado': round(pago_simulado, 2),
+            'diferencia': round(pago_simulado - pago_actual, 2),
+        })
+
+    return {
+        'total_actual': round(total_actual, 2),
+        'total_simulado': round(total_simulado, 2),
+        'diferencia_total': round(total_simulado - total_actual, 2),
+        'escalas': [
+            {
+                'etiqueta': etiqueta_escala(indice, escalas),
+                'valor_hora': escala.valor_hora,
+                'descuento': escala.descuento,
+                'tecnicos': tecnicos_por_escala[indice],
+                'monto': round(monto_por_escala[indice], 2),
+            }
+            for indice, escala in enumerate(escalas)
+        ],
+        'tecnicos': detalle,
+    }
+
+
+# Percentiles reportados por estadisticas_pagos
+PERCENTILES = (('p10', 0.10), ('mediana', 0.50), ('p90', 0.90))
+
+
+def estadisticas_pagos(queryset, intervalos=10):
+    """
+    Calcula la distribución de pagos de un queryset anotado con
+    con_liquidacion(): mediana, percentiles p10/p90, histograma de
+    'intervalos' tramos iguales entre el mínimo y el máximo, y cantidad de
+    técnicos por escala.
+
+    Usa una consulta agregada y una pasada en streaming ordenada por pago,
+    por lo que la memoria no depende de la cantidad de técnicos.
+    """
+    resumen = queryset.aggregate(total=Count('id'), minimo=Min('pago'), maximo=Max('pago'))
+    cantidad = resumen['total']
+    tecnicos_por_escala = [0] * len(ESCALAS_PAGO)
+
+    if not cantidad:
+        return {
+            'cantidad': 0,
+            'minimo': None,
+            'maximo': None,
+            **{nombre: None for nombre, _ in PERCENTILES},
+            'histograma': [],
+            'escalas': _resumen_escalas(tecnicos_por_escala),
+        }
+
+    minimo, maximo = resumen['minimo'], resumen['maximo']
+    ancho = (maximo - minimo) / intervalos
+    histograma = [0] * intervalos
+
+    # Posiciones (interpoladas) de cada percentil dentro del orden por pago
+    posiciones = {nombre: fraccion * (cantidad - 1) for nombre, fraccion in PERCENTILES}
+    necesarias = {}
+    for posicion in posiciones.values():
+        necesarias[int(posicion)] = None
+        necesarias[min(int(posicion) + 1, cantidad - 1)] = None
+
+    ordenados = queryset.order_by('pago').values_list('horas_trabajadas', 'pago')
+    for indice, (horas, pago) in enumerate(ordenados.iterator(chunk_size=2000)):
+        if indice in necesarias:
+            necesarias[indice] = pago
+        tramo = int((pago - minimo) / ancho) if ancho else 0
+        histograma[min(tramo, intervalos - 1)] += 1
+        tecnicos_por_escala[indice_escala(horas)] += 1
+
+    percentiles = {}
+    for nombre, posicion in posiciones.items():
+        inferior = necesarias[int(posicion)]
+        superior = necesarias[min(int(posicion) + 1, cantidad - 1)]
+        valor = inferior + (superior - inferior) * (posicion - int(posicion))
+        percentiles[nombre] = round(valor, 2)
+
+    return {
+        'cantidad': cantidad,
+        'minimo': round(minimo, 2),
+        'maximo': round(maximo, 2),
+        **percentiles,
+        'histograma': [
+            {
+                'desde': round(minimo + ancho * tramo, 2),
+                'hasta': round(minimo + ancho * (tramo + 1), 2),
+                'tecnicos': histograma[tramo],
+            }
+            for tramo in range(intervalos)
+        ],
+        'escalas': _resumen_escalas(tecnicos_por_escala),
+    }
+
+
+def _resumen_escalas(tecnicos_por_escala):
+    return [
+        {'etiqueta': etiqueta_escala(indice), 'tecnicos': tecnicos}
+        for indice, tecnicos in enumerate(tecnicos_por_escala)
+    ]
+
+
+def desglose_tecnico(tecnico_id):
+    """
+    Horas y cantidad de pedidos de un técnico por esquema y por mes de
+    creación, en dos consultas agrupadas sobre el índice
+    (tecnico_id, created_at): el costo no depende de recorrer los pedidos.
+
+    Retorna (por_esquema, por_mes).
+    """
+    pedidos = Pedido.objects.filter(tecnico_id=tecnico_id).order_by()
+
+    por_esquema = list(
+        pedidos.values('scheme_id', esquema=F('scheme__name'))
+        .annotate(horas=Sum('hours_worked'), pedidos=Count('id'))
+        .order_by('scheme_id')
+    )
+
+    por_mes = [
+        {
+            'mes': f'{fila["fecha"]:%Y-%m}' if fila['fecha'] else None,
+            'horas': fila['horas'],
+            'pedidos': fila['pedidos'],
+        }
+        for fila in pedidos.values(fecha=TruncMonth('created_at'))
+        .annotate(horas=Sum('hours_worked'), pedidos=Count('id'))
+        .order_by('fecha')
+    ]
+
+    return por_esquema, por_mes
+
+
+def rangos_tecnicos(tamano):
+    """
+    Divide los técnicos en rangos consecutivos de ids con hasta 'tamano'
+    técnicos cada uno, recorriendo solo el índice de la clave primaria.
+
+    Retorna una lista de (desde, hasta) con 'hasta' excluido.
+    """
+    inicios = []
+    ids = Tecnico.objects.order_by('id').values_list('id', flat=True)
+    ultimo = None
+    for posicion, tecnico_id in enumerate(ids.iterator(chunk_size=5000)):
+        if posicion % tamano == 0:
+            inicios.append(tecnico_id)
+        ultimo = tecnico_id
+    if ultimo is None:
+        return []
+    return list(zip(inicios, inicios[1:] + [ultimo + 1]))
+
+
+def recalcular_rango(desde, hasta, lote=500):
+    """
+    Recalcula los totales precalculados de los técnicos con id en
+    [desde, hasta): una consulta agrupada para todo el rango y
+    actualizaciones en lotes.
+
+    El agregado se lee dentro de la transacción de escritura, con los
+    técnicos del rango bloqueados (ver TecnicoQuerySet.recalcular_totales):
+    en PostgreSQL los rangos se recalculan en paralelo; en SQLite las
+    transacciones de escritura se ejecutan de a una.
+
+    Retorna la cantidad de técnicos recalculados.
+    """
+    return Tecnico.objects.filter(id__gte=desde, id__lt=hasta).recalcular_totales(
+        batch_size=lote
+    )
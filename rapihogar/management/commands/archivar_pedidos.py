@@ -0,0 +1,131 @@
+"""
+Comando para archivar los pedidos antiguos
+"""
+from collections import defaultdict
+from datetime import datetime, timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.utils import timezone
+
+from rapihogar.models import HistoricoTecnico, Pedido, PedidoArchivado
+from rapihogar.transacciones import transaccion_escritura
+
+CAMPOS_ARCHIVADOS = (
+    'id', 'type_request', 'client_id', 'scheme_id', 'tecnico_id',
+    'hours_worked', 'created_at', 'updated_at',
+)
+
+
+class Command(BaseCommand):
+    help = (
+        'Mueve los pedidos anteriores a una fecha de corte a la tabla de archivo '
+        'y suma sus horas al histórico de cada técnico'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--dias',
+            type=int,
+            default=365,
+            help='Archivar los pedidos creados hace más de N días (default: 365)'
+        )
+        parser.add_argument(
+            '--antes-de',
+            help='Fecha de corte AAAA-MM-DD (reemplaza a --dias)'
+        )
+        parser.add_argument(
+            '--lote',
+            type=int,
+            default=1000,
+            help='Pedidos archivados por transacción (default: 1000)'
+        )
+
+    def handle(self, *args, **options):
+        corte = self._fecha_corte(options)
+        if options['lote'] < 1:
+            raise CommandError('El tamaño de lote debe ser al menos 1.')
+
+        self.stdout.write(f'📊 Archivando pedidos creados antes de {corte:%Y-%m-%d %H:%M}...')
+
+        archivados = 0
+        while True:
+            cantidad = self._archivar_lote(corte, options['lote'])
+            if not cantidad:
+                break
+            archivados += cantidad
+            self.stdout.write(f'   • {archivados} pedidos archivados')
+
+        self.stdout.write(
+            self.style.SUCCESS(f'🎉 Proceso completado. Pedidos archivados: {archivados}')
+        )
+
+    def _fecha_corte(self, options):
+        if options['antes_de']:
+            try:
+                fecha = datetime.strptime(options['antes_de'], '%Y-%m-%d')
+            except ValueError:
+                raise CommandError('La fecha de corte debe tener el formato AAAA-MM-DD.')
+            return timezone.make_aware(fecha)
+        if options['dias'] < 0:
+            raise CommandError('La cantidad de días no puede ser negativa.')
+        return timezone.now() - timedelta(days=options['dias'])
+
+    def _archivar_lote(self, corte, tamano_lote):
+        """
+        Archiva un lote en una transacción: copia los pedidos al archivo,
+        suma sus horas al histórico y los elimina de la tabla vigente. Los
+        totales de la liquidación no cambian en ningún momento.
+        """
+        with transaccion_escritura():
+            filas = list(
+                Pedido.objects.select_for_update()
+                .filter(created_at__lt=corte)
+                .order_by('id')
+                .values(*CAMPOS_ARCHIVADOS)[:tamano_lote]
+            )
+            if not filas:
+                return 0
+
+            PedidoArchivado.objects.bulk_create(
+                [PedidoArchivado(**fila) for fila in filas]
+            )
+
+            horas = defaultdict(int)
+            pedidos = defaultdict(int)
+            for fila in filas:
+                if fila['tecnico_id'] is not None:
+                    horas[fila['tecnico_id']] += fila['hours_worked']
+                    pedidos[fila['tecnico_id']] += 1
+            self._sumar_historico(horas, pedidos, corte)
+
+            # DELETE directo en lugar de QuerySet.delete(): archivar no es una baja
+            # del pedido (los totales no cambian), así que no debe pasar por las
+            # señales post_delete, que registrarían el cambio en el feed y
+            # recalcularían o encolarían los totales de cada técnico
+            ids = [fila['id'] for fila in filas]
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    f'DELETE FROM {connection.ops.quote_name(Pedido._meta.db_table)} '
+                    f'WHERE id IN ({", ".join(["%s"] * len(ids))})',
+                    ids
+                )
+        return len(filas)
+
+    def _sumar_historico(self, horas, pedidos, corte):
+        existentes = HistoricoTecnico.objects.select_for_update().in_bulk(list(horas))
+        historicos = []
+        for tecnico_id in horas:
+            anterior = existentes.get(tecnico_id)
+            historicos.append(HistoricoTecnico(
+                tecnico_id=tecnico_id,
+                horas=horas[tecnico_id] + (anterior.horas if anterior else 0),
+                pedidos=pedidos[tecnico_id] + (anterior.pedidos if anterior else 0),
+                hasta=max(anterior.hasta, corte) if anterior and anterior.hasta else corte,
+            ))
+        HistoricoTecnico.objects.bulk_create(
+            historicos,
+            update_conflicts=True,
+            unique_fields=['tecnico'],
+            update_fields=['horas', 'pedidos', 'hasta'],
+        )
@@ -0,0 +1,393 @@
+"""
+Comando para auditar los planes de las consultas de cada endpoint de la API
+"""
+import json
+import re
+from collections import Counter
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.urls import URLResolver, get_resolver, reverse
+from rest_framework.test import APIClient
+
+from rapihogar.models import Company, Pedido, Scheme, Tecnico, User, VersionLiquidacion
+
+# Sentencias que tienen plan de ejecución
+EXPLICABLE = re.compile(r'^\s*(SELECT|WITH|UPDATE|DELETE)\b', re.IGNORECASE)
+
+# Lecturas del plan por motor: tabla recorrida completa y orden en estructura temporal
+PATRONES_PLAN = {
+    'sqlite': {
+        'scan': re.compile(r'^SCAN (\w+)'),
+        'orden': re.compile(r'USE TEMP B-TREE'),
+    },
+    'postgresql': {
+        'scan': re.compile(r'Seq Scan on (\w+)'),
+        'orden': re.compile(r'\bSort\b'),
+    },
+}
+
+# Alias de tabla que genera el ORM (ej: "rapihogar_pedido" U0)
+ALIAS_TABLA = re.compile(r'"(\w+)"\s+(?:AS\s+)?"?([A-Z]\d+)"?\b')
+
+
+def _config():
+    return settings.AUDITORIA_CONSULTAS
+
+
+def nombres_endpoints(patrones=None):
+    """Nombres de las URLs de api/urls.py, en orden y sin repetir"""
+    if patrones is None:
+        patrones = get_resolver('api.urls').url_patterns
+    nombres = []
+    for patron in patrones:
+        if isinstance(patron, URLResolver):
+            nombres.extend(nombres_endpoints(patron.url_patterns))
+        elif patron.name:
+            nombres.append(patron.name)
+    return list(dict.fromkeys(nombres))
+
+
+def peticiones(muestra):
+    """Requests de auditoría por endpoint: [(método, kwargs de la URL, datos)]"""
+    tecnico_ids = muestra['tecnico_ids']
+    return {
+        'api-root': [('get', {}, None)],
+        'company-list': [('get', {}, None)],
+        'company-detail': [('get', {'pk': muestra['company']}, None)],
+        'stats-list': [('get', {}, None)],
+        'stats-detail': [('get', {'pk': muestra['pedido']}, None)],
+        'tecnicos-list': [
+            ('get', {}, None),
+            ('get', {}, {'search': 'Auditoría', 'ordering': '-total_payment', 'page_size': 50}),
+            ('get', {}, {'min_hours': 5, 'tier': 1, 'fields': 'id,full_name,total_payment'}),
+        ],
+        'tecnicos-lote': [
+            ('get', {}, {'id': tecnico_ids}),
+            ('post', {}, {'ids': tecnico_ids}),
+        ],
+        'tecnico-detalle': [('get', {'pk': tecnico_ids[0]}, None)],
+        'informe-tecnicos': [
+            ('get', {}, None),
+            ('get', {}, {'estadisticas': 'true'}),
+        ],
+        'liquidacion-simular': [('post', {}, {'escalas': [
+            {'hasta': 14, 'valor_hora': 200, 'descuento': 0.15},
+            {'hasta': 28, 'valor_hora': 250, 'descuento': 0.16},
+            {'hasta': 47, 'valor_hora': 320, 'descuento': 0.17},
+            {'hasta': None, 'valor_hora': 350, 'descuento': 0.18},
+        ]})],
+        'metricas': [('get', {}, None)],
+        'pedido-update': [
+            ('get', {'pk': muestra['pedido']}, None),
+            ('patch', {'pk': muestra['pedido']}, {'hours_worked': 7}),
+        ],
+        'pedidos-cambios': [('get', {}, {'cursor': 0, 'limite': 100})],
+        'pedidos-lote': [('post', {}, {'pedidos': [
+            {
+                'clave': f'auditoria-{numero}',
+                'client': muestra['cliente'],
+                'tecnico': tecnico_ids[numero % len(tecnico_ids)],
+                'scheme': muestra['scheme'],
+                'hours_worked': 4,
+            }
+            for numero in range(20)
+        ]})],
+    }
+
+
+class CapturaConsultas:
+    """Se instala con connection.execute_wrapper: guarda el SQL y los parámetros"""
+
+    def __init__(self):
+        self.consultas = []
+
+    def __call__(self, execute, sql, params, many, context):
+        if not many:
+            self.consultas.append((sql, params))
+        return execute(sql, params, many, context)
+
+
+def normalizar(sql):
+    """SQL sin espacios repetidos y con las listas de parámetros de largo variable unificadas"""
+    sql = re.sub(r'%s(?:\s*,\s*%s)+', '%s, ...', sql)
+    return ' '.join(sql.split())
+
+
+def explicar(sql, params):
+    """Líneas del plan de ejecución de la consulta"""
+    with connection.cursor() as cursor:
+        if connection.vendor == 'sqlite':
+            cursor.execute(f'EXPLAIN QUERY PLAN {sql}', params)
+            return [fila[-1] for fila in cursor.fetchall()]
+        cursor.execute(f'EXPLAIN {sql}', params)
+        return [fila[0] for fila in cursor.fetchall()]
+
+
+def hallazgos_plan(sql, plan, tablas):
+    """Reglas que rompe un plan: [(regla, línea del plan)]"""
+    patrones = PATRONES_PLAN[connection.vendor]
+    alias = {alias: tabla for tabla, alias in ALIAS_TABLA.findall(sql)}
+    hallazgos = []
+    for linea in plan:
+        scan = patrones['scan'].search(linea)
+        if scan:
+            tabla = alias.get(scan.group(1), scan.group(1))
+            if tabla in tablas:
+                hallazgos.append((f'scan:{tabla}', linea))
+        if patrones['orden'].search(linea):
+            hallazgos.append(('orden_temporal', linea))
+    return hallazgos
+
+
+def validar_excepciones(excepciones):
+    """
+    Errores de las excepciones configuradas: cada una indica la regla y el
+    fragmento del SQL normalizado o de la línea del plan que acepta, no una
+    regla completa para todo el endpoint
+    """
+    errores = []
+    for nombre, lista in excepciones.items():
+        for excepcion in lista:
+            if not isinstance(excepcion, dict) or 'regla' not in excepcion:
+                errores.append(f'{nombre}: {excepcion!r} no es un dict con "regla"')
+            elif not excepcion.get('sql') and not excepcion.get('plan'):
+                errores.append(f'{nombre}: la excepción de "{excepcion["regla"]}" debe indicar "sql" o "plan"')
+    return errores
+
+
+def permitido(regla, sql, detalle, excepciones):
+    """Si alguna excepción acepta la regla para este SQL normalizado y este detalle del plan"""
+    return any(
+        excepcion['regla'] == regla
+        and excepcion.get('sql', '') in sql
+        and excepcion.get('plan', '') in detalle
+        for excepcion in excepciones
+    )
+
+
+def analizar(consultas, config, excepciones=()):
+    """
+    Explica las consultas de un request y las evalúa con las reglas de
+    'config'. Retorna los hallazgos, cada uno con su regla, el SQL, el
+    detalle y si está permitido por las excepciones del endpoint.
+    """
+    hallazgos = []
+    repeticiones = Counter(normalizar(sql) for sql, _ in consultas)
+    explicadas = set()
+
+    for sql, params in consultas:
+        normalizada = normalizar(sql)
+        if normalizada in explicadas or not EXPLICABLE.match(sql):
+            continue
+        explicadas.add(normalizada)
+
+        encontrados = hallazgos_plan(sql, explicar(sql, params), config['TABLAS_SIN_SCAN'])
+        if config['PERMITIR_ORDEN_TEMPORAL']:
+            encontrados = [hallazgo for hallazgo in encontrados if hallazgo[0] != 'orden_temporal']
+        if repeticiones[normalizada] > config['MAXIMO_REPETICIONES']:
+            encontrados.append(('repeticion', f'{repeticiones[normalizada]} ejecuciones en el request'))
+
+        for regla, detalle in encontrados:
+            hallazgos.append({
+                'regla': regla,
+                'sql': normalizada,
+                'detalle': detalle,
+                'permitido': permitido(regla, normalizada, detalle, excepciones),
+            })
+    return hallazgos
+
+
+class Command(BaseCommand):
+    help = (
+        'Ejecuta cada endpoint de api/urls.py, obtiene el plan de cada consulta '
+        '(EXPLAIN) y marca scans completos de pedidos y técnicos, ordenamientos '
+        'temporales y consultas repetidas por fila (N+1). Termina con error si '
+        'alguna consulta rompe las reglas de settings.AUDITORIA_CONSULTAS. '
+        'Los datos de prueba y las escrituras se descartan al terminar.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--tecnicos',
+            type=int,
+            default=20,
+            help='Técnicos mínimos (con pedidos) sobre los que se audita; los faltantes se crean (default: 20)'
+        )
+        parser.add_argument(
+            '--endpoint',
+            action='append',
+            default=[],
+            help='Auditar solo este endpoint (nombre de la URL); se puede repetir'
+        )
+        parser.add_argument(
+            '--planes',
+            action='store_true',
+            help='Mostrar el plan de cada consulta, no solo los hallazgos'
+        )
+        parser.add_argument(
+            '--json',
+            action='store_true',
+            help='Mostrar el resultado en formato JSON'
+        )
+
+    def handle(self, *args, **options):
+        if connection.vendor not in PATRONES_PLAN:
+            raise CommandError(f'Motor de base de datos no soportado: {connection.vendor}')
+        errores = validar_excepciones(_config()['EXCEPCIONES'])
+        if errores:
+            raise CommandError('Excepciones de auditoría inválidas:\n' + '\n'.join(errores))
+
+        nombres = nombres_endpoints()
+        desconocidos = set(options['endpoint']) - set(nombres)
+        if desconocidos:
+            raise CommandError(f'Endpoints desconocidos: {", ".join(sorted(desconocidos))}')
+        if options['endpoint']:
+            nombres = [nombre for nombre in nombres if nombre in options['endpoint']]
+
+        # Los datos de prueba y lo que escriban los endpoints no se confirman
+        with transaction.atomic():
+            resultados = self._auditar(nombres, options)
+            transaction.set_rollback(True)
+
+        violaciones = sum(
+            1 for resultado in resultados
+            for hallazgo in resultado['hallazgos'] if not hallazgo['permitido']
+        )
+        if options['json']:
+            self.stdout.write(json.dumps(resultados, indent=2))
+        else:
+            self._mostrar(resultados, options['planes'])
+
+        if violaciones:
+            raise CommandError(f'{violaciones} hallazgos no cumplen las reglas de auditoría de consultas.')
+        if not options['json']:
+            self.stdout.write(self.style.SUCCESS('🎉 Todas las consultas cumplen las reglas'))
+
+    def _sembrar(self, cantidad):
+        """Datos mínimos para ejercitar todos los endpoints, retorna ids de muestra"""
+        cliente, _ = User.objects.get_or_create(
+            email='cliente.auditoria@test.com',
+            defaults={'username': 'cliente_auditoria', 'first_name': 'Cliente', 'last_name': 'Auditoría'}
+        )
+        scheme = Scheme.objects.order_by('id').first() or Scheme.objects.create(name='Auditoría')
+        company = Company.objects.order_by('id').first() or Company.objects.create(
+            name='Auditoría', phone='0', email='auditoria@test.com', website='auditoria.test'
+        )
+
+        faltantes = cantidad - Tecnico.objects.filter(is_active=True).count()
+        if faltantes > 0:
+            tecnicos = Tecnico.objects.bulk_create([
+                Tecnico(first_name=f'Técnico{numero}', last_name='Auditoría',
+                        email=f'tecnico{numero}.auditoria@test.com')
+                for numero in range(faltantes)
+            ])
+            # Varios pedidos por técnico: así una consulta por fila se repite
+            Pedido.objects.crear_en_lote([
+                Pedido(client=cliente, tecnico=tecnico, scheme=scheme, hours_worked=horas)
+                for tecnico in tecnicos
+                for horas in (3, 8, 12)
+            ])
+
+        return {
+            'cliente': cliente.id,
+            'scheme': scheme.id,
+            'company': company.id,
+            'pedido': Pedido.objects.order_by('id').values_list('id', flat=True).first(),
+            'tecnico_ids': list(
+                Tecnico.objects.filter(is_active=True).order_by('id').values_list('id', flat=True)[:20]
+            ),
+        }
+
+    def _auditar(self, nombres, options):
+        config = _config()
+        muestra = self._sembrar(options['tecnicos'])
+        tabla = peticiones(muestra)
+
+        auditor, _ = User.objects.get_or_create(
+            email='auditoria@test.com',
+            defaults={'username': 'auditoria', 'is_staff': True}
+        )
+        host = next((nombre.lstrip('.') for nombre in settings.ALLOWED_HOSTS if nombre != '*'), 'localhost')
+        cliente = APIClient(HTTP_HOST=host)
+        cliente.raise_request_exception = False
+        cliente.force_authenticate(auditor)
+
+        resultados = []
+        for nombre in nombres:
+            if nombre not in tabla:
+                resultados.append({
+                    'endpoint': nombre, 'metodo': None, 'url': None, 'estado': None, 'consultas': 0,
+                    'hallazgos': [{
+                        'regla': 'sin_peticion', 'sql': None, 'permitido': False,
+                        'detalle': 'Agregar el request de auditoría en auditar_consultas.peticiones()',
+                    }],
+                    'planes': [],
+                })
+                continue
+
+            for metodo, kwargs, datos in tabla[nombre]:
+                url = reverse(nombre, kwargs=kwargs)
+                captura = CapturaConsultas()
+                # Cada request parte de los mismos datos, con la versión de
+                # liquidación renovada: el cache y el índice de pagos se
+                # recalculan y sus consultas quedan auditadas
+                with transaction.atomic():
+                    VersionLiquidacion.renovar()
+                    with connection.execute_wrapper(captura):
+                        response = getattr(cliente, metodo)(
+                            url, datos, format=None if metodo == 'get' else 'json'
+                        )
+                    hallazgos = analizar(
+                        captura.consultas, config, config['EXCEPCIONES'].get(nombre, ())
+                    )
+                    planes = [
+                        {'sql': normalizar(sql), 'plan': explicar(sql, params)}
+                        for sql, params in captura.consultas if EXPLICABLE.match(sql)
+                    ] if options['planes'] else []
+                    transaction.set_rollback(True)
+
+                resultados.append({
+                    'endpoint': nombre,
+                    'metodo': metodo.upper(),
+                    'url': url,
+                    'estado': response.status_code,
+                    'consultas': len(captura.consultas),
+                    'hallazgos': hallazgos,
+                    'planes': planes,
+                })
+        return resultados
+
+    def _mostrar(self, resultados, planes):
+        self.stdout.write(
+            f'🔎 Auditoría de consultas ({connection.vendor}): '
+            f'{len({resultado["endpoint"] for resultado in resultados})} endpoints, '
+            f'{len(resultados)} requests'
+        )
+        for resultado in resultados:
+            violaciones = [hallazgo for hallazgo in resultado['hallazgos'] if not hallazgo['permitido']]
+            if resultado['metodo'] is None:
+                titulo = f'{resultado["endpoint"]}: sin request de auditoría'
+            else:
+                titulo = (
+                    f'{resultado["metodo"]} {resultado["url"]} ({resultado["estado"]}): '
+                    f'{resultado["consultas"]} consultas'
+                )
+            if violaciones:
+                self.stdout.write(self.style.ERROR(f'❌ {titulo}'))
+            else:
+                self.stdout.write(f'   ✅ {titulo}')
+            if resultado['estado'] is not None and resultado['estado'] >= 500:
+                self.stdout.write(self.style.WARNING('      ⚠️  El endpoint respondió con error'))
+
+            for hallazgo in resultado['hallazgos']:
+                marca = '(permitido)' if hallazgo['permitido'] else ''
+                self.stdout.write(f'      • {hallazgo["regla"]} {marca}: {hallazgo["detalle"]}')
+                if hallazgo['sql']:
+                    self.stdout.write(f'        {hallazgo["sql"][:200]}')
+            if planes:
+                for consulta in resultado['planes']:
+                    self.stdout.write(f'      {consulta["sql"][:200]}')
+                    for linea in consulta['plan']:
+                        self.stdout.write(f'         {linea}')
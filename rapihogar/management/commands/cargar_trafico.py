@@ -0,0 +1,224 @@
+"""
+Comando para generar carga HTTP contra la API en ejecución
+"""
+import asyncio
+import json
+from urllib.parse import urlsplit
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from rest_framework.authtoken.models import Token
+
+from rapihogar.models import Pedido
+from rapihogar.trafico import MEZCLA_DEFAULT, ErrorHTTP, GeneradorTrafico
+
+HOSTS_LOCALES = ('localhost', '127.0.0.1', '::1')
+
+
+def pedido_ids_existentes(limite=5000):
+    """
+    Ids de los pedidos más recientes de la base de este proceso (la de
+    settings). Solo coinciden con los del servidor si usa la misma base
+    """
+    return list(Pedido.objects.order_by('-id').values_list('id', flat=True)[:limite])
+
+
+class Command(BaseCommand):
+    help = (
+        'Genera tráfico HTTP concurrente contra la API (runserver, contenedor o nginx) '
+        'y reporta throughput, percentiles de latencia y tasa de errores'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--url',
+            default='http://localhost:8000',
+            help='URL base del servidor (default: http://localhost:8000)'
+        )
+        parser.add_argument(
+            '--duracion',
+            type=float,
+            default=30,
+            help='Segundos de carga (default: 30)'
+        )
+        parser.add_argument(
+            '--concurrencia',
+            type=int,
+            default=10,
+            help='Conexiones simultáneas (default: 10)'
+        )
+        parser.add_argument(
+            '--rps',
+            type=float,
+            default=0,
+            help='Requests por segundo objetivo; 0 envía sin pausa con la concurrencia dada (default: 0)'
+        )
+        parser.add_argument(
+            '--mezcla',
+            default=','.join(f'{operacion}={peso}' for operacion, peso in MEZCLA_DEFAULT.items()),
+            help='Pesos de cada operación, ej: listado=50,informe=10,pedido_get=30,pedido_patch=10'
+        )
+        parser.add_argument(
+            '--pedidos',
+            help=(
+                'Ids de pedidos para GET/PATCH separados por coma (default: los más recientes '
+                'de la base local, que solo sirven si el servidor usa la misma base)'
+            )
+        )
+        parser.add_argument(
+            '--token',
+            help='Token de la API con el que se autentican los requests'
+        )
+        parser.add_argument(
+            '--usuario',
+            help=(
+                'Email del usuario cuyo token se usa (se crea si no tiene). Para que el '
+                'throttle no limite la carga, incluirlo en THROTTLE_EXENTOS del servidor'
+            )
+        )
+        parser.add_argument(
+            '--intervalo-reporte',
+            type=float,
+            default=5,
+            help='Segundos entre reportes parciales (default: 5)'
+        )
+        parser.add_argument(
+            '--timeout',
+            type=float,
+            default=10,
+            help='Timeout por request en segundos (default: 10)'
+        )
+        parser.add_argument(
+            '--json',
+            action='store_true',
+            help='Mostrar el resumen final en formato JSON'
+        )
+
+    def handle(self, *args, **options):
+        if options['concurrencia'] < 1 or options['duracion'] <= 0:
+            raise CommandError('La concurrencia y la duración deben ser positivas.')
+        mezcla = self._mezcla(options['mezcla'])
+        token = self._token(options)
+
+        # Las consultas a la base se hacen antes de entrar al loop de asyncio
+        if options['pedidos']:
+            try:
+                pedido_ids = [int(pedido_id) for pedido_id in options['pedidos'].split(',')]
+            except ValueError:
+                raise CommandError('Los ids de pedidos deben ser números enteros.')
+        elif any(operacion.startswith('pedido_') for operacion in mezcla):
+            pedido_ids = pedido_ids_existentes()
+            if urlsplit(options['url']).hostname not in HOSTS_LOCALES:
+                self.stdout.write(self.style.WARNING(
+                    f'⚠️  Los ids de pedidos se leen de la base local: si {options["url"]} usa otra '
+                    f'base, indíquelos con --pedidos'
+                ))
+            if not pedido_ids:
+                self.stdout.write(
+                    self.style.WARNING('⚠️  No se encontraron pedidos: se omiten las operaciones de pedidos')
+                )
+        else:
+            pedido_ids = []
+
+        asyncio.run(self._ejecutar(options, mezcla, pedido_ids, token))
+
+    def _token(self, options):
+        if options['token']:
+            return options['token']
+        if not options['usuario']:
+            return None
+        try:
+            usuario = get_user_model().objects.get_by_natural_key(options['usuario'])
+        except get_user_model().DoesNotExist:
+            raise CommandError(f'No existe el usuario {options["usuario"]}')
+        return Token.objects.get_or_create(user=usuario)[0].key
+
+    def _mezcla(self, valor):
+        mezcla = {}
+        for parte in valor.split(','):
+            operacion, _, peso = parte.partition('=')
+            operacion = operacion.strip()
+            if operacion not in MEZCLA_DEFAULT:
+                raise CommandError(
+                    f'Operación desconocida "{operacion}". '
+                    f'Disponibles: {", ".join(MEZCLA_DEFAULT)}'
+                )
+            try:
+                mezcla[operacion] = float(peso)
+            except ValueError:
+                raise CommandError(f'Peso inválido para {operacion}: "{peso}"')
+        return {operacion: peso for operacion, peso in mezcla.items() if peso > 0}
+
+    async def _ejecutar(self, options, mezcla, pedido_ids, token):
+        try:
+            generador = GeneradorTrafico(
+                options['url'],
+                mezcla,
+                options['concurrencia'],
+                rps=options['rps'] or None,
+                timeout=options['timeout'],
+                pedido_ids=pedido_ids,
+                token=token,
+            )
+        except ValueError as e:
+            raise CommandError(str(e))
+
+        if generador.pedido_ids:
+            try:
+                faltantes = await generador.pedidos_inexistentes()
+            except (OSError, asyncio.TimeoutError, ErrorHTTP):
+                # Sin conexión: los errores se informan con la carga
+                faltantes = 0
+            if faltantes:
+                self.stdout.write(self.style.WARNING(
+                    f'⚠️  {faltantes} de los pedidos de muestra no existen en el servidor: sus '
+                    f'GET/PATCH responderán 404. Indique los ids con --pedidos'
+                ))
+
+        modo = f'{options["rps"]:g} rps objetivo' if options['rps'] else 'sin pausa'
+        self.stdout.write(
+            f'📊 Carga contra {options["url"]} durante {options["duracion"]:g}s, '
+            f'{options["concurrencia"]} conexiones, {modo}'
+        )
+        resumen = await generador.ejecutar(
+            options['duracion'],
+            options['intervalo_reporte'],
+            al_reportar=None if options['json'] else self._mostrar_ventana,
+        )
+
+        if options['json']:
+            self.stdout.write(json.dumps(resumen, indent=2))
+        else:
+            self._mostrar_resumen(resumen)
+
+    def _ms(self, segundos):
+        return f'{segundos * 1000:.1f}ms' if segundos is not None else '-'
+
+    def _mostrar_ventana(self, ventana):
+        self.stdout.write(
+            f'   [{ventana["segundo"]:>6.1f}s] {ventana["rps"]:7.1f} rps  '
+            f'p50 {self._ms(ventana["p50"])}  p95 {self._ms(ventana["p95"])}  '
+            f'p99 {self._ms(ventana["p99"])}  errores {ventana["errores"]:.1%}'
+        )
+
+    def _mostrar_resumen(self, resumen):
+        self.stdout.write('')
+        self.stdout.write(
+            self.style.SUCCESS(
+                f'🎉 {resumen["requests"]} requests en {resumen["duracion"]:.1f}s '
+                f'({resumen["rps"]:.1f} rps)'
+            )
+        )
+        if resumen['descartados']:
+            self.stdout.write(
+                self.style.WARNING(
+                    f'⚠️  {resumen["descartados"]} requests no se enviaron por falta de conexiones libres'
+                )
+            )
+        for operacion, datos in resumen['operaciones'].items():
+            estados = ', '.join(f'{estado}: {cantidad}' for estado, cantidad in datos['estados'].items())
+            self.stdout.write(
+                f'   • {operacion}: {datos["requests"]} requests, {datos["rps"]:.1f} rps, '
+                f'p50 {self._ms(datos["p50"])}, p95 {self._ms(datos["p95"])}, '
+                f'p99 {self._ms(datos["p99"])}, errores {datos["tasa_errores"]:.1%} ({estados})'
+            )
@@ -0,0 +1,70 @@
+"""
+Comando para generar la instantánea columnar de la liquidación
+"""
+import os
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from rapihogar.instantanea import Instantanea, escribir_instantanea
+
+
+class Command(BaseCommand):
+    help = (
+        'Genera una instantánea inmutable de técnicos y pedidos en un archivo '
+        'columnar mapeable en memoria, para análisis sin consultar la base'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--salida',
+            default=settings.INSTANTANEA_LIQUIDACION,
+            help='Ruta del archivo de la instantánea (default: settings.INSTANTANEA_LIQUIDACION)'
+        )
+        parser.add_argument(
+            '--resumen',
+            action='store_true',
+            help='Mostrar un resumen calculado sobre la instantánea generada'
+        )
+
+    def handle(self, *args, **options):
+        ruta = options['salida']
+        filas = escribir_instantanea(ruta)
+
+        self.stdout.write(
+            self.style.SUCCESS(
+                f'🎉 Instantánea generada en {ruta} '
+                f'({filas["tecnicos"]} técnicos, {filas["pedidos"]} pedidos, '
+                f'{os.path.getsize(ruta) / 1024:.1f} KB)'
+            )
+        )
+
+        if options['resumen']:
+            self._mostrar_resumen(ruta)
+
+    def _mostrar_resumen(self, ruta):
+        with Instantanea(ruta) as instantanea:
+            activos = instantanea['tecnicos'].consultar(
+                filtros=[('activo', '==', 1)],
+                agregados={
+                    'cantidad': ('count', None),
+                    'horas': ('sum', 'horas'),
+                    'pago': ('sum', 'pago'),
+                }
+            )
+            por_esquema = instantanea['pedidos'].consultar(
+                agrupar_por='scheme_id',
+                agregados={'pedidos': ('count', None), 'horas': ('sum', 'horas')}
+            )
+
+        self.stdout.write('')
+        self.stdout.write('📊 Técnicos activos:')
+        self.stdout.write(f'   • Cantidad: {activos["cantidad"]}')
+        self.stdout.write(f'   • Horas: {activos["horas"]}')
+        self.stdout.write(f'   • Pago total: ${activos["pago"]:,.2f}')
+        self.stdout.write('📊 Pedidos por esquema:')
+        for scheme_id, totales in sorted(por_esquema.items()):
+            nombre = scheme_id if scheme_id else 'sin esquema'
+            self.stdout.write(
+                f'   • {nombre}: {totales["pedidos"]} pedidos, {totales["horas"]} horas'
+            )
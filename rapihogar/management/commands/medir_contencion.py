@@ -0,0 +1,481 @@
+"""
+Comando para medir la contención de escrituras concurrentes sobre los pedidos
+"""
+import json
+import multiprocessing
+import queue
+import random
+import threading
+import time
+from collections import Counter
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DatabaseError, connection, connections
+from rest_framework.test import APIRequestFactory
+
+from api.views import PedidoUpdateAPIView, _base_ocupada, informe_tecnicos_view
+from rapihogar.models import Pedido, Scheme, Tecnico, User
+from rapihogar.trafico import percentil
+
+
+class MedidorSentencias:
+    """
+    Se instala con connection.execute_wrapper: cuenta las sentencias que
+    tardan más que el umbral (esperas por locks), las que fallan porque el
+    lock no se liberó a tiempo y los errores de la base
+    """
+
+    def __init__(self, umbral):
+        self.umbral = umbral
+        self.esperas = 0
+        self.bloqueos = 0
+        self.tiempo_espera = 0.0
+        self.espera_maxima = 0.0
+        self.errores = Counter()
+
+    def __call__(self, execute, sql, params, many, context):
+        inicio = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        except DatabaseError as e:
+            if _base_ocupada(e):
+                # También es contención, aunque la sentencia no haya esperado
+                # (ej: SQLite con cache compartido falla sin respetar el timeout)
+                self.bloqueos += 1
+            self.errores[f'{type(e).__name__}: {str(e).splitlines()[0][:80]}'] += 1
+            raise
+        finally:
+            duracion = time.perf_counter() - inicio
+            if duracion >= self.umbral:
+                self.esperas += 1
+                self.tiempo_espera += duracion
+                self.espera_maxima = max(self.espera_maxima, duracion)
+
+
+def _cambio(aleatorio, tecnico_ids, scheme_ids):
+    """Actualización de la mezcla: horas (70%), técnico (20%) o esquema (10%)"""
+    tirada = aleatorio.random()
+    if tirada < 0.2 and tecnico_ids:
+        return {'tecnico': aleatorio.choice(tecnico_ids)}
+    if tirada < 0.3 and scheme_ids:
+        return {'scheme': aleatorio.choice(scheme_ids)}
+    return {'hours_worked': aleatorio.randint(1, 12)}
+
+
+def escribir(parametros, semilla):
+    """
+    Escritor: PATCH /api/pedidos/<pk>/ con If-Match sobre la versión que
+    conoce de cada pedido hasta 'fin'. Retorna sus estadísticas.
+    """
+    aleatorio = random.Random(semilla)
+    vista = PedidoUpdateAPIView.as_view(throttle_classes=())
+    fabrica = APIRequestFactory()
+    medidor = MedidorSentencias(parametros['umbral_espera'])
+    calientes = parametros['calientes']
+    frios = parametros['frios'] or calientes
+    commits = conflictos = sin_cambios = 0
+    latencias = []
+    estados = Counter()
+
+    try:
+        versiones = dict(Pedido.objects.filter(id__in=calientes + frios).values_list('id', 'version'))
+        with connection.execute_wrapper(medidor):
+            while time.time() < parametros['fin']:
+                if aleatorio.random() < parametros['fraccion_caliente']:
+                    pedido_id = aleatorio.choice(calientes)
+                else:
+                    pedido_id = aleatorio.choice(frios)
+                request = fabrica.patch(
+                    f'/api/pedidos/{pedido_id}/',
+                    _cambio(aleatorio, parametros['tecnico_ids'], parametros['scheme_ids']),
+                    format='json',
+                    HTTP_IF_MATCH=f'"{versiones[pedido_id]}"'
+                )
+
+                inicio = time.perf_counter()
+                response = vista(request, pk=pedido_id)
+                latencias.append(time.perf_counter() - inicio)
+
+                if response.status_code == 200:
+                    version = int(response['ETag'].strip('"'))
+                    # Sin campos modificados la vista responde 200 sin escribir
+                    if version > versiones[pedido_id]:
+                        commits += 1
+                    else:
+                        sin_cambios += 1
+                    versiones[pedido_id] = version
+                elif response.status_code == 412:
+                    conflictos += 1
+                    versiones[pedido_id] = response.data['version_actual']
+                else:
+                    estados[response.status_code] += 1
+    finally:
+        connections.close_all()
+
+    return {
+        'commits': commits,
+        'conflictos': conflictos,
+        'sin_cambios': sin_cambios,
+        'latencias': latencias,
+        'estados': dict(estados),
+        'esperas': medidor.esperas,
+        'bloqueos': medidor.bloqueos,
+        'tiempo_espera': medidor.tiempo_espera,
+        'espera_maxima': medidor.espera_maxima,
+        'errores': dict(medidor.errores),
+    }
+
+
+def _proceso_escritor(cola, parametros, semilla):
+    cola.put(escribir(parametros, semilla))
+
+
+def leer(fin):
+    """Lector: GET /api/informe/ en bucle hasta 'fin'. Retorna latencias y errores"""
+    vista = informe_tecnicos_view.cls.as_view(throttle_classes=())
+    fabrica = APIRequestFactory()
+    latencias = []
+    errores = 0
+    try:
+        while time.time() < fin:
+            inicio = time.perf_counter()
+            response = vista(fabrica.get('/api/informe/'))
+            latencias.append(time.perf_counter() - inicio)
+            if response.status_code >= 500:
+                errores += 1
+    finally:
+        connections.close_all()
+    return {'latencias': latencias, 'errores': errores}
+
+
+class Command(BaseCommand):
+    help = (
+        'Mide cuántas escrituras concurrentes de pedidos (PATCH con If-Match) '
+        'soporta la base antes de que aparezcan esperas de locks o errores, con '
+        'lectores del informe en paralelo. Modifica los pedidos: usar sobre una '
+        'base de prueba'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--escritores',
+            type=int,
+            default=8,
+            help='Escritores concurrentes (default: 8)'
+        )
+        parser.add_argument(
+            '--lectores',
+            type=int,
+            default=2,
+            help='Lectores concurrentes del informe (default: 2)'
+        )
+        parser.add_argument(
+            '--modo',
+            choices=('hilos', 'procesos'),
+            default='hilos',
+            help='Escritores en hilos o en procesos separados (default: hilos)'
+        )
+        parser.add_argument(
+            '--duracion',
+            type=float,
+            default=10,
+            help='Segundos de escrituras concurrentes (default: 10)'
+        )
+        parser.add_argument(
+            '--duracion-base',
+            type=float,
+            default=3,
+            help='Segundos de lecturas sin escritores, como referencia (default: 3)'
+        )
+        parser.add_argument(
+            '--pedidos',
+            type=int,
+            default=1000,
+            help='Cantidad de pedidos sobre los que se escribe (default: 1000)'
+        )
+        parser.add_argument(
+            '--claves-calientes',
+            type=int,
+            default=10,
+            help='Pedidos que reciben la fracción caliente de las escrituras (default: 10)'
+        )
+        parser.add_argument(
+            '--fraccion-caliente',
+            type=float,
+            default=0.8,
+            help='Fracción de escrituras dirigidas a las claves calientes (default: 0.8)'
+        )
+        parser.add_argument(
+            '--umbral-espera',
+            type=float,
+            default=0.05,
+            help='Segundos a partir de los cuales una sentencia cuenta como espera de lock (default: 0.05)'
+        )
+        parser.add_argument(
+            '--espera-procesos',
+            type=float,
+            default=30,
+            help='Segundos después de --duracion para que los escritores en procesos entreguen su resultado (default: 30)'
+        )
+        parser.add_argument(
+            '--sembrar',
+            action='store_true',
+            help='Crear los pedidos (y técnicos y cliente) que falten para llegar a --pedidos'
+        )
+        parser.add_argument(
+            '--forzar',
+            action='store_true',
+            help='Permitir la ejecución con el perfil de producción'
+        )
+        parser.add_argument(
+            '--json',
+            action='store_true',
+            help='Mostrar el resultado en formato JSON'
+        )
+
+    def handle(self, *args, **options):
+        if settings.EN_PRODUCCION and not options['forzar']:
+            raise CommandError('El benchmark modifica los pedidos: use --forzar para ejecutarlo en producción.')
+        if options['escritores'] < 1 or options['lectores'] < 0 or options['pedidos'] < 1:
+            raise CommandError('Se necesita al menos un escritor y un pedido.')
+        if not 0 <= options['fraccion_caliente'] <= 1:
+            raise CommandError('La fracción caliente debe estar entre 0 y 1.')
+
+        if options['sembrar']:
+            creados = self._sembrar(options['pedidos'])
+            if creados and not options['json']:
+                self.stdout.write(f'   • {creados} pedidos creados')
+        pedido_ids = list(Pedido.objects.order_by('id').values_list('id', flat=True)[:options['pedidos']])
+        if not pedido_ids:
+            raise CommandError('No hay pedidos: cargue datos o use --sembrar.')
+
+        aleatorio = random.Random(0)
+        aleatorio.shuffle(pedido_ids)
+        calientes = pedido_ids[:max(1, min(options['claves_calientes'], len(pedido_ids)))]
+        parametros = {
+            'calientes': calientes,
+            'frios': pedido_ids[len(calientes):],
+            'fraccion_caliente': options['fraccion_caliente'],
+            'tecnico_ids': list(Tecnico.objects.filter(is_active=True).values_list('id', flat=True)[:100]),
+            'scheme_ids': list(Scheme.objects.values_list('id', flat=True)[:20]),
+            'umbral_espera': options['umbral_espera'],
+        }
+
+        if not options['json']:
+            self.stdout.write(
+                f'📊 {options["escritores"]} escritores ({options["modo"]}), '
+                f'{options["lectores"]} lectores, {len(pedido_ids)} pedidos, '
+                f'{len(calientes)} claves calientes con el {options["fraccion_caliente"]:.0%} de las escrituras'
+            )
+
+        base = self._lecturas(options['lectores'], options['duracion_base'])
+        escrituras, con_carga = self._con_escritores(parametros, options)
+        resultado = self._resumen(base, escrituras, con_carga, options)
+
+        if options['json']:
+            self.stdout.write(json.dumps(resultado, indent=2))
+        else:
+            self._mostrar(resultado)
+
+    def _sembrar(self, cantidad):
+        """Crea los pedidos que faltan para llegar a 'cantidad', retorna cuántos"""
+        faltantes = cantidad - Pedido.objects.count()
+        if faltantes <= 0:
+            return 0
+        cliente, _ = User.objects.get_or_create(
+            username='cliente_benchmark',
+            defaults={'email': 'cliente.benchmark@test.com', 'first_name': 'Cliente', 'last_name': 'Benchmark'}
+        )
+        tecnicos = list(Tecnico.objects.filter(is_active=True)[:50])
+        if not tecnicos:
+            tecnicos = Tecnico.objects.bulk_create([
+                Tecnico(first_name=f'Técnico{numero}', last_name='Benchmark',
+                        email=f'tecnico{numero}.benchmark@test.com')
+                for numero in range(50)
+            ])
+        aleatorio = random.Random(0)
+        Pedido.objects.crear_en_lote(
+            [
+                Pedido(client=cliente, tecnico=aleatorio.choice(tecnicos), hours_worked=aleatorio.randint(1, 12))
+                for _ in range(faltantes)
+            ],
+            batch_size=500
+        )
+        return faltantes
+
+    def _en_hilos(self, funcion, cantidad):
+        """Inicia 'cantidad' hilos con funcion(posicion), retorna (hilos, resultados)"""
+        resultados = [None] * cantidad
+
+        def ejecutar(posicion):
+            resultados[posicion] = funcion(posicion)
+
+        hilos = [threading.Thread(target=ejecutar, args=(posicion,)) for posicion in range(cantidad)]
+        for hilo in hilos:
+            hilo.start()
+        return hilos, resultados
+
+    def _lecturas(self, lectores, duracion):
+        if not lectores or duracion <= 0:
+            return []
+        fin = time.time() + duracion
+        hilos, resultados = self._en_hilos(lambda _: leer(fin), lectores)
+        for hilo in hilos:
+            hilo.join()
+        return resultados
+
+    def _con_escritores(self, parametros, options):
+        cantidad = options['escritores']
+        inicio = time.time()
+        parametros = {**parametros, 'fin': inicio + options['duracion']}
+
+        if options['modo'] == 'procesos':
+            # Los procesos hijos abren sus propias conexiones
+            connections.close_all()
+            contexto = multiprocessing.get_context('fork')
+            cola = contexto.Queue()
+            procesos = [
+                contexto.Process(target=_proceso_escritor, args=(cola, parametros, semilla))
+                for semilla in range(cantidad)
+            ]
+            for proceso in procesos:
+                proceso.start()
+        else:
+            hilos_escritores, escrituras = self._en_hilos(
+                lambda semilla: escribir(parametros, semilla), cantidad
+            )
+
+        hilos_lectores, lecturas = self._en_hilos(lambda _: leer(parametros['fin']), options['lectores'])
+
+        if options['modo'] == 'procesos':
+            escrituras = self._resultados_procesos(cola, procesos, parametros['fin'] + options['espera_procesos'])
+        else:
+            for hilo in hilos_escritores:
+                hilo.join()
+        for hilo in hilos_lectores:
+            hilo.join()
+
+        if options['modo'] == 'procesos':
+            fallidos = [proceso.exitcode for proceso in procesos if proceso.exitcode != 0]
+            if fallidos or len(escrituras) < len(procesos):
+                raise CommandError(
+                    f'{len(procesos) - len(escrituras)} de {len(procesos)} escritores no entregaron su '
+                    f'resultado (códigos de salida con error: {fallidos})'
+                )
+
+        return [escritura for escritura in escrituras if escritura], lecturas
+
+    def _resultados_procesos(self, cola, procesos, limite):
+        """
+        Resultados de los escritores en procesos. Si un proceso termina sin
+        entregar el suyo (o no termina antes de 'limite') no se espera más
+        """
+        escrituras = []
+        while len(escrituras) < len(procesos) and time.time() < limite:
+            try:
+                escrituras.append(cola.get(timeout=min(1, max(0.01, limite - time.time()))))
+            except queue.Empty:
+                # Los que terminaron ya entregaron: si no queda ninguno vivo, faltan resultados
+                if not any(proceso.is_alive() for proceso in procesos) and cola.empty():
+                    break
+        for proceso in procesos:
+            proceso.join(max(0, limite - time.time()))
+            if proceso.is_alive():
+                proceso.terminate()
+                proceso.join()
+        return escrituras
+
+    def _latencias(self, latencias):
+        ordenadas = sorted(latencias)
+        return {
+            'cantidad': len(ordenadas),
+            'p50': percentil(ordenadas, 0.50),
+            'p95': percentil(ordenadas, 0.95),
+            'p99': percentil(ordenadas, 0.99),
+        }
+
+    def _resumen(self, base, escrituras, con_carga, options):
+        duracion = options['duracion']
+        commits = sum(escritura['commits'] for escritura in escrituras)
+        errores = Counter()
+        estados = Counter()
+        for escritura in escrituras:
+            errores.update(escritura['errores'])
+            estados.update(escritura['estados'])
+
+        lectores_base = self._latencias([l for lectura in base for l in lectura['latencias']])
+        lectores_carga = self._latencias([l for lectura in con_carga for l in lectura['latencias']])
+        degradacion = {
+            nombre: lectores_carga[nombre] / lectores_base[nombre]
+            for nombre in ('p50', 'p95', 'p99')
+            if lectores_base[nombre] and lectores_carga[nombre] is not None
+        }
+
+        return {
+            'escritores': options['escritores'],
+            'modo': options['modo'],
+            'duracion': duracion,
+            'commits': commits,
+            'commits_por_segundo': commits / duracion,
+            'conflictos_version': sum(escritura['conflictos'] for escritura in escrituras),
+            'sin_cambios': sum(escritura['sin_cambios'] for escritura in escrituras),
+            'respuestas_error': {str(estado): cantidad for estado, cantidad in estados.items()},
+            'errores_base': dict(errores),
+            'esperas_lock': sum(escritura['esperas'] for escritura in escrituras),
+            'bloqueos_lock': sum(escritura['bloqueos'] for escritura in escrituras),
+            'tiempo_espera': sum(escritura['tiempo_espera'] for escritura in escrituras),
+            'espera_maxima': max((escritura['espera_maxima'] for escritura in escrituras), default=0),
+            'latencia_escritura': self._latencias(
+                [l for escritura in escrituras for l in escritura['latencias']]
+            ),
+            'lectores_sin_carga': lectores_base,
+            'lectores_con_carga': lectores_carga,
+            'errores_lectores': sum(lectura['errores'] for lectura in con_carga),
+            'degradacion_lectores': degradacion,
+        }
+
+    def _ms(self, segundos):
+        return f'{segundos * 1000:.1f}ms' if segundos is not None else '-'
+
+    def _mostrar_latencias(self, titulo, latencias):
+        self.stdout.write(
+            f'   • {titulo}: {latencias["cantidad"]} requests, p50 {self._ms(latencias["p50"])}, '
+            f'p95 {self._ms(latencias["p95"])}, p99 {self._ms(latencias["p99"])}'
+        )
+
+    def _mostrar(self, resultado):
+        self.stdout.write('')
+        self.stdout.write(
+            self.style.SUCCESS(
+                f'🎉 {resultado["commits"]} commits en {resultado["duracion"]:g}s '
+                f'({resultado["commits_por_segundo"]:.1f} commits/s)'
+            )
+        )
+        self._mostrar_latencias('Escrituras', resultado['latencia_escritura'])
+        self.stdout.write(f'   • Conflictos de versión (412): {resultado["conflictos_version"]}')
+        self.stdout.write(f'   • Sin cambios (mismo valor): {resultado["sin_cambios"]}')
+        self.stdout.write(
+            f'   • Esperas de lock (sentencias lentas): {resultado["esperas_lock"]}, '
+            f'total {resultado["tiempo_espera"]:.2f}s, máxima {self._ms(resultado["espera_maxima"])}'
+        )
+        self.stdout.write(f'   • Sentencias fallidas por lock (locked/busy): {resultado["bloqueos_lock"]}')
+
+        if resultado['errores_base'] or resultado['respuestas_error']:
+            for error, cantidad in resultado['errores_base'].items():
+                self.stdout.write(self.style.ERROR(f'❌ {error}: {cantidad}'))
+            for estado, cantidad in resultado['respuestas_error'].items():
+                self.stdout.write(self.style.ERROR(f'❌ Respuestas HTTP {estado}: {cantidad}'))
+        else:
+            self.stdout.write('   • Errores: 0')
+
+        if resultado['lectores_sin_carga']['cantidad']:
+            self.stdout.write('📊 Lectores del informe:')
+            self._mostrar_latencias('Sin escritores', resultado['lectores_sin_carga'])
+            self._mostrar_latencias('Con escritores', resultado['lectores_con_carga'])
+            degradacion = ', '.join(
+                f'{nombre} x{factor:.1f}' for nombre, factor in resultado['degradacion_lectores'].items()
+            )
+            self.stdout.write(f'   • Degradación: {degradacion or "-"}')
+            if resultado['errores_lectores']:
+                self.stdout.write(self.style.ERROR(f'❌ Errores de lectura: {resultado["errores_lectores"]}'))
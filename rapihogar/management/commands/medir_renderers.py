@@ -0,0 +1,83 @@
+"""
+Comando para medir el tiempo de codificación JSON del listado de técnicos
+"""
+import time
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from rest_framework.renderers import JSONRenderer
+
+from api import renderers
+from api.serializers import TecnicoSerializer
+from rapihogar.escalas import calcular_pago
+from rapihogar.models import Tecnico
+
+
+class Command(BaseCommand):
+    help = 'Mide el tiempo de codificación JSON por cada 1.000 técnicos con cada renderer'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--tecnicos',
+            type=int,
+            default=1000,
+            help='Cantidad de técnicos serializados (default: 1000)'
+        )
+        parser.add_argument(
+            '--repeticiones',
+            type=int,
+            default=50,
+            help='Veces que se codifica la respuesta con cada renderer (default: 50)'
+        )
+
+    def handle(self, *args, **options):
+        cantidad = options['tecnicos']
+        repeticiones = options['repeticiones']
+        if cantidad < 1 or repeticiones < 1:
+            raise CommandError('La cantidad de técnicos y de repeticiones debe ser al menos 1.')
+
+        # Datos ya serializados, como los recibe el renderer (sin base de datos)
+        datos = {
+            'count': cantidad,
+            'results': TecnicoSerializer(self._tecnicos(cantidad), many=True).data,
+        }
+
+        medidos = [('JSONRenderer (DRF, json estándar)', JSONRenderer())]
+        if renderers.orjson is not None:
+            medidos.append(('JSONRapidoRenderer (orjson)', renderers.JSONRapidoRenderer()))
+        else:
+            self.stdout.write(self.style.WARNING('⚠️  orjson no está instalado: solo se mide DRF'))
+
+        self.stdout.write(f'📊 {cantidad} técnicos, {repeticiones} repeticiones:')
+        base = None
+        for nombre, renderer in medidos:
+            renderer.render(datos)  # calentamiento
+            inicio = time.perf_counter()
+            for _ in range(repeticiones):
+                contenido = renderer.render(datos)
+            por_mil = (time.perf_counter() - inicio) / repeticiones / cantidad * 1000 * 1000
+            base = base or por_mil
+            self.stdout.write(
+                f'   • {nombre}: {por_mil:.2f} ms cada 1.000 técnicos '
+                f'({len(contenido) / 1024:.0f} KB, x{base / por_mil:.1f})'
+            )
+
+    def _tecnicos(self, cantidad):
+        ahora = timezone.now()
+        tecnicos = []
+        for indice in range(1, cantidad + 1):
+            tecnico = Tecnico(
+                id=indice,
+                first_name=f'Técnico {indice}',
+                last_name='Prueba',
+                email=f'tecnico{indice}@rapihogar.com',
+                phone='+54911123456',
+                date_joined=ahora - timedelta(minutes=indice),
+            )
+            # Totales como los anotados por con_liquidacion()
+            tecnico.horas_trabajadas = indice % 60
+            tecnico.cantidad_pedidos = indice % 7
+            tecnico.pago = calcular_pago(tecnico.horas_trabajadas)
+            tecnicos.append(tecnico)
+        return tecnicos
@@ -0,0 +1,121 @@
+"""
+Comando worker de la cola local de trabajos
+"""
+import threading
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import close_old_connections, connection
+
+from rapihogar import cola
+
+
+class Command(BaseCommand):
+    help = 'Procesa los trabajos de la cola local (recálculo de datos derivados)'
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._detener = threading.Event()
+        self._procesados = 0
+        self._lock = threading.Lock()
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--concurrencia',
+            type=int,
+            default=1,
+            help='Cantidad de hilos que procesan trabajos en paralelo (default: 1)'
+        )
+        parser.add_argument(
+            '--intervalo',
+            type=float,
+            default=1.0,
+            help='Segundos de espera cuando la cola está vacía (default: 1)'
+        )
+        parser.add_argument(
+            '--una-vez',
+            action='store_true',
+            help='Procesar los trabajos disponibles y terminar'
+        )
+        parser.add_argument(
+            '--metricas',
+            action='store_true',
+            help='Mostrar profundidad y latencia de la cola y terminar'
+        )
+
+    def handle(self, *args, **options):
+        if options['metricas']:
+            self._mostrar_metricas()
+            return
+
+        concurrencia = options['concurrencia']
+        if concurrencia < 1:
+            raise CommandError('La concurrencia debe ser al menos 1.')
+
+        recuperados = cola.recuperar_colgados()
+        if recuperados:
+            self.stdout.write(f'⚠️  Trabajos colgados devueltos a la cola: {recuperados}')
+
+        self.stdout.write(f'📊 Procesando cola con {concurrencia} hilo(s)...')
+
+        hilos = [
+            threading.Thread(
+                target=self._trabajar,
+                args=(options['intervalo'], options['una_vez']),
+                daemon=True
+            )
+            for _ in range(concurrencia)
+        ]
+        for hilo in hilos:
+            hilo.start()
+
+        try:
+            while any(hilo.is_alive() for hilo in hilos):
+                for hilo in hilos:
+                    hilo.join(timeout=0.5)
+        except KeyboardInterrupt:
+            self._detener.set()
+            for hilo in hilos:
+                hilo.join()
+
+        self.stdout.write(
+            self.style.SUCCESS(f'🎉 Trabajos procesados: {self._procesados}')
+        )
+        self._mostrar_metricas()
+
+    def _trabajar(self, intervalo, una_vez):
+        # Cada hilo usa su propia conexión a la base de datos
+        try:
+            while not self._detener.is_set():
+                close_old_connections()
+                procesados = cola.procesar_lote()
+                with self._lock:
+                    self._procesados += procesados
+
+                if procesados:
+                    continue
+                if una_vez:
+                    return
+
+                # Los trabajos de un worker que se cayó y se reinició antes del
+                # timeout siguen en curso: se recuperan al vencer, no solo al iniciar
+                recuperados = cola.recuperar_colgados()
+                if recuperados:
+                    self.stdout.write(f'⚠️  Trabajos colgados devueltos a la cola: {recuperados}')
+                cola.purgar_completados()
+                self._detener.wait(intervalo)
+        finally:
+            connection.close()
+
+    def _mostrar_metricas(self):
+        metricas = cola.metricas()
+        self.stdout.write('')
+        self.stdout.write('📊 Estado de la cola:')
+        for estado, total in metricas['por_estado'].items():
+            self.stdout.write(f'   • {estado}: {total}')
+        self.stdout.write(f'   • Antigüedad del pendiente más viejo: {metricas["antiguedad_pendiente"]:.1f}s')
+        if metricas['latencia_media'] is not None:
+            self.stdout.write(
+                f'   • Latencia media: {metricas["latencia_media"]:.3f}s '
+                f'(p95: {metricas["latencia_p95"]:.3f}s)'
+            )
@@ -0,0 +1,158 @@
+"""
+Comando para recalcular en paralelo los totales de liquidación de todos los técnicos
+"""
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from django.apps import apps
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+
+from rapihogar.liquidacion import rangos_tecnicos, recalcular_rango
+from rapihogar.models import VersionLiquidacion
+
+
+def _iniciar_worker():
+    # Con el método 'spawn' el proceso hijo arranca sin Django configurado
+    if not apps.ready:
+        import django
+        django.setup()
+
+
+def _recalcular(desde, hasta, lote):
+    """Ejecuta un rango en el worker, con su propia conexión a la base"""
+    inicio = time.monotonic()
+    try:
+        return recalcular_rango(desde, hasta, lote), time.monotonic() - inicio
+    finally:
+        connections.close_all()
+
+
+class Command(BaseCommand):
+    help = (
+        'Recalcula los totales precalculados (horas, pedidos y pago) de todos '
+        'los técnicos, repartiendo rangos de ids entre procesos'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--procesos',
+            type=int,
+            default=os.cpu_count() or 1,
+            help='Procesos worker; 1 ejecuta en el proceso actual (default: cantidad de CPUs)'
+        )
+        parser.add_argument(
+            '--rango',
+            type=int,
+            default=5000,
+            help='Técnicos por rango de ids (default: 5000)'
+        )
+        parser.add_argument(
+            '--lote',
+            type=int,
+            default=500,
+            help='Técnicos por UPDATE dentro de cada rango (default: 500)'
+        )
+        parser.add_argument(
+            '--rangos',
+            help='Recalcular solo estos rangos DESDE-HASTA separados por coma (ej: para reintentar fallidos)'
+        )
+
+    def handle(self, *args, **options):
+        if options['procesos'] < 1 or options['rango'] < 1 or options['lote'] < 1:
+            raise CommandError('Los procesos, el rango y el lote deben ser al menos 1.')
+
+        if options['rangos']:
+            rangos = self._parsear_rangos(options['rangos'])
+        else:
+            rangos = rangos_tecnicos(options['rango'])
+        if not rangos:
+            self.stdout.write(self.style.WARNING('⚠️  No hay técnicos para recalcular'))
+            return
+
+        procesos = min(options['procesos'], len(rangos))
+        self.stdout.write(
+            f'📊 Recalculando {len(rangos)} rangos de técnicos con {procesos} procesos...'
+        )
+
+        inicio = time.monotonic()
+        if procesos == 1:
+            recalculados, fallidos = self._ejecutar_local(rangos, options['lote'])
+        else:
+            recalculados, fallidos = self._ejecutar_pool(rangos, procesos, options['lote'])
+        duracion = time.monotonic() - inicio
+
+        if recalculados:
+            # Los procesos con datos derivados en memoria deben descartarlos
+            VersionLiquidacion.renovar()
+
+        self.stdout.write(
+            self.style.SUCCESS(
+                f'🎉 {recalculados} técnicos recalculados en {duracion:.1f}s '
+                f'({recalculados / duracion if duracion else 0:,.0f} técnicos/s)'
+            )
+        )
+
+        if fallidos:
+            for (desde, hasta), error in fallidos:
+                self.stdout.write(self.style.ERROR(f'❌ Rango {desde}-{hasta}: {error}'))
+            reintento = ','.join(f'{desde}-{hasta}' for (desde, hasta), _ in fallidos)
+            raise CommandError(
+                f'{len(fallidos)} rangos fallaron. Reintentar con: --rangos {reintento}'
+            )
+
+    def _parsear_rangos(self, valor):
+        rangos = []
+        for parte in valor.split(','):
+            desde, _, hasta = parte.strip().partition('-')
+            try:
+                rango = (int(desde), int(hasta))
+            except ValueError:
+                raise CommandError(f'Rango inválido "{parte}". Formato: DESDE-HASTA')
+            if rango[0] >= rango[1]:
+                raise CommandError(f'Rango vacío "{parte}": HASTA se excluye y debe ser mayor que DESDE')
+            rangos.append(rango)
+        return rangos
+
+    def _progreso(self, completados, total, rango, cantidad, segundos):
+        self.stdout.write(
+            f'   • [{completados}/{total}] rango {rango[0]}-{rango[1]}: '
+            f'{cantidad} técnicos en {segundos:.2f}s'
+        )
+
+    def _ejecutar_local(self, rangos, lote):
+        recalculados = 0
+        fallidos = []
+        for posicion, (desde, hasta) in enumerate(rangos, start=1):
+            inicio = time.monotonic()
+            try:
+                cantidad = recalcular_rango(desde, hasta, lote)
+            except Exception as e:
+                fallidos.append(((desde, hasta), e))
+                continue
+            recalculados += cantidad
+            self._progreso(posicion, len(rangos), (desde, hasta), cantidad, time.monotonic() - inicio)
+        return recalculados, fallidos
+
+    def _ejecutar_pool(self, rangos, procesos, lote):
+        # Los hijos no deben heredar la conexión abierta del proceso padre
+        connections.close_all()
+
+        recalculados = 0
+        fallidos = []
+        with ProcessPoolExecutor(max_workers=procesos, initializer=_iniciar_worker) as pool:
+            futuros = {
+                pool.submit(_recalcular, desde, hasta, lote): (desde, hasta)
+                for desde, hasta in rangos
+            }
+            for posicion, futuro in enumerate(as_completed(futuros), start=1):
+                rango = futuros[futuro]
+                try:
+                    cantidad, segundos = futuro.result()
+                except Exception as e:
+                    fallidos.append((rango, e))
+                    continue
+                recalculados += cantidad
+                self._progreso(posicion, len(rangos), rango, cantidad, segundos)
+        return recalculados, fallidos
@@ -0,0 +1,96 @@
+"""
+Comando para simular la liquidación con una tabla de escalas alternativa
+"""
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+
+from rapihogar.escalas import ESCALAS_PAGO, construir_escalas
+from rapihogar.liquidacion import simular_liquidacion
+
+
+class Command(BaseCommand):
+    help = (
+        'Simula el costo de la liquidación con escalas alternativas, sin '
+        'escribir nada en la base de datos'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--escala',
+            action='append',
+            dest='escalas',
+            metavar='HASTA:VALOR_HORA:DESCUENTO',
+            help=(
+                'Escala alternativa, repetir una vez por escala en orden '
+                'creciente. La última usa "*" como HASTA. '
+                'Ej: --escala 14:200:0.15 ... --escala "*:350:0.18"'
+            )
+        )
+        parser.add_argument(
+            '--json',
+            action='store_true',
+            help='Mostrar el resultado completo en formato JSON'
+        )
+        parser.add_argument(
+            '--detalle',
+            action='store_true',
+            help='Mostrar la diferencia de pago por técnico'
+        )
+
+    def handle(self, *args, **options):
+        escalas = self._parsear_escalas(options['escalas'])
+        simulacion = simular_liquidacion(escalas)
+
+        if options['json']:
+            self.stdout.write(json.dumps(simulacion, indent=2))
+            return
+
+        self.stdout.write('📊 Escalas simuladas:')
+        for escala in simulacion['escalas']:
+            self.stdout.write(
+                f'   • {escala["etiqueta"]:>7} hs: ${escala["valor_hora"]:,.2f}/hora '
+                f'- {escala["descuento"]:.0%} → {escala["tecnicos"]} técnicos, '
+                f'${escala["monto"]:,.2f}'
+            )
+
+        if options['detalle']:
+            self.stdout.write('')
+            for tecnico in simulacion['tecnicos']:
+                self.stdout.write(
+                    f'   • Técnico #{tecnico["id"]} ({tecnico["horas"]}h): '
+                    f'${tecnico["pago_actual"]:,.2f} → ${tecnico["pago_simulado"]:,.2f} '
+                    f'({tecnico["diferencia"]:+,.2f})'
+                )
+
+        self.stdout.write('')
+        self.stdout.write(f'   • Costo actual: ${simulacion["total_actual"]:,.2f}')
+        self.stdout.write(f'   • Costo simulado: ${simulacion["total_simulado"]:,.2f}')
+        self.stdout.write(
+            self.style.SUCCESS(
+                f'🎉 Diferencia total: {simulacion["diferencia_total"]:+,.2f}'
+            )
+        )
+
+    def _parsear_escalas(self, valores):
+        if not valores:
+            return ESCALAS_PAGO
+
+        datos = []
+        for valor in valores:
+            partes = valor.split(':')
+            if len(partes) != 3:
+                raise CommandError(
+                    f'Escala inválida "{valor}". Formato: HASTA:VALOR_HORA:DESCUENTO'
+                )
+            hasta, valor_hora, descuento = partes
+            datos.append({
+                'hasta': None if hasta == '*' else hasta,
+                'valor_hora': valor_hora,
+                'descuento': descuento,
+            })
+
+        try:
+            return construir_escalas(datos)
+        except ValueError as e:
+            raise CommandError(str(e))
@@ -0,0 +1,154 @@
+"""
+Comando para sincronizar los técnicos con el padrón exportado por RR.HH.
+"""
+import csv
+
+from django.core.exceptions import ValidationError
+from django.core.management.base import BaseCommand, CommandError
+from django.core.validators import validate_email
+from django.db import transaction
+from django.utils import timezone
+
+from rapihogar.models import Tecnico, VersionLiquidacion
+
+# Nombres de columna aceptados en el CSV -> campo del técnico
+COLUMNAS = {
+    'email': 'email',
+    'first_name': 'first_name',
+    'nombre': 'first_name',
+    'last_name': 'last_name',
+    'apellido': 'last_name',
+    'phone': 'phone',
+    'telefono': 'phone',
+    'teléfono': 'phone',
+}
+CAMPOS_ACTUALIZADOS = ['first_name', 'last_name', 'phone', 'is_active', 'sincronizado_en']
+MAX_ERRORES_MOSTRADOS = 10
+
+
+class Command(BaseCommand):
+    help = 'Sincroniza los técnicos con el CSV de RR.HH. (alta, actualización y baja por email)'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'archivo',
+            help='CSV con encabezado: email, first_name/nombre, last_name/apellido y opcional phone/telefono'
+        )
+        parser.add_argument(
+            '--lote',
+            type=int,
+            default=1000,
+            help='Filas por cada inserción masiva (default: 1000)'
+        )
+        parser.add_argument(
+            '--sin-desactivar',
+            action='store_true',
+            help='No desactivar los técnicos ausentes del archivo (exportaciones parciales)'
+        )
+
+    def handle(self, *args, **options):
+        if options['lote'] < 1:
+            raise CommandError('El tamaño de lote debe ser al menos 1.')
+
+        self.sincronizado_en = timezone.now()
+        self.insertados = 0
+        self.actualizados = 0
+        self.errores = []
+        # Emails de filas inválidas: el técnico existente queda como estaba
+        self.omitidos = set()
+
+        try:
+            with open(options['archivo'], encoding='utf-8-sig', newline='') as archivo:
+                with transaction.atomic():
+                    self._sincronizar(csv.DictReader(archivo), options['lote'])
+
+                    desactivados = 0
+                    if not options['sin_desactivar']:
+                        # Los técnicos que no vinieron en el archivo, en un solo UPDATE
+                        desactivados = Tecnico.objects.filter(is_active=True).exclude(
+                            sincronizado_en=self.sincronizado_en
+                        ).exclude(email__in=self.omitidos).update(is_active=False)
+
+                    # bulk_create y update() no disparan señales: invalidar los datos derivados
+                    VersionLiquidacion.renovar()
+        except FileNotFoundError:
+            raise CommandError(f'No existe el archivo: {options["archivo"]}')
+
+        for error in self.errores[:MAX_ERRORES_MOSTRADOS]:
+            self.stdout.write(self.style.WARNING(f'⚠️  {error}'))
+        if len(self.errores) > MAX_ERRORES_MOSTRADOS:
+            self.stdout.write(
+                self.style.WARNING(f'⚠️  ... y {len(self.errores) - MAX_ERRORES_MOSTRADOS} filas más con errores')
+            )
+
+        self.stdout.write(
+            self.style.SUCCESS(
+                f'\n🎉 Sincronización completada. '
+                f'Insertados: {self.insertados}, '
+                f'actualizados: {self.actualizados}, '
+                f'desactivados: {desactivados}, '
+                f'filas con errores: {len(self.errores)}'
+            )
+        )
+
+    def _sincronizar(self, lector, tamano_lote):
+        if lector.fieldnames is None:
+            raise CommandError('El archivo está vacío.')
+        columnas = {
+            columna: COLUMNAS[columna.strip().lower()]
+            for columna in lector.fieldnames
+            if columna and columna.strip().lower() in COLUMNAS
+        }
+        faltantes = {'email', 'first_name', 'last_name'} - set(columnas.values())
+        if faltantes:
+            raise CommandError(f'Faltan columnas en el archivo: {", ".join(sorted(faltantes))}')
+
+        lote = {}
+        # La línea 1 es el encabezado
+        for linea, fila in enumerate(lector, start=2):
+            datos = {
+                campo: (fila.get(columna) or '').strip()
+                for columna, campo in columnas.items()
+            }
+            tecnico = self._construir(linea, datos)
+            if tecnico is None:
+                continue
+            # Si el email se repite dentro del lote, vale la última fila
+            lote[tecnico.email] = tecnico
+            if len(lote) >= tamano_lote:
+                self._guardar_lote(lote)
+                lote = {}
+        if lote:
+            self._guardar_lote(lote)
+
+    def _construir(self, linea, datos):
+        email = datos['email']
+        try:
+            validate_email(email)
+        except ValidationError:
+            self.errores.append(f'Línea {linea}: email inválido "{email}"')
+            return None
+        if not datos['first_name'] or not datos['last_name']:
+            self.errores.append(f'Línea {linea}: falta el nombre o el apellido de {email}')
+            self.omitidos.add(email)
+            return None
+
+        return Tecnico(
+            email=email,
+            first_name=datos['first_name'][:100],
+            last_name=datos['last_name'][:100],
+            phone=datos.get('phone', '')[:15] or None,
+            is_active=True,
+            sincronizado_en=self.sincronizado_en,
+        )
+
+    def _guardar_lote(self, lote):
+        existentes = Tecnico.objects.filter(email__in=list(lote)).count()
+        Tecnico.objects.bulk_create(
+            lote.values(),
+            update_conflicts=True,
+            unique_fields=['email'],
+            update_fields=CAMPOS_ACTUALIZADOS,
+        )
+        self.actualizados += existentes
+        self.insertados += len(lote) - existentes
@@ -0,0 +1,31 @@
+# Generated by Django 5.1.1 on 2026-10-18 22:21
+
+import uuid
+from django.db import migrations, models
+
+
+def crear_version_inicial(apps, schema_editor):
+    VersionLiquidacion = apps.get_model('rapihogar', 'VersionLiquidacion')
+    VersionLiquidacion.objects.get_or_create(pk=1)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('rapihogar', '0002_tecnico_pedido_created_at_pedido_updated_at_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='VersionLiquidacion',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('version', models.UUIDField(default=uuid.uuid4)),
+            ],
+            options={
+                'verbose_name': 'Versión de liquidación',
+                'verbose_name_plural': 'Versiones de liquidación',
+            },
+        ),
+        migrations.RunPython(crear_version_inicial, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,63 @@
+# Generated by Django 5.1.1 on 2026-10-18 22:22
+
+from django.db import migrations, models
+from django.db.models import Count, Sum
+
+from rapihogar.escalas import calcular_pago
+
+
+def calcular_totales(apps, schema_editor):
+    Tecnico = apps.get_model('rapihogar', 'Tecnico')
+    Pedido = apps.get_model('rapihogar', 'Pedido')
+
+    totales = (
+        Pedido.objects.filter(tecnico__isnull=False)
+        .values('tecnico_id')
+        .annotate(horas=Sum('hours_worked'), pedidos=Count('id'))
+    )
+    tecnicos = [
+        Tecnico(
+            id=total['tecnico_id'],
+            horas_totales=total['horas'],
+            pedidos_totales=total['pedidos'],
+            pago_total=calcular_pago(total['horas']),
+        )
+        for total in totales
+    ]
+    Tecnico.objects.bulk_update(
+        tecnicos, ['horas_totales', 'pedidos_totales', 'pago_total'], batch_size=500
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('rapihogar', '0003_versionliquidacion'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='tecnico',
+            name='horas_totales',
+            field=models.IntegerField(default=0, editable=False, verbose_name='Horas totales'),
+        ),
+        migrations.AddField(
+            model_name='tecnico',
+            name='pago_total',
+            field=models.FloatField(default=0, editable=False, verbose_name='Pago total'),
+        ),
+        migrations.AddField(
+            model_name='tecnico',
+            name='pedidos_totales',
+            field=models.IntegerField(default=0, editable=False, verbose_name='Pedidos totales'),
+        ),
+        migrations.AddIndex(
+            model_name='tecnico',
+            index=models.Index(fields=['is_active', 'pago_total'], name='tecnico_activo_pago_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='tecnico',
+            index=models.Index(fields=['is_active', 'horas_totales'], name='tecnico_activo_horas_idx'),
+        ),
+        migrations.RunPython(calcular_totales, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,36 @@
+# Generated by Django 5.1.1 on 2026-10-18 22:25
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('rapihogar', '0004_tecnico_totales'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Trabajo',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('tarea', models.CharField(max_length=100, verbose_name='Tarea')),
+                ('clave', models.CharField(blank=True, max_length=200, null=True, verbose_name='Clave de deduplicación')),
+                ('parametros', models.JSONField(default=dict, verbose_name='Parámetros')),
+                ('estado', models.CharField(choices=[('pendiente', 'Pendiente'), ('en_curso', 'En curso'), ('completado', 'Completado'), ('fallido', 'Fallido')], default='pendiente', max_length=20, verbose_name='Estado')),
+                ('intentos', models.PositiveIntegerField(default=0, verbose_name='Intentos')),
+                ('disponible_en', models.DateTimeField(default=django.utils.timezone.now, verbose_name='Disponible desde')),
+                ('creado_en', models.DateTimeField(auto_now_add=True, verbose_name='Fecha de creación')),
+                ('iniciado_en', models.DateTimeField(blank=True, null=True, verbose_name='Fecha de inicio')),
+                ('terminado_en', models.DateTimeField(blank=True, null=True, verbose_name='Fecha de finalización')),
+                ('error', models.TextField(blank=True, verbose_name='Último error')),
+            ],
+            options={
+                'verbose_name': 'Trabajo',
+                'verbose_name_plural': 'Trabajos',
+                'indexes': [models.Index(fields=['estado', 'disponible_en'], name='trabajo_estado_disponible_idx')],
+                'constraints': [models.UniqueConstraint(condition=models.Q(('estado', 'pendiente')), fields=('clave',), name='trabajo_pendiente_clave_unica')],
+            },
+        ),
+    ]
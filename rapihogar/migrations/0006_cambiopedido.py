@@ -0,0 +1,33 @@
+# Generated by Django 5.1.1 on 2026-10-18 22:27
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('rapihogar', '0005_trabajo'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CambioPedido',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('pedido_id', models.BigIntegerField(db_index=True, verbose_name='Pedido')),
+                ('operacion', models.CharField(choices=[('creado', 'Creado'), ('actualizado', 'Actualizado'), ('eliminado', 'Eliminado')], max_length=20, verbose_name='Operación')),
+                ('horas_antes', models.IntegerField(blank=True, null=True)),
+                ('horas_despues', models.IntegerField(blank=True, null=True)),
+                ('tecnico_antes', models.BigIntegerField(blank=True, null=True)),
+                ('tecnico_despues', models.BigIntegerField(blank=True, null=True)),
+                ('scheme_antes', models.BigIntegerField(blank=True, null=True)),
+                ('scheme_despues', models.BigIntegerField(blank=True, null=True)),
+                ('creado_en', models.DateTimeField(auto_now_add=True, verbose_name='Fecha del cambio')),
+            ],
+            options={
+                'verbose_name': 'Cambio de pedido',
+                'verbose_name_plural': 'Cambios de pedidos',
+                'ordering': ('id',),
+            },
+        ),
+    ]
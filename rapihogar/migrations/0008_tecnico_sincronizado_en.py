@@ -0,0 +1,18 @@
+# Generated by Django 5.1.1 on 2026-10-18 22:31
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('rapihogar', '0007_pedido_version'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='tecnico',
+            name='sincronizado_en',
+            field=models.DateTimeField(blank=True, editable=False, null=True, verbose_name='Sincronizado en'),
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 5.1.1 on 2026-10-18 22:35
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('rapihogar', '0008_tecnico_sincronizado_en'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='pedido',
+            index=models.Index(fields=['tecnico', 'created_at'], name='pedido_tecnico_fecha_idx'),
+        ),
+    ]
@@ -0,0 +1,46 @@
+# Generated by Django 5.1.1 on 2026-10-18 22:36
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('rapihogar', '0009_pedido_tecnico_fecha_idx'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='HistoricoTecnico',
+            fields=[
+                ('tecnico', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='historico', serialize=False, to='rapihogar.tecnico')),
+                ('horas', models.IntegerField(default=0)),
+                ('pedidos', models.IntegerField(default=0)),
+                ('hasta', models.DateTimeField(blank=True, null=True)),
+            ],
+            options={
+                'verbose_name': 'Histórico de técnico',
+                'verbose_name_plural': 'Históricos de técnicos',
+            },
+        ),
+        migrations.CreateModel(
+            name='PedidoArchivado',
+            fields=[
+                ('id', models.BigIntegerField(primary_key=True, serialize=False)),
+                ('type_request', models.IntegerField()),
+                ('client_id', models.BigIntegerField()),
+                ('scheme_id', models.BigIntegerField(blank=True, null=True)),
+                ('tecnico_id', models.BigIntegerField(blank=True, db_index=True, null=True)),
+                ('hours_worked', models.IntegerField()),
+                ('created_at', models.DateTimeField(blank=True, null=True)),
+                ('updated_at', models.DateTimeField(blank=True, null=True)),
+                ('archivado_en', models.DateTimeField(auto_now_add=True, verbose_name='Fecha de archivo')),
+            ],
+            options={
+                'verbose_name': 'Pedido archivado',
+                'verbose_name_plural': 'Pedidos archivados',
+                'ordering': ('-id',),
+            },
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.1.1 on 2026-10-18 22:45
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('rapihogar', '0010_pedidoarchivado_historicotecnico'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='pedido',
+            name='clave_idempotencia',
+            field=models.CharField(blank=True, editable=False, max_length=100, null=True, unique=True, verbose_name='Clave de idempotencia'),
+        ),
+    ]
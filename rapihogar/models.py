@@ -1,7 +1,17 @@
-from django.db import models
+import uuid
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import models, transaction
+from django.utils import timezone
 from django.utils.translation import gettext_lazy as _
 from django.contrib.auth.models import AbstractBaseUser, PermissionsMixin, UserManager
 
+from django.db.models.functions import Coalesce
+
+from .escalas import calcular_pago, expresion_pago
+from .transacciones import transaccion_escritura
+
 
 class User(AbstractBaseUser, PermissionsMixin):    
     email = models.EmailField(_('email address'), unique=True)
@@ -49,6 +59,54 @@ class Scheme(models.Model):
         verbose_name_plural = _('Esquemas de pedidos')
 
 
+class TecnicoQuerySet(models.QuerySet):
+
+    #Anotar horas, cantidad de pedidos y pago calculados en la base de datos
+    #(pedidos vigentes más el histórico de los archivados)
+    def con_liquidacion(self):
+        return self.annotate(
+            horas_trabajadas=(
+                Coalesce(models.Sum('pedidos__hours_worked'), 0)
+                + Coalesce(models.F('historico__horas'), 0)
+            ),
+            cantidad_pedidos=(
+                models.Count('pedidos')
+                + Coalesce(models.F('historico__pedidos'), 0)
+            ),
+        ).annotate(
+            pago=expresion_pago(models.F('horas_trabajadas')),
+        )
+
+    #Exponer los totales precalculados con los mismos nombres que con_liquidacion
+    def con_totales(self):
+        return self.annotate(
+            horas_trabajadas=models.F('horas_totales'),
+            cantidad_pedidos=models.F('pedidos_totales'),
+            pago=models.F('pago_total'),
+        )
+
+    #Recalcular y guardar los totales precalculados de los técnicos del queryset.
+    #El agregado se lee y se guarda en una transacción, con las filas de los
+    #técnicos bloqueadas: dos recálculos del mismo técnico se ejecutan de a uno
+    #y el último lee los pedidos confirmados por el anterior, así un agregado
+    #viejo nunca pisa uno más nuevo
+    def recalcular_totales(self, batch_size=500):
+        with transaccion_escritura():
+            list(self.select_for_update().order_by('id').values_list('id', flat=True))
+            tecnicos = [
+                Tecnico(id=tecnico_id, horas_totales=horas, pedidos_totales=pedidos, pago_total=pago)
+                for tecnico_id, horas, pedidos, pago in self.con_liquidacion().values_list(
+                    'id', 'horas_trabajadas', 'cantidad_pedidos', 'pago'
+                )
+            ]
+            Tecnico.objects.bulk_update(
+                tecnicos,
+                ['horas_totales', 'pedidos_totales', 'pago_total'],
+                batch_size=batch_size
+            )
+        return len(tecnicos)
+
+
 #modelo de tecnico que trabaja en los pedidos
 class Tecnico(models.Model):
     first_name = models.CharField(
@@ -78,44 +136,72 @@ class Tecnico(models.Model):
         verbose_name='Activo'
     )
 
+    # Totales precalculados para ordenar y filtrar en la base de datos
+    horas_totales = models.IntegerField(
+        default=0,
+        editable=False,
+        verbose_name='Horas totales'
+    )
+    pedidos_totales = models.IntegerField(
+        default=0,
+        editable=False,
+        verbose_name='Pedidos totales'
+    )
+    pago_total = models.FloatField(
+        default=0,
+        editable=False,
+        verbose_name='Pago total'
+    )
+    # Última sincronización con el padrón de RR.HH. (ver sincronizar_tecnicos)
+    sincronizado_en = models.DateTimeField(
+        null=True,
+        blank=True,
+        editable=False,
+        verbose_name='Sincronizado en'
+    )
+
+    objects = TecnicoQuerySet.as_manager()
+
     @property
     def full_name(self):
         return f"{self.first_name} {self.last_name}"
 
+    # Guardar y eliminar en una transacción que incluye la actualización de
+    # los totales y los datos derivados (ver rapihogar/signals.py)
+    def save(self, *args, **kwargs):
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+
+    def delete(self, *args, **kwargs):
+        with transaction.atomic():
+            return super().delete(*args, **kwargs)
+
     #Calcular total de horas trabajadas por el técnico
     def total_hours_worked(self):
-        return self.pedidos.aggregate(
+        return (self.pedidos.aggregate(
             total=models.Sum('hours_worked')
-        )['total'] or 0
+        )['total'] or 0) + self._historico('horas')
 
     #Obtener cantidad total de pedidos
     def total_pedidos(self):
-        return self.pedidos.count()
+        return self.pedidos.count() + self._historico('pedidos')
+
+    #Horas o pedidos archivados del técnico (ver archivar_pedidos). La relación
+    #queda en el cache de la instancia: una consulta para todos los totales,
+    #ninguna si se cargó con select_related('historico')
+    def _historico(self, campo):
+        try:
+            return getattr(self.historico, campo)
+        except HistoricoTecnico.DoesNotExist:
+            return 0
     
-    # Calcular pago según la tabla de escalas:
+    # Calcular pago según la tabla de escalas (ver rapihogar/escalas.py):
     # 0-14: 200/hora - 15% descuento
     # 15-28: 250/hora - 16% descuento 
     # 29-47: 300/hora - 17% descuento
     # >48: 350/hora - 18% descuento
     def calculate_payment(self):
-        total_hours = self.total_hours_worked()
-        
-        if total_hours <= 14:
-            hourly_rate = 200
-            discount_rate = 0.15
-        elif total_hours <= 28:
-            hourly_rate = 250
-            discount_rate = 0.16
-        elif total_hours <= 47:
-            hourly_rate = 300
-            discount_rate = 0.17
-        else:
-            hourly_rate = 350
-            discount_rate = 0.18
-            
-        gross_payment = total_hours * hourly_rate
-        discount = gross_payment * discount_rate
-        return gross_payment - discount
+        return calcular_pago(self.total_hours_worked())
 
     def __str__(self):
         return self.full_name
@@ -125,6 +211,10 @@ class Tecnico(models.Model):
         verbose_name = _('Técnico')
         verbose_name_plural = _('Técnicos')
         ordering = ['-date_joined']
+        indexes = [
+            models.Index(fields=['is_active', 'pago_total'], name='tecnico_activo_pago_idx'),
+            models.Index(fields=['is_active', 'horas_totales'], name='tecnico_activo_horas_idx'),
+        ]
 
 class Company(models.Model):
     name = models.CharField(max_length=50)
@@ -138,6 +228,21 @@ class Company(models.Model):
         verbose_name_plural = _('Empresas')
 
 
+class PedidoQuerySet(models.QuerySet):
+
+    #Crear pedidos con bulk_create en una transacción, junto con su registro en
+    #el feed de cambios y los datos derivados: bulk_create no dispara las
+    #señales de Pedido (ver rapihogar/signals.py)
+    def crear_en_lote(self, pedidos, batch_size=None):
+        # Las señales importan este módulo
+        from .signals import registrar_altas
+
+        with transaccion_escritura(using=self.db):
+            creados = self.bulk_create(pedidos, batch_size=batch_size)
+            registrar_altas(creados)
+        return creados
+
+
 class Pedido(models.Model):
     SOLICITUD = 0
     PEDIDO = 1
@@ -186,6 +291,41 @@ class Pedido(models.Model):
         blank=True,
         verbose_name='Fecha de actualización'
     )
+    # Se incrementa en cada actualización, para el control de concurrencia optimista
+    version = models.PositiveIntegerField(
+        default=1,
+        editable=False,
+        verbose_name='Versión'
+    )
+    # Clave enviada por el cliente al cargar pedidos en lote: un reintento
+    # del mismo lote no duplica los pedidos ya creados
+    clave_idempotencia = models.CharField(
+        max_length=100,
+        unique=True,
+        null=True,
+        blank=True,
+        editable=False,
+        verbose_name='Clave de idempotencia'
+    )
+
+    objects = PedidoQuerySet.as_manager()
+
+    # Guardar los valores leídos de la base para detectar cambios al guardar
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._valores_originales = dict(zip(field_names, values))
+        return instance
+
+    # Guardar y eliminar en una transacción que incluye el registro del
+    # cambio y los datos derivados (ver rapihogar/signals.py)
+    def save(self, *args, **kwargs):
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+
+    def delete(self, *args, **kwargs):
+        with transaction.atomic():
+            return super().delete(*args, **kwargs)
 
     def __str__(self):
         return f"Pedido #{self.id} - {self.client.full_name}"
@@ -194,3 +334,261 @@ class Pedido(models.Model):
         app_label = 'rapihogar'
         verbose_name_plural = 'pedidos'
         ordering = ('-id', )
+        indexes = [
+            # Desglose por técnico (ver liquidacion.desglose_tecnico)
+            models.Index(fields=['tecnico', 'created_at'], name='pedido_tecnico_fecha_idx'),
+        ]
+
+
+class VersionLiquidacion(models.Model):
+    """
+    Versión de los datos de liquidación (pedidos y técnicos).
+
+    Se renueva una vez por cada transacción confirmada que escribió (ver
+    rapihogar/signals.py) para que los procesos que mantienen datos
+    derivados en memoria detecten cuándo quedaron desactualizados.
+    """
+    version = models.UUIDField(default=uuid.uuid4)
+
+    #Obtener la versión vigente
+    @classmethod
+    def actual(cls):
+        return cls.objects.filter(pk=1).values_list('version', flat=True).first()
+
+    #Asignar una versión nueva, retorna (anterior, nueva)
+    @classmethod
+    def renovar(cls):
+        with transaccion_escritura():
+            fila, _ = cls.objects.select_for_update().get_or_create(pk=1)
+            anterior = fila.version
+            fila.version = uuid.uuid4()
+            fila.save(update_fields=['version'])
+        return anterior, fila.version
+
+    class Meta:
+        app_label = 'rapihogar'
+        verbose_name = _('Versión de liquidación')
+        verbose_name_plural = _('Versiones de liquidación')
+
+
+class Trabajo(models.Model):
+    """
+    Trabajo de la cola local (ver rapihogar/cola.py).
+
+    Los trabajos pendientes con la misma clave se deduplican.
+    """
+    PENDIENTE = 'pendiente'
+    EN_CURSO = 'en_curso'
+    COMPLETADO = 'completado'
+    FALLIDO = 'fallido'
+
+    ESTADOS = (
+        (PENDIENTE, 'Pendiente'),
+        (EN_CURSO, 'En curso'),
+        (COMPLETADO, 'Completado'),
+        (FALLIDO, 'Fallido'),
+    )
+    tarea = models.CharField(
+        max_length=100,
+        verbose_name='Tarea'
+    )
+    clave = models.CharField(
+        max_length=200,
+        blank=True,
+        null=True,
+        verbose_name='Clave de deduplicación'
+    )
+    parametros = models.JSONField(
+        default=dict,
+        verbose_name='Parámetros'
+    )
+    estado = models.CharField(
+        max_length=20,
+        choices=ESTADOS,
+        default=PENDIENTE,
+        verbose_name='Estado'
+    )
+    intentos = models.PositiveIntegerField(
+        default=0,
+        verbose_name='Intentos'
+    )
+    disponible_en = models.DateTimeField(
+        default=timezone.now,
+        verbose_name='Disponible desde'
+    )
+    creado_en = models.DateTimeField(
+        auto_now_add=True,
+        verbose_name='Fecha de creación'
+    )
+    iniciado_en = models.DateTimeField(
+        null=True,
+        blank=True,
+        verbose_name='Fecha de inicio'
+    )
+    terminado_en = models.DateTimeField(
+        null=True,
+        blank=True,
+        verbose_name='Fecha de finalización'
+    )
+    error = models.TextField(
+        blank=True,
+        verbose_name='Último error'
+    )
+
+    def __str__(self):
+        return f"Trabajo #{self.id} - {self.tarea} ({self.estado})"
+
+    class Meta:
+        app_label = 'rapihogar'
+        verbose_name = _('Trabajo')
+        verbose_name_plural = _('Trabajos')
+        indexes = [
+            models.Index(fields=['estado', 'disponible_en'], name='trabajo_estado_disponible_idx'),
+        ]
+        constraints = [
+            models.UniqueConstraint(
+                fields=['clave'],
+                condition=models.Q(estado='pendiente'),
+                name='trabajo_pendiente_clave_unica'
+            ),
+        ]
+
+
+class CambioPedidoQuerySet(models.QuerySet):
+
+    def posteriores(self, cursor):
+        """
+        Cambios con id mayor a 'cursor' que ya se pueden consumir sin saltear
+        ninguno. El id se asigna al insertar y no al confirmar: con escritores
+        concurrentes un cambio de id menor puede confirmarse después de uno
+        mayor. Por eso solo se sirven los cambios anteriores al primero
+        registrado dentro de FEED_CAMBIOS['VENTANA_SEGURIDAD'] segundos, que
+        debe superar la duración de una transacción de escritura.
+        """
+        cambios = self.filter(id__gt=cursor)
+        ventana = settings.FEED_CAMBIOS['VENTANA_SEGURIDAD']
+        if ventana:
+            frontera = cambios.filter(
+                creado_en__gt=timezone.now() - timedelta(seconds=ventana)
+            ).order_by('id').values_list('id', flat=True).first()
+            if frontera is not None:
+                cambios = cambios.filter(id__lt=frontera)
+        return cambios
+
+
+class CambioPedido(models.Model):
+    """
+    Registro append-only de los cambios de pedidos, escrito en la misma
+    transacción que el cambio. El id es el cursor de consumo.
+    """
+    CREADO = 'creado'
+    ACTUALIZADO = 'actualizado'
+    ELIMINADO = 'eliminado'
+
+    OPERACIONES = (
+        (CREADO, 'Creado'),
+        (ACTUALIZADO, 'Actualizado'),
+        (ELIMINADO, 'Eliminado'),
+    )
+    # Sin FK: el registro se conserva aunque el pedido se elimine
+    pedido_id = models.BigIntegerField(
+        db_index=True,
+        verbose_name='Pedido'
+    )
+    operacion = models.CharField(
+        max_length=20,
+        choices=OPERACIONES,
+        verbose_name='Operación'
+    )
+    horas_antes = models.IntegerField(null=True, blank=True)
+    horas_despues = models.IntegerField(null=True, blank=True)
+    tecnico_antes = models.BigIntegerField(null=True, blank=True)
+    tecnico_despues = models.BigIntegerField(null=True, blank=True)
+    scheme_antes = models.BigIntegerField(null=True, blank=True)
+    scheme_despues = models.BigIntegerField(null=True, blank=True)
+    creado_en = models.DateTimeField(
+        auto_now_add=True,
+        verbose_name='Fecha del cambio'
+    )
+
+    objects = CambioPedidoQuerySet.as_manager()
+
+    #Construir el registro de un cambio a partir de los valores antes/después
+    @classmethod
+    def desde_valores(cls, pedido_id, operacion, antes=None, despues=None):
+        antes = antes or {}
+        despues = despues or {}
+        return cls(
+            pedido_id=pedido_id,
+            operacion=operacion,
+            horas_antes=antes.get('hours_worked'),
+            horas_despues=despues.get('hours_worked'),
+            tecnico_antes=antes.get('tecnico_id'),
+            tecnico_despues=despues.get('tecnico_id'),
+            scheme_antes=antes.get('scheme_id'),
+            scheme_despues=despues.get('scheme_id'),
+        )
+
+    def __str__(self):
+        return f"Cambio #{self.id} - Pedido #{self.pedido_id} {self.operacion}"
+
+    class Meta:
+        app_label = 'rapihogar'
+        verbose_name = _('Cambio de pedido')
+        verbose_name_plural = _('Cambios de pedidos')
+        ordering = ('id', )
+
+
+class PedidoArchivado(models.Model):
+    """
+    Pedido antiguo movido fuera de la tabla de pedidos por archivar_pedidos.
+    Sus horas quedan sumadas en el HistoricoTecnico de su técnico.
+    """
+    # Mismo id que tenía el pedido
+    id = models.BigIntegerField(primary_key=True)
+    type_request = models.IntegerField()
+    # Sin FK: el archivo no bloquea ni acompaña los cambios de las tablas vigentes
+    client_id = models.BigIntegerField()
+    scheme_id = models.BigIntegerField(null=True, blank=True)
+    tecnico_id = models.BigIntegerField(null=True, blank=True, db_index=True)
+    hours_worked = models.IntegerField()
+    created_at = models.DateTimeField(null=True, blank=True)
+    updated_at = models.DateTimeField(null=True, blank=True)
+    archivado_en = models.DateTimeField(
+        auto_now_add=True,
+        verbose_name='Fecha de archivo'
+    )
+
+    def __str__(self):
+        return f"Pedido archivado #{self.id}"
+
+    class Meta:
+        app_label = 'rapihogar'
+        verbose_name = _('Pedido archivado')
+        verbose_name_plural = _('Pedidos archivados')
+        ordering = ('-id', )
+
+
+class HistoricoTecnico(models.Model):
+    """
+    Horas y cantidad de pedidos archivados de un técnico. Los totales de la
+    liquidación suman este histórico y los pedidos vigentes.
+    """
+    tecnico = models.OneToOneField(
+        Tecnico,
+        primary_key=True,
+        related_name='historico',
+        on_delete=models.CASCADE
+    )
+    horas = models.IntegerField(default=0)
+    pedidos = models.IntegerField(default=0)
+    # Fecha de corte del último archivo incluido
+    hasta = models.DateTimeField(null=True, blank=True)
+
+    def __str__(self):
+        return f"Histórico de {self.tecnico}"
+
+    class Meta:
+        app_label = 'rapihogar'
+        verbose_name = _('Histórico de técnico')
+        verbose_name_plural = _('Históricos de técnicos')
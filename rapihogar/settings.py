@@ -1,20 +1,39 @@
 from pathlib import Path
 import os
+import tempfile
+
+from django.core.exceptions import ImproperlyConfigured
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
 
+# Perfil de configuración: 'desarrollo' (default) o 'produccion'
+# (el perfil activo se informa al iniciar, ver rapihogar/checks.py)
+DESARROLLO = 'desarrollo'
+PRODUCCION = 'produccion'
+ENTORNO = os.environ.get('RAPIHOGAR_ENTORNO', DESARROLLO)
+if ENTORNO not in (DESARROLLO, PRODUCCION):
+    raise ImproperlyConfigured(f'RAPIHOGAR_ENTORNO inválido: {ENTORNO}')
+EN_PRODUCCION = ENTORNO == PRODUCCION
+
 
 # Quick-start development settings - unsuitable for production
 # See https://docs.djangoproject.com/en/3.2/howto/deployment/checklist/
 
 # SECURITY WARNING: keep the secret key used in production secret!
-SECRET_KEY = 'django-insecure-6+(k0auu+8_b&@)s)5hujfrj0bp@lf-5a+#eh_qs#h*a$gqz&o'
+SECRET_KEY = os.environ.get(
+    'DJANGO_SECRET_KEY',
+    'django-insecure-6+(k0auu+8_b&@)s)5hujfrj0bp@lf-5a+#eh_qs#h*a$gqz&o'
+)
 
 # SECURITY WARNING: don't run with debug turned on in production!
-DEBUG = True
+# Con DEBUG Django guarda cada consulta en connection.queries y la memoria
+# de los procesos de larga duración crece sin límite
+DEBUG = not EN_PRODUCCION
 
 ALLOWED_HOSTS = ["0.0.0.0", "localhost" , "127.0.0.1"]
+if os.environ.get('DJANGO_ALLOWED_HOSTS'):
+    ALLOWED_HOSTS = os.environ['DJANGO_ALLOWED_HOSTS'].split(',')
 
 AUTH_USER_MODEL = 'rapihogar.User'
 # Application definition
@@ -27,14 +46,18 @@ INSTALLED_APPS = [
     'django.contrib.messages',
     'django.contrib.staticfiles',
     'rest_framework.authtoken',
-    'django_extensions',
     'rest_framework',
     'django_filters',
     'rapihogar',
     'api',
 ]
 
+# Herramientas solo de desarrollo
+if not EN_PRODUCCION:
+    INSTALLED_APPS.append('django_extensions')
+
 MIDDLEWARE = [
+    'api.metricas.MetricasMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -42,6 +65,7 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'api.perfilado.PerfiladoMiddleware',
 ]
 
 ROOT_URLCONF = 'rapihogar.urls'
@@ -62,6 +86,19 @@ TEMPLATES = [
     },
 ]
 
+if EN_PRODUCCION:
+    # Templates compilados una sola vez por proceso
+    TEMPLATES[0]['APP_DIRS'] = False
+    TEMPLATES[0]['OPTIONS']['loaders'] = [
+        ('django.template.loaders.cached.Loader', [
+            'django.template.loaders.filesystem.Loader',
+            'django.template.loaders.app_directories.Loader',
+        ]),
+    ]
+    TEMPLATES[0]['OPTIONS']['context_processors'].remove(
+        'django.template.context_processors.debug'
+    )
+
 WSGI_APPLICATION = 'rapihogar.wsgi.application'
 
 
@@ -72,9 +109,21 @@ DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': BASE_DIR / 'db.sqlite3',
+        'OPTIONS': {
+            # Con WAL las lecturas no bloquean a las escrituras ni al revés. Las
+            # escrituras esperan el lock hasta 'timeout' segundos; las que leen
+            # antes de escribir lo toman al empezar (ver rapihogar/transacciones.py)
+            'init_command': 'PRAGMA journal_mode=WAL',
+            'timeout': 20,
+        },
     }
 }
 
+if EN_PRODUCCION:
+    # Conexiones persistentes, verificadas antes de reutilizarse
+    DATABASES['default']['CONN_MAX_AGE'] = int(os.environ.get('DJANGO_CONN_MAX_AGE', 60))
+    DATABASES['default']['CONN_HEALTH_CHECKS'] = True
+
 
 # Password validation
 # https://docs.djangoproject.com/en/3.2/ref/settings/#auth-password-validators
@@ -119,6 +168,189 @@ STATIC_URL = '/static/'
 
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
+REST_FRAMEWORK = {
+    'DEFAULT_AUTHENTICATION_CLASSES': [
+        'rest_framework.authentication.SessionAuthentication',
+        'rest_framework.authentication.BasicAuthentication',
+        # Clientes sin sesión, ej: cargar_trafico (rest_framework.authtoken)
+        'rest_framework.authentication.TokenAuthentication',
+    ],
+    'DEFAULT_THROTTLE_CLASSES': [
+        'api.throttling.CostoThrottle',
+    ],
+    # JSON con orjson si está instalado (ver api/renderers.py)
+    'DEFAULT_RENDERER_CLASSES': [
+        'api.renderers.JSONRapidoRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ],
+}
+
+if EN_PRODUCCION:
+    # Sin la API navegable: solo JSON
+    REST_FRAMEWORK['DEFAULT_RENDERER_CLASSES'] = [
+        'api.renderers.JSONRapidoRenderer',
+    ]
+
+# Throttle por costo de endpoint (ver api/throttling.py)
+THROTTLE_COSTO = {
+    'CAPACIDAD': 120,  # fichas máximas por usuario o IP
+    'RECARGA_POR_SEGUNDO': 2,
+    'COSTO_DEFAULT': 1,
+    # Costo en fichas por nombre de URL, estos endpoints usan un balde propio
+    'COSTOS': {
+        'informe-tecnicos': 20,
+        'liquidacion-simular': 20,
+        'pedidos-lote': 10,
+    },
+    # Usuarios (email) sin límite, ej: el de cargar_trafico. Separados por coma
+    'EXENTOS': tuple(filter(None, os.environ.get('THROTTLE_EXENTOS', '').split(','))),
+}
+
+# Cache compartido entre procesos: baldes del throttle, reportes y locks de
+# recálculo. Sin REDIS_URL cada proceso tiene su propio cache en memoria
+# (desarrollo y tests)
+if os.environ.get('REDIS_URL'):
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': os.environ['REDIS_URL'],
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        }
+    }
+
+# Cache de reportes con coalescencia de cálculos (ver api/single_flight.py)
+CACHE_REPORTES = {
+    'TTL': 60,  # segundos que un reporte sigue vigente si no cambian los datos
+    'GRACIA': 300,  # segundos extra en que se sirve el valor anterior mientras otro proceso recalcula
+    'TIMEOUT_LOCK': 30,
+    'ESPERA_MAXIMA': 5,  # espera por el resultado de otro proceso cuando no hay valor anterior
+}
+
+# Cola local de trabajos (ver rapihogar/cola.py)
+COLA_TRABAJOS = {
+    'MAX_INTENTOS': 5,
+    'BACKOFF_BASE': 2,  # segundos, se duplica en cada reintento
+    'TIMEOUT_EN_CURSO': 300,  # segundos para considerar colgado un trabajo en curso
+    'RETENCION_HORAS': 24,  # horas que se conservan los trabajos completados
+    # Solo con un worker corriendo (python manage.py procesar_cola) los totales
+    # se recalculan en la cola; sin él se recalculan en la misma escritura
+    'RECALCULO_EN_COLA': os.environ.get('RAPIHOGAR_WORKER_COLA') == '1',
+}
+
+# Perfilado de requests (ver api/perfilado.py)
+PERFILADO = {
+    'HABILITADO': True,
+    'PARAMETRO': 'perfilar',  # ?perfilar=1 responde las estadísticas, ?perfilar=guardar las guarda
+    'HEADER': 'X-Perfilar',
+    'LINEAS': 40,  # funciones mostradas en las estadísticas a pedido
+    'FRACCION': 0.0,  # fracción de requests perfilados con cProfile (0 a 1)
+    'UMBRAL_SEGUNDOS': 2.0,  # los requests más lentos se muestrean y se guardan sus pilas
+    'INTERVALO_MUESTREO': 0.01,  # segundos entre muestras, solo mientras hay requests lentos
+    'DIRECTORIO': os.path.join(BASE_DIR, 'perfiles'),
+    'MAX_BYTES': 50 * 1024 * 1024,  # tamaño máximo del directorio de perfiles
+}
+
+# Métricas de la API en formato Prometheus (ver api/metricas.py)
+METRICAS = {
+    'HABILITADO': True,
+    # Un archivo mapeado en memoria por proceso; limpiar el directorio al desplegar
+    'DIRECTORIO': os.environ.get(
+        'RAPIHOGAR_METRICAS_DIR', os.path.join(tempfile.gettempdir(), 'rapihogar-metricas')
+    ),
+    # Endpoint informado por nombre de URL, el resto se agrupa en 'otros'
+    'ENDPOINTS': {
+        'tecnicos-list': 'tecnicos',
+        'informe-tecnicos': 'informe',
+        'pedido-update': 'pedido',
+        'company-list': 'company',
+        'company-detail': 'company',
+        'eventos-liquidacion': 'eventos',
+    },
+    'TRAMOS_LATENCIA': (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0),
+}
+
+# Feed de cambios de pedidos (ver CambioPedido.objects.posteriores)
+FEED_CAMBIOS = {
+    # Antigüedad mínima (segundos) de los cambios servidos, para no adelantar
+    # el cursor sobre una escritura concurrente aún sin confirmar. SQLite
+    # confirma las escrituras de a una y en orden de id, así que no la necesita
+    'VENTANA_SEGURIDAD': 0 if DATABASES['default']['ENGINE'] == 'django.db.backends.sqlite3' else 5,
+}
+
+# Eventos en vivo de la liquidación por SSE (ver rapihogar/eventos.py y api/sse.py)
+EVENTOS_LIQUIDACION = {
+    'RUTA': '/api/eventos/',
+    'INTERVALO_CONSULTA': 0.25,  # segundos entre lecturas del feed (escrituras de otros procesos)
+    'AGRUPAR_SEGUNDOS': 0.05,  # espera para juntar escrituras seguidas en un solo evento
+    'LIMITE_CAMBIOS': 1000,  # cambios leídos por ciclo
+    'MAXIMO_PENDIENTES': 100,  # eventos en cola por cliente antes de pedirle resincronizar
+    'KEEPALIVE': 15,  # segundos entre comentarios para mantener abierta la conexión
+    'SOLO_AUTENTICADOS': True,  # el stream requiere sesión, basic o token de la API
+}
+
+# Reglas de la auditoría de planes de consultas (ver el comando auditar_consultas)
+AUDITORIA_CONSULTAS = {
+    'TABLAS_SIN_SCAN': ('rapihogar_pedido', 'rapihogar_tecnico'),  # no se recorren completas
+    'PERMITIR_ORDEN_TEMPORAL': False,  # ORDER BY / GROUP BY sin índice (B-tree temporal o Sort)
+    'MAXIMO_REPETICIONES': 5,  # ejecuciones de una misma consulta por request antes de considerarla N+1
+    # Hallazgos aceptados por endpoint (nombre de la URL -> excepciones). Cada
+    # excepción acepta una regla solo para las consultas cuyo SQL normalizado
+    # contiene 'sql' y cuya línea del plan contiene 'plan' (al menos uno)
+    'EXCEPCIONES': {
+        'tecnicos-list': (
+            # Conteo del paginador sobre todos los técnicos activos
+            {'regla': 'scan:rapihogar_tecnico', 'sql': 'SELECT COUNT(*) AS "__count" FROM "rapihogar_tecnico" WHERE'},
+            # Página por defecto: técnicos activos ordenados por fecha de alta
+            {
+                'regla': 'scan:rapihogar_tecnico',
+                'sql': 'WHERE "rapihogar_tecnico"."is_active" ORDER BY "rapihogar_tecnico"."date_joined" DESC LIMIT',
+            },
+            {
+                'regla': 'orden_temporal',
+                'sql': 'WHERE "rapihogar_tecnico"."is_active" ORDER BY "rapihogar_tecnico"."date_joined" DESC LIMIT',
+            },
+            # Búsqueda por nombre: LIKE '%texto%' no usa índices
+            {'regla': 'scan:rapihogar_tecnico', 'sql': '"rapihogar_tecnico"."last_name" LIKE %s ESCAPE'},
+            {'regla': 'orden_temporal', 'sql': '"rapihogar_tecnico"."last_name" LIKE %s ESCAPE'},
+        ),
+        'tecnicos-lote': (
+            # Totales agrupados por técnico (con_liquidacion) de los ids pedidos
+            {'regla': 'orden_temporal', 'sql': 'WHERE "rapihogar_tecnico"."id" IN (%s', 'plan': 'GROUP BY'},
+        ),
+        'tecnico-detalle': (
+            # Desglose agrupado por esquema y por mes de los pedidos del técnico
+            {'regla': 'orden_temporal', 'sql': 'WHERE "rapihogar_pedido"."tecnico_id" = %s GROUP BY'},
+        ),
+        'informe-tecnicos': (
+            # Agregados sobre todos los técnicos activos: reconstrucción del índice de pagos y estadísticas
+            {'regla': 'scan:rapihogar_tecnico', 'sql': 'WHERE "rapihogar_tecnico"."is_active" GROUP BY'},
+            {'regla': 'orden_temporal', 'sql': 'WHERE "rapihogar_tecnico"."is_active" GROUP BY'},
+            # Actualización del índice de pagos con los técnicos modificados
+            {'regla': 'orden_temporal', 'sql': 'WHERE "rapihogar_tecnico"."id" IN (%s', 'plan': 'GROUP BY'},
+        ),
+        'liquidacion-simular': (
+            # Horas de todos los técnicos activos para simular las escalas
+            {'regla': 'scan:rapihogar_tecnico', 'sql': 'WHERE "rapihogar_tecnico"."is_active" GROUP BY'},
+            {'regla': 'orden_temporal', 'sql': 'WHERE "rapihogar_tecnico"."is_active" GROUP BY'},
+        ),
+        # Recálculo de los totales de los técnicos escritos, sin worker de la cola
+        'pedido-update': (
+            {'regla': 'orden_temporal', 'sql': 'WHERE "rapihogar_tecnico"."id" IN (%s', 'plan': 'GROUP BY'},
+        ),
+        'pedidos-lote': (
+            {'regla': 'orden_temporal', 'sql': 'WHERE "rapihogar_tecnico"."id" IN (%s', 'plan': 'GROUP BY'},
+        ),
+    },
+}
+
+# Instantánea columnar de la liquidación para análisis (ver rapihogar/instantanea.py)
+INSTANTANEA_LIQUIDACION = os.path.join(BASE_DIR, 'instantaneas', 'liquidacion.inst')
+
 LOGGING = {
     'version': 1,
     'disable_existing_loggers': False,  # No desactivar los loggers de Django
@@ -161,4 +393,11 @@ LOGGING = {
             'propagate': False,
         },
     },
-}
\ No newline at end of file
+}
+
+# En producción solo se registra desde INFO
+if EN_PRODUCCION:
+    for handler in LOGGING['handlers'].values():
+        handler['level'] = 'INFO'
+    LOGGING['root']['level'] = 'INFO'
+    LOGGING['loggers']['rapihogar']['level'] = 'INFO'
@@ -0,0 +1,114 @@
+"""
+Señales para mantener actualizados los datos derivados de la liquidación
+"""
+import threading
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .cola import encolar_lote
+from .eventos import publicador
+from .indice_pagos import indice_pagos
+from .models import CambioPedido, Pedido, Tecnico, VersionLiquidacion
+
+
+def registrar_cambio(tecnico_ids, recalcular_totales=False):
+    """
+    Registra una escritura de liquidación. Al confirmarse la transacción se
+    renueva la versión de liquidación (una vez por transacción, fuera de
+    ella: las escrituras no se serializan sobre la fila de la versión), se
+    marcan los técnicos afectados en el índice de pagos del proceso y se
+    avisa a los clientes de eventos en vivo.
+
+    Con recalcular_totales=True actualiza los totales precalculados de cada
+    técnico afectado: si hay un worker de la cola configurado
+    (COLA_TRABAJOS['RECALCULO_EN_COLA']) encola el recálculo, deduplicado
+    por técnico; si no, los recalcula en la misma transacción.
+    """
+    tecnico_ids = {tecnico_id for tecnico_id in tecnico_ids if tecnico_id is not None}
+    if recalcular_totales and tecnico_ids:
+        if settings.COLA_TRABAJOS.get('RECALCULO_EN_COLA'):
+            encolar_lote('recalcular_totales', [
+                (f'totales:{tecnico_id}', {'tecnico_id': tecnico_id}) for tecnico_id in tecnico_ids
+            ])
+        else:
+            Tecnico.objects.filter(id__in=tecnico_ids).recalcular_totales()
+    if getattr(_pendientes, 'tecnico_ids', None) is None:
+        _pendientes.tecnico_ids = set()
+    _pendientes.tecnico_ids.update(tecnico_ids)
+    transaction.on_commit(_confirmar_cambios)
+
+
+# Técnicos modificados por la transacción en curso de cada hilo. Si la
+# transacción se revierte quedan para la siguiente: solo se releen de más.
+_pendientes = threading.local()
+
+
+def _confirmar_cambios():
+    tecnico_ids = getattr(_pendientes, 'tecnico_ids', None)
+    if tecnico_ids is None:
+        # Otro callback de la misma transacción ya renovó la versión
+        return
+    _pendientes.tecnico_ids = None
+    anterior, nueva = VersionLiquidacion.renovar()
+    indice_pagos.marcar_cambio(tecnico_ids, anterior, nueva)
+    publicador.notificar(tecnico_ids)
+
+
+# Campos del pedido que se registran en el feed de cambios
+CAMPOS_CAMBIO = ('hours_worked', 'tecnico_id', 'scheme_id')
+
+
+def _valores_pedido(pedido):
+    return {campo: getattr(pedido, campo) for campo in CAMPOS_CAMBIO}
+
+
+def registrar_altas(pedidos):
+    """
+    Registra pedidos creados con bulk_create, que no disparan post_save:
+    escribe su alta en el feed de cambios y actualiza los datos derivados
+    de los técnicos afectados. Debe llamarse en la misma transacción.
+    """
+    CambioPedido.objects.bulk_create([
+        CambioPedido.desde_valores(pedido.id, CambioPedido.CREADO, despues=_valores_pedido(pedido))
+        for pedido in pedidos
+    ])
+    registrar_cambio([pedido.tecnico_id for pedido in pedidos], recalcular_totales=True)
+
+
+@receiver(post_save, sender=Pedido)
+def pedido_guardado(sender, instance, created, **kwargs):
+    originales = getattr(instance, '_valores_originales', {})
+    actuales = _valores_pedido(instance)
+
+    CambioPedido.desde_valores(
+        instance.id,
+        CambioPedido.CREADO if created else CambioPedido.ACTUALIZADO,
+        antes=None if created else originales,
+        despues=actuales
+    ).save()
+
+    registrar_cambio(
+        [instance.tecnico_id, originales.get('tecnico_id')], recalcular_totales=True
+    )
+
+    # Los valores guardados pasan a ser los originales de un próximo save()
+    instance._valores_originales = {**originales, **actuales}
+
+
+@receiver(post_delete, sender=Pedido)
+def pedido_eliminado(sender, instance, **kwargs):
+    CambioPedido.desde_valores(
+        instance.id, CambioPedido.ELIMINADO, antes=_valores_pedido(instance)
+    ).save()
+
+    registrar_cambio([instance.tecnico_id], recalcular_totales=True)
+
+
+@receiver(post_save, sender=Tecnico)
+@receiver(post_delete, sender=Tecnico)
+def tecnico_modificado(sender, instance, **kwargs):
+    # Un save() completo reescribe los totales con los valores en memoria
+    registrar_cambio([instance.id], recalcular_totales=True)
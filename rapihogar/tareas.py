@@ -0,0 +1,10 @@
+"""
+Tareas de la cola local para recalcular datos derivados fuera de los requests
+"""
+from .cola import tarea
+from .models import Tecnico
+
+
+@tarea('recalcular_totales')
+def recalcular_totales(tecnico_id):
+    Tecnico.objects.filter(id=tecnico_id).recalcular_totales()
@@ -0,0 +1,331 @@
+"""
+Generador de carga HTTP con asyncio para probar la API desplegada
+"""
+import asyncio
+import json
+import random
+import time
+from collections import Counter, defaultdict
+from urllib.parse import urlencode, urlsplit
+
+# Operaciones disponibles y su peso por defecto en la mezcla
+MEZCLA_DEFAULT = {
+    'listado': 50,
+    'informe': 10,
+    'pedido_get': 30,
+    'pedido_patch': 10,
+}
+
+TERMINOS_BUSQUEDA = ('ju', 'mar', 'ana', 'ro', 'die', 'lu', 'per', 'gon', 'fer', 'a', 'e', 'o')
+
+
+class ErrorHTTP(Exception):
+    pass
+
+
+class ConexionHTTP:
+    """
+    Cliente HTTP/1.1 mínimo sobre asyncio, con la conexión abierta entre
+    requests (keep-alive). Suficiente para runserver, gunicorn o nginx.
+    """
+
+    def __init__(self, host, puerto, timeout, encabezados=()):
+        self.host = host
+        self.puerto = puerto
+        self.timeout = timeout
+        self.encabezados = list(encabezados)
+        self._lector = None
+        self._escritor = None
+
+    async def _conectar(self):
+        self._lector, self._escritor = await asyncio.wait_for(
+            asyncio.open_connection(self.host, self.puerto), self.timeout
+        )
+
+    def cerrar(self):
+        if self._escritor is not None:
+            self._escritor.close()
+        self._lector = self._escritor = None
+
+    async def pedir(self, metodo, ruta, cuerpo=None):
+        """Envía un request y retorna (status, cuerpo)"""
+        for intento in range(2):
+            nueva = self._escritor is None
+            if nueva:
+                await self._conectar()
+            try:
+                return await asyncio.wait_for(self._pedir(metodo, ruta, cuerpo), self.timeout)
+            except (ConnectionError, asyncio.IncompleteReadError, ErrorHTTP):
+                self.cerrar()
+                # El servidor pudo cerrar una conexión reutilizada: reintentar una vez
+                if nueva or intento:
+                    raise
+            except BaseException:
+                self.cerrar()
+                raise
+
+    async def _pedir(self, metodo, ruta, cuerpo):
+        datos = json.dumps(cuerpo).encode() if cuerpo is not None else b''
+        encabezados = [
+            f'{metodo} {ruta} HTTP/1.1',
+            f'Host: {self.host}:{self.puerto}',
+            'Accept: application/json',
+            'Connection: keep-alive',
+            f'Content-Length: {len(datos)}',
+            *self.encabezados,
+        ]
+        if cuerpo is not None:
+            encabezados.append('Content-Type: application/json')
+        self._escritor.write(('\r\n'.join(encabezados) + '\r\n\r\n').encode() + datos)
+        await self._escritor.drain()
+
+        linea = await self._lector.readline()
+        if not linea:
+            raise ErrorHTTP('Conexión cerrada por el servidor')
+        partes = linea.decode('latin-1').split(' ', 2)
+        if len(partes) < 2 or not partes[1].isdigit():
+            raise ErrorHTTP(f'Respuesta inválida: {linea!r}')
+        estado = int(partes[1])
+
+        respuesta = {}
+        while True:
+            linea = await self._lector.readline()
+            if linea in (b'\r\n', b'\n', b''):
+                break
+            nombre, _, valor = linea.decode('latin-1').partition(':')
+            respuesta[nombre.strip().lower()] = valor.strip()
+
+        if respuesta.get('transfer-encoding', '').lower() == 'chunked':
+            contenido = await self._leer_chunked()
+        elif 'content-length' in respuesta:
+            contenido = await self._lector.readexactly(int(respuesta['content-length']))
+        else:
+            contenido = await self._lector.read()
+            self.cerrar()
+            return estado, contenido
+
+        if respuesta.get('connection', '').lower() == 'close':
+            self.cerrar()
+        return estado, contenido
+
+    async def _leer_chunked(self):
+        partes = []
+        while True:
+            tamano = int((await self._lector.readline()).split(b';')[0].strip(), 16)
+            if not tamano:
+                # Trailers opcionales hasta la línea vacía
+                while (await self._lector.readline()) not in (b'\r\n', b'\n', b''):
+                    pass
+                return b''.join(partes)
+            partes.append(await self._lector.readexactly(tamano))
+            await self._lector.readline()
+
+
+def percentil(ordenados, fraccion):
+    if not ordenados:
+        return None
+    return ordenados[min(int(fraccion * len(ordenados)), len(ordenados) - 1)]
+
+
+class Estadisticas:
+    """Latencias y resultados por operación, del total y de la ventana actual"""
+
+    def __init__(self):
+        self.inicio = time.monotonic()
+        self.latencias = defaultdict(list)  # operación -> segundos
+        self.estados = defaultdict(Counter)  # operación -> status (o 'error')
+        self.descartados = 0
+        self._reiniciar_ventana()
+
+    def _reiniciar_ventana(self):
+        self.inicio_ventana = time.monotonic()
+        self.ventana = []
+        self.errores_ventana = 0
+
+    def registrar(self, operacion, estado, latencia):
+        self.latencias[operacion].append(latencia)
+        self.estados[operacion][estado] += 1
+        self.ventana.append(latencia)
+        if es_error(estado):
+            self.errores_ventana += 1
+
+    def cerrar_ventana(self):
+        """Resumen de la ventana transcurrida desde el último cierre"""
+        duracion = time.monotonic() - self.inicio_ventana
+        ordenados = sorted(self.ventana)
+        resumen = {
+            'segundo': round(time.monotonic() - self.inicio, 1),
+            'rps': len(ordenados) / duracion if duracion else 0,
+            'p50': percentil(ordenados, 0.50),
+            'p95': percentil(ordenados, 0.95),
+            'p99': percentil(ordenados, 0.99),
+            'errores': self.errores_ventana / len(ordenados) if ordenados else 0,
+        }
+        self._reiniciar_ventana()
+        return resumen
+
+    def resumen(self):
+        duracion = time.monotonic() - self.inicio
+        operaciones = {}
+        for operacion, latencias in self.latencias.items():
+            ordenados = sorted(latencias)
+            estados = self.estados[operacion]
+            errores = sum(cantidad for estado, cantidad in estados.items() if es_error(estado))
+            operaciones[operacion] = {
+                'requests': len(ordenados),
+                'rps': len(ordenados) / duracion if duracion else 0,
+                'p50': percentil(ordenados, 0.50),
+                'p95': percentil(ordenados, 0.95),
+                'p99': percentil(ordenados, 0.99),
+                'tasa_errores': errores / len(ordenados),
+                'estados': {str(estado): cantidad for estado, cantidad in sorted(estados.items(), key=str)},
+            }
+        total = sum(len(latencias) for latencias in self.latencias.values())
+        return {
+            'duracion': duracion,
+            'requests': total,
+            'rps': total / duracion if duracion else 0,
+            'descartados': self.descartados,
+            'operaciones': operaciones,
+        }
+
+
+def es_error(estado):
+    # Los 429 del throttle también cuentan: la API no atendió el request. Para
+    # medir capacidad, usar un token de un usuario exento del throttle
+    return estado == 'error' or estado >= 500 or estado == 429
+
+
+class GeneradorTrafico:
+    """
+    Ejecuta la mezcla de operaciones contra la URL base.
+
+    - Sin rps: 'concurrencia' workers envían requests sin pausa (carga cerrada)
+    - Con rps: un planificador emite requests a ritmo fijo y los workers los
+      atienden (carga abierta); la latencia se mide desde el momento
+      planificado, así la espera por workers ocupados también cuenta. Si
+      todos los workers están ocupados el request se descarta y se informa.
+    - Con token, los requests se autentican con ese token de la API
+    """
+
+    def __init__(self, url, mezcla, concurrencia, rps=None, timeout=10, pedido_ids=(), token=None):
+        partes = urlsplit(url)
+        if partes.scheme != 'http':
+            raise ValueError('Solo se admiten URLs http://')
+        self.host = partes.hostname
+        self.puerto = partes.port or 80
+        self.prefijo = partes.path.rstrip('/')
+        self.concurrencia = concurrencia
+        self.rps = rps
+        self.timeout = timeout
+        self.pedido_ids = list(pedido_ids)
+        self.encabezados = [f'Authorization: Token {token}'] if token else []
+
+        if not self.pedido_ids:
+            mezcla = {
+                operacion: peso for operacion, peso in mezcla.items()
+                if not operacion.startswith('pedido_')
+            }
+        if not mezcla:
+            raise ValueError('La mezcla de operaciones quedó vacía')
+        self.operaciones = list(mezcla)
+        self.pesos = [mezcla[operacion] for operacion in self.operaciones]
+        self.estadisticas = Estadisticas()
+
+    async def pedidos_inexistentes(self, muestra=5):
+        """Cuántos pedidos de una muestra de pedido_ids responden 404 en el servidor"""
+        conexion = ConexionHTTP(self.host, self.puerto, self.timeout, self.encabezados)
+        try:
+            faltantes = 0
+            for pedido_id in random.sample(self.pedido_ids, min(muestra, len(self.pedido_ids))):
+                estado, _ = await conexion.pedir('GET', f'{self.prefijo}/api/pedidos/{pedido_id}/')
+                faltantes += estado == 404
+            return faltantes
+        finally:
+            conexion.cerrar()
+
+    def _request(self):
+        """Elige una operación de la mezcla, retorna (operación, método, ruta, cuerpo)"""
+        operacion = random.choices(self.operaciones, self.pesos)[0]
+        if operacion == 'listado':
+            parametros = {'search': random.choice(TERMINOS_BUSQUEDA)}
+            return operacion, 'GET', f'/api/tecnicos/?{urlencode(parametros)}', None
+        if operacion == 'informe':
+            return operacion, 'GET', '/api/informe/', None
+        pedido_id = random.choice(self.pedido_ids)
+        if operacion == 'pedido_get':
+            return operacion, 'GET', f'/api/pedidos/{pedido_id}/', None
+        return operacion, 'PATCH', f'/api/pedidos/{pedido_id}/', {'hours_worked': random.randint(1, 12)}
+
+    async def _enviar(self, conexion, inicio=None):
+        operacion, metodo, ruta, cuerpo = self._request()
+        inicio = inicio if inicio is not None else time.monotonic()
+        try:
+            estado, _ = await conexion.pedir(metodo, self.prefijo + ruta, cuerpo)
+        except (OSError, asyncio.TimeoutError, asyncio.IncompleteReadError, ErrorHTTP):
+            estado = 'error'
+        self.estadisticas.registrar(operacion, estado, time.monotonic() - inicio)
+
+    async def _worker_cerrado(self, fin):
+        conexion = ConexionHTTP(self.host, self.puerto, self.timeout, self.encabezados)
+        try:
+            while time.monotonic() < fin:
+                await self._enviar(conexion)
+        finally:
+            conexion.cerrar()
+
+    async def _worker_abierto(self, cola):
+        conexion = ConexionHTTP(self.host, self.puerto, self.timeout, self.encabezados)
+        try:
+            while True:
+                planificado = await cola.get()
+                if planificado is None:
+                    return
+                await self._enviar(conexion, inicio=planificado)
+        finally:
+            conexion.cerrar()
+
+    async def _planificar(self, cola, fin):
+        intervalo = 1 / self.rps
+        siguiente = time.monotonic()
+        while siguiente < fin:
+            espera = siguiente - time.monotonic()
+            if espera > 0:
+                await asyncio.sleep(espera)
+            try:
+                cola.put_nowait(siguiente)
+            except asyncio.QueueFull:
+                self.estadisticas.descartados += 1
+            siguiente += intervalo
+        for _ in range(self.concurrencia):
+            await cola.put(None)
+
+    async def _reportar(self, intervalo, al_reportar):
+        while True:
+            await asyncio.sleep(intervalo)
+            al_reportar(self.estadisticas.cerrar_ventana())
+
+    async def ejecutar(self, duracion, intervalo_reporte=5, al_reportar=None):
+        """Ejecuta la carga durante 'duracion' segundos y retorna el resumen"""
+        fin = time.monotonic() + duracion
+        reportes = None
+        if al_reportar is not None:
+            reportes = asyncio.create_task(self._reportar(intervalo_reporte, al_reportar))
+
+        try:
+            if self.rps:
+                cola = asyncio.Queue(maxsize=self.concurrencia)
+                await asyncio.gather(
+                    self._planificar(cola, fin),
+                    *(self._worker_abierto(cola) for _ in range(self.concurrencia))
+                )
+            else:
+                await asyncio.gather(
+                    *(self._worker_cerrado(fin) for _ in range(self.concurrencia))
+                )
+        finally:
+            if reportes is not None:
+                reportes.cancel()
+
+        return self.estadisticas.resumen()
+
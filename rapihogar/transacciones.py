@@ -0,0 +1,72 @@
+"""
+Transacciones según el uso: escrituras que leen antes de escribir y
+lecturas que deben ver los mismos datos
+"""
+from contextlib import contextmanager
+
+from django.db import DEFAULT_DB_ALIAS, connections, transaction
+
+
+@contextmanager
+def transaccion_escritura(using=None):
+    """
+    transaction.atomic() para bloques que leen y después escriben.
+
+    En SQLite una transacción diferida que ya leyó no puede esperar el lock
+    de escritura: falla con "database is locked" sin respetar el timeout de
+    la conexión. Esta empieza con BEGIN IMMEDIATE, así toma el lock al
+    empezar (esperando su turno) y las lecturas del resto de la aplicación
+    siguen siendo diferidas. Dentro de otra transacción, o en otros motores,
+    es un atomic() común.
+    """
+    conexion = connections[using or DEFAULT_DB_ALIAS]
+    if conexion.vendor != 'sqlite' or conexion.in_atomic_block:
+        with transaction.atomic(using=using):
+            yield
+        return
+
+    with _atomic_sqlite(conexion, 'IMMEDIATE', using):
+        yield
+
+
+@contextmanager
+def transaccion_lectura(using=None):
+    """
+    transaction.atomic() para varias lecturas que deben ver los mismos datos.
+
+    En SQLite empieza con BEGIN diferido aunque la configuración diga otra
+    cosa: no toma el lock de escritura y, con WAL, lee un snapshot sin
+    bloquear a las escrituras. En PostgreSQL usa REPEATABLE READ, porque en
+    READ COMMITTED cada consulta vería su propio snapshot.
+    """
+    conexion = connections[using or DEFAULT_DB_ALIAS]
+    if conexion.in_atomic_block:
+        with transaction.atomic(using=using):
+            yield
+        return
+
+    if conexion.vendor == 'sqlite':
+        with _atomic_sqlite(conexion, 'DEFERRED', using):
+            yield
+        return
+
+    with transaction.atomic(using=using):
+        if conexion.vendor == 'postgresql':
+            with conexion.cursor() as cursor:
+                cursor.execute('SET TRANSACTION ISOLATION LEVEL REPEATABLE READ')
+        yield
+
+
+@contextmanager
+def _atomic_sqlite(conexion, modo, using):
+    """atomic() que empieza con BEGIN {modo}, solo para esta transacción"""
+    # Conectar antes: al conectar se vuelve al modo de la configuración
+    conexion.ensure_connection()
+    anterior = conexion.transaction_mode
+    conexion.transaction_mode = modo
+    try:
+        with transaction.atomic(using=using):
+            conexion.transaction_mode = anterior
+            yield
+    finally:
+        conexion.transaction_mode = anterior
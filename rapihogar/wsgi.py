@@ -5,3 +5,8 @@ from django.core.wsgi import get_wsgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'rapihogar.settings')
 
 application = get_wsgi_application()
+
+# Los checks de manage.py no corren al levantar el servidor
+from rapihogar.checks import verificar_al_iniciar  # noqa: E402
+
+verificar_al_iniciar()